@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules
+import random
+
+# local modules
+from cardpack import CardPack, FlashCard
+from fakes import FakeChannel, FakeUser, make_pack, make_rows
+from harness import benchmark
+
+
+# pack sizes from a typical pack to the biggest ones a single user could import
+PACK_SIZES = (10, 1000, 100000, 1000000)
+
+
+@benchmark('cardpack.extend', PACK_SIZES, per_item=True)
+def extend(size):
+    rows = make_rows(size)
+    author = FakeUser()
+    channel = FakeChannel()
+
+    def setup():
+        return CardPack([], 'bench', author, channel)
+
+    def run(pack):
+        pack.extend(rows)
+
+    return setup, run
+
+
+@benchmark('cardpack.append', PACK_SIZES)
+def append(size):
+    pack = make_pack(size)
+
+    def run():
+        pack.append(FlashCard('question', 'answer'))
+
+    return run
+
+
+@benchmark('cardpack.pop', PACK_SIZES)
+def pop(size):
+    """
+    pops a card from the middle of the pack then appends it again,
+    so the pack stays the same size however many times it runs
+    """
+
+    pack = make_pack(size)
+
+    def run():
+        pack.append(pack.pop(len(pack) // 2))
+
+    return run
+
+
+@benchmark('cardpack.next_round', PACK_SIZES, per_item=True)
+def next_round(size):
+    """
+    answers every card in the round (not timed) then advances the pack
+    """
+
+    pack = make_pack(size)
+    rng = random.Random(0)
+    correct = FlashCard.Result.CORRECT
+    incorrect = FlashCard.Result.INCORRECT
+
+    def setup():
+        for card in pack.round:
+            card.result = correct if rng.random() < 0.8 else incorrect
+        return pack
+
+    def run(pack):
+        pack.next_round()
+
+    return setup, run
+
+
+@benchmark('cardpack.reset', PACK_SIZES, per_item=True)
+def reset(size):
+    pack = make_pack(size)
+
+    def run():
+        pack.reset()
+
+    return run
+
+
+@benchmark('cardpack.mastered', PACK_SIZES)
+def mastered(size):
+    """
+    checks a pack where every card is mastered, the worst case
+    """
+
+    pack = make_pack(size)
+    for card in pack:
+        card.proficiency = CardPack.MASTERED
+
+    def run():
+        return pack.mastered
+
+    return run
+
+
+@benchmark('cardpack.snapshot', PACK_SIZES)
+def snapshot(size):
+    pack = make_pack(size)
+
+    def run():
+        pack.snapshot()
+
+    return run
+
+
+@benchmark('round.setup_round', PACK_SIZES, per_item=True)
+def setup_round(size):
+    pack = make_pack(size)
+
+    def run():
+        pack.round.setup_round()
+
+    return run
+
+
+@benchmark('round.unstudied', PACK_SIZES)
+def unstudied(size):
+    pack = make_pack(size)
+
+    def run():
+        return pack.round.unstudied
+
+    return run
+
+
+@benchmark('round.completed', PACK_SIZES)
+def completed(size):
+    pack = make_pack(size)
+    for card in pack.round:
+        card.result = FlashCard.Result.CORRECT
+
+    def run():
+        return pack.round.completed
+
+    return run
+
+
+@benchmark('cardpack.clone', PACK_SIZES, per_item=True)
+def clone(size):
+    pack = make_pack(size)
+
+    def run():
+        pack.clone()
+
+    return run
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+binary pack files against the same pack as json, the json pack is a list of
+[question, answer, proficiency, result] rows, which has to be parsed in full
+"""
+
+
+# standard library modules
+import json
+import os
+import tempfile
+
+# local modules
+from cardpack import CardPack, FlashCard
+from fakes import FakeChannel, FakeUser, make_pack
+from harness import benchmark
+import packfile
+
+
+PACKFILE_SIZES = (1000, 100000, 1000000)
+
+
+def _studied_pack(size):
+    """
+    returns a pack with some study progress, so the round trip covers more than the defaults
+    """
+
+    pack = make_pack(size)
+    for i, card in enumerate(pack.round):
+        if i % 3:
+            card.result = FlashCard.Result.CORRECT
+    pack.next_round()
+    return pack
+
+
+def _cards(pack):
+    return [(card.question, card.answer, card.proficiency, card.result) for card in pack]
+
+
+def _written(size):
+    """
+    returns a pack and the path it was written to, after checking that it reads back the same
+    """
+
+    pack = _studied_pack(size)
+    path = os.path.join(tempfile.mkdtemp(), 'pack' + packfile.EXTENSION)
+    packfile.write(pack, path)
+    with packfile.PackFile(path) as f:
+        loaded = f.to_pack(FakeUser(), FakeChannel())
+    assert _cards(loaded) == _cards(pack), 'pack file round trip changed the cards'
+    assert loaded.round_index == pack.round_index, 'pack file round trip changed the round'
+    return pack, path
+
+
+@benchmark('packfile.write', PACKFILE_SIZES, per_item=True)
+def write(size):
+    pack, path = _written(size)
+
+    def run():
+        packfile.write(pack, path)
+
+    return run
+
+
+@benchmark('packfile.open', PACKFILE_SIZES)
+def open_(size):
+    """
+    opens a pack file and reads a single card, as when only a few cards are needed
+    """
+
+    _, path = _written(size)
+
+    def run():
+        with packfile.PackFile(path) as f:
+            return f.question(len(f) // 2)
+
+    return run
+
+
+@benchmark('packfile.to_pack', PACKFILE_SIZES, per_item=True)
+def to_pack(size):
+    _, path = _written(size)
+    author = FakeUser()
+    channel = FakeChannel()
+
+    def run():
+        with packfile.PackFile(path) as f:
+            f.to_pack(author, channel)
+
+    return run
+
+
+@benchmark('packfile.set_proficiency', PACKFILE_SIZES)
+def set_proficiency(size):
+    _, path = _written(size)
+    f = packfile.PackFile(path, writable=True)
+    i = 0
+
+    def run():
+        nonlocal i
+        i = (i + 7919) % size
+        f.set_proficiency(i, i % CardPack.MAX_PROFICIENCY + 1)
+
+    return run
+
+
+@benchmark('packfile.json_dump', PACKFILE_SIZES, per_item=True)
+def json_dump(size):
+    pack = _studied_pack(size)
+    path = os.path.join(tempfile.mkdtemp(), 'pack.json')
+
+    def run():
+        rows = [[card.question, card.answer, card.proficiency, card.result.value] for card in pack]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(rows, f)
+
+    return run
+
+
+@benchmark('packfile.json_load', PACKFILE_SIZES, per_item=True)
+def json_load(size):
+    """
+    loads the json pack into a CardPack, the equivalent of PackFile.to_pack
+    """
+
+    pack = _studied_pack(size)
+    path = os.path.join(tempfile.mkdtemp(), 'pack.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump([[card.question, card.answer, card.proficiency, card.result.value] for card in pack], f)
+    author = FakeUser()
+    channel = FakeChannel()
+
+    def run():
+        with open(path, encoding='utf-8') as f:
+            rows = json.load(f)
+        loaded = CardPack((), pack.name, author, channel, round_index=pack.round_index)
+        loaded.extend(row[:3] for row in rows)
+        for card, (*_, result) in zip(loaded, rows):
+            card.result = FlashCard.Result(result)
+
+    return run
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+what timing every event loop callback costs, as a task yielding to the loop size times
+"""
+
+
+# standard library modules
+import asyncio
+
+# local modules
+from harness import benchmark
+from profiler import Profiler
+
+
+STEP_SIZES = (10000,)
+
+
+def steps(profile):
+
+    def bench(size):
+        profiler = Profiler()
+
+        async def run():
+            if profile:
+                profiler.start()
+            try:
+                for _ in range(size):
+                    await asyncio.sleep(0)
+            finally:
+                profiler.stop()
+
+        return run
+
+    return bench
+
+
+benchmark('profiler.steps.off', STEP_SIZES, per_item=True)(steps(False))
+benchmark('profiler.steps.on', STEP_SIZES, per_item=True)(steps(True))
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules
+import asyncio
+import random
+
+# local modules
+from cache import UserCache
+from cogs.quiz import Quiz
+from constants import Emojis
+from fakes import FakeBot, FakeChannel, FakeContext, FakeGuild, FakeMessage, FakePayload, FakeUser, make_pack
+from harness import benchmark
+from reviewlog import ReviewLog
+from sessions import QuizSession, SessionManager
+
+
+QUIZ_CARDS = 20
+
+
+def _quiz(clock=lambda: 0.0) -> Quiz:
+    """
+    creates the quiz cog with a fake bot, the session manager's clock is
+    frozen so its driver never advances the sessions by itself
+    """
+
+    quiz = Quiz(FakeBot(reviews=ReviewLog(':memory:')))
+    quiz.sessions = SessionManager(quiz._quiz_advance, clock=clock)
+    return quiz
+
+
+def _session(quiz: Quiz, pack, players: int):
+    """
+    starts a quiz of a pack snapshot in a new channel, returns the session with its players
+    """
+
+    channel = FakeChannel(FakeGuild())
+    author = FakeUser('author')
+    session = QuizSession(
+        FakeContext(author, channel, quiz.bot),
+        FakeMessage(channel),
+        pack,
+        10.0,
+        persistent=quiz.quiz_persistent_reactions,
+    )
+    quiz.sessions.add(session)
+    return session, [author] + [FakeUser(f'player {i}') for i in range(players - 1)]
+
+
+async def _vote(quiz: Quiz, session: QuizSession, players, rng: random.Random, members: bool = True) -> None:
+    """
+    every player answers the current card, members is whether the reactions come with the member
+    """
+
+    for player in players:
+        emoji = Emojis.check if rng.random() < 0.7 else Emojis.cross
+        await quiz._quiz_add_reaction_listener(FakePayload(player, session.message, emoji, members))
+
+
+async def _play(quiz: Quiz, session: QuizSession, players, rng: random.Random, members: bool = True) -> None:
+    """
+    plays a whole quiz from the first card to the scoreboard
+    """
+
+    while True:
+        await _vote(quiz, session, players, rng, members)
+        if not await quiz._quiz_advance(session):
+            break
+
+    # the menu for browsing a scoreboard of several pages is left open for the
+    # players, which a simulation has none of, so it's closed once it was sent
+    await asyncio.sleep(0)
+    menus = list(quiz.scoreboard_menus)
+    for task in menus:
+        task.cancel()
+    await asyncio.gather(*menus, return_exceptions=True)
+    quiz.sessions.remove(session)
+
+
+@benchmark('quiz.card', (1, 10, 100))
+def card(players):
+    """
+    every player votes on a card, then the quiz moves on to the next one
+    """
+
+    quiz = _quiz()
+    rng = random.Random(0)
+    pack = make_pack(QUIZ_CARDS).snapshot()
+    session = None
+    people = []
+
+    def setup():
+        nonlocal session, people
+
+        # start a new quiz whenever the last one ran out of cards
+        if session is None or session.index + 1 >= len(session.pack):
+            if session is not None:
+                quiz.sessions.remove(session)
+            session, people = _session(quiz, pack, players)
+        return session
+
+    async def run(session):
+        await _vote(quiz, session, people, rng)
+        await quiz._quiz_advance(session)
+
+    return setup, run
+
+
+@benchmark('quiz.session', (1, 10, 100), repeat=3)
+def full_session(players):
+    """
+    plays a whole quiz from the first card to the scoreboard, reporting the
+    amount of discord API calls the quiz needed for each card
+    """
+
+    quiz = _quiz()
+    rng = random.Random(0)
+    pack = make_pack(QUIZ_CARDS).snapshot()
+
+    def setup():
+        return _session(quiz, pack, players)
+
+    async def run(state):
+        session, people = state
+        await _play(quiz, session, people, rng)
+        calls = session.message.channel.calls
+        return {'api_calls_per_card': {name: count / QUIZ_CARDS for name, count in sorted(calls.items())}}
+
+    return setup, run
+
+
+@benchmark('quiz.user_cache', (1, 10, 100, 1000), repeat=1)
+def user_cache(players):
+    """
+    plays a whole classic quiz, where the other answer reaction is removed on
+    every vote so the voter's user is needed, through the bot's UserCache, the
+    reactions come without members (as without the members intent) and only
+    half the players are in the gateway's user cache, reporting the cache's
+    hits, gateway hits and misses, and the REST calls made, per card
+    """
+
+    quiz = _quiz()
+    quiz.quiz_persistent_reactions = False
+    bot = quiz.bot
+    rng = random.Random(0)
+    pack = make_pack(QUIZ_CARDS).snapshot()
+
+    def setup():
+        bot.user_cache = UserCache(bot)
+        bot.calls.clear()
+        session, people = _session(quiz, pack, players)
+        for i, person in enumerate(people):
+            bot.known[person.id] = person
+            if i % 2:
+                bot.users[person.id] = person
+        return session, people
+
+    async def run(state):
+        session, people = state
+        await _play(quiz, session, people, rng, members=False)
+        stats = bot.user_cache.stats()
+        return {
+            'per_card': {
+                'hits': stats['hits'] / QUIZ_CARDS,
+                'gateway_hits': stats['gateway_hits'] / QUIZ_CARDS,
+                'misses': stats['misses'] / QUIZ_CARDS,
+                'rest_calls': bot.calls['fetch_user'] / QUIZ_CARDS,
+            },
+        }
+
+    return setup, run
+
+
+@benchmark('quiz.tick', (10, 1000, 5000), per_item=True)
+def tick(sessions):
+    """
+    advances every running quiz once through the session manager's driver,
+    with 5 votes on each card
+    """
+
+    now = 0.0
+    quiz = _quiz(clock=lambda: now)
+    quiz.sessions.tick = 0.0
+    rng = random.Random(0)
+    pack = make_pack(10000).snapshot()
+    running = [_session(quiz, pack, 5) for _ in range(sessions)]
+
+    async def setup():
+        nonlocal now
+        for session, people in running:
+            await _vote(quiz, session, people, rng)
+        now += 10.0
+        return min(session.index for session, _ in running) + 1
+
+    async def run(target):
+
+        # wait until the driver has advanced every session once
+        manager = quiz.sessions
+        while manager.in_flight or any(session.index < target for session, _ in running):
+            await asyncio.sleep(0)
+
+    return setup, run
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules
+import os
+import tempfile
+
+# local modules
+from fakes import FakeChannel, FakeUser, make_pack
+from harness import benchmark
+from reminders import ReminderScheduler, send_digest, send_reminder
+from storage import MemoryPackStore, SQLitePackStore
+
+
+REMINDER_SIZES = (100, 10000, 100000)
+
+# every reminder fires this often
+INTERVAL = 3600.0
+
+# fan-out simulation: users with many packs on the default daily reminder,
+# set up at different times within SPREAD seconds, fired every TICK seconds
+FANOUT_SIZES = (10000,)
+PACKS_PER_USER = 40
+DAILY = 24 * 3600.0
+SPREAD = 1800.0
+TICK = 10.0
+
+
+def tick(make_store):
+    """
+    fires size reminders that are all due at once, as a single scheduler tick
+    does: pops them, advances and saves their packs, then sends the reminders
+    """
+
+    def bench(size):
+        store = make_store()
+        now = 0.0
+        scheduler = ReminderScheduler(store, clock=lambda: now)
+        channel = FakeChannel()
+        for user_id in range(size):
+            pack = make_pack(20, name=f'pack {user_id}')
+            pack.remind_channel = channel
+            store.add(user_id, pack)
+            scheduler.schedule(user_id, pack, seconds=INTERVAL, hours=0.0)
+        store.flush()
+
+        def setup():
+            nonlocal now
+            now += INTERVAL
+            return now
+
+        async def run(now):
+            due = scheduler.pop_due(now)
+            for i in range(0, len(due), scheduler.batch_size):
+                for pack in await scheduler.fire(due[i:i + scheduler.batch_size], now):
+                    await send_reminder(pack)
+            store.flush()
+            return {'sent_per_tick': len(due)}
+
+        return setup, run
+
+    return bench
+
+
+def _sqlite_store():
+    return SQLitePackStore(
+        os.path.join(tempfile.mkdtemp(), 'packs.db'),
+        resolve_user=lambda user_id: FakeUser(),
+        resolve_channel=lambda channel_id, user: FakeChannel(),
+    )
+
+
+benchmark('reminders.tick.memory', REMINDER_SIZES, per_item=True)(tick(MemoryPackStore))
+benchmark('reminders.tick.sqlite', REMINDER_SIZES, per_item=True)(tick(_sqlite_store))
+
+
+def fanout(digest_window):
+    """
+    fires size reminders for users with PACKS_PER_USER packs each, every
+    user's reminders going to their own channel, and counts the messages sent
+    """
+
+    def bench(size):
+
+        async def run():
+            store = MemoryPackStore()
+            now = 0.0
+            scheduler = ReminderScheduler(
+                store,
+                clock=lambda: now,
+                send=send_reminder,
+                send_digest=send_digest,
+                digest_window=digest_window,
+            )
+            channels = []
+            for user_id in range(size // PACKS_PER_USER):
+                channel = FakeChannel()
+                channels.append(channel)
+                for i in range(PACKS_PER_USER):
+                    now = (SPREAD * i / PACKS_PER_USER + user_id) % SPREAD
+                    pack = make_pack(20, name=f'pack {i}')
+                    pack.remind_channel = channel
+                    store.add(user_id, pack)
+                    scheduler.schedule(user_id, pack, hours=DAILY / 3600.0)
+
+            now = DAILY
+            while now <= DAILY + SPREAD + (digest_window or 0.0) + TICK:
+                await scheduler.run_once(now, scheduler.deliver)
+                now += TICK
+
+            messages = sum(channel.calls['send'] for channel in channels)
+            return {
+                'reminders': size,
+                'messages': messages,
+                'messages_per_10k_reminders': messages * 10000 / size,
+            }
+
+        return run
+
+    return bench
+
+
+benchmark('reminders.fanout.single', FANOUT_SIZES, repeat=1)(fanout(None))
+benchmark('reminders.fanout.digest', FANOUT_SIZES, repeat=1)(fanout(600.0))
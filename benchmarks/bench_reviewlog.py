@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules
+import asyncio
+import os
+import tempfile
+import time
+
+# local modules
+from harness import benchmark
+from reviewlog import ReviewLog
+
+
+# events per second and for how long the sustained load runs
+SUSTAINED_RATE = 10000
+SUSTAINED_SECONDS = 3.0
+
+
+def _log(directory: str, **kwargs) -> ReviewLog:
+    return ReviewLog(os.path.join(directory, 'reviews.db'), **kwargs)
+
+
+@benchmark('reviewlog.record')
+def record():
+    directory = tempfile.mkdtemp()
+    log = _log(directory, max_buffer=10 ** 9)
+
+    def run():
+        log.record(1, 2, 'pack', 3, 2, 1.5, 0)
+
+    return run
+
+
+@benchmark('reviewlog.flush', (1000, 100000), per_item=True)
+def flush(size):
+    directory = tempfile.mkdtemp()
+    log = _log(directory)
+
+    def setup():
+        for i in range(size):
+            log.record(i, 2, 'pack', i, 2, 1.5, 0)
+        return log
+
+    def run(log):
+        log.flush()
+
+    return setup, run
+
+
+@benchmark('reviewlog.sustained', (SUSTAINED_RATE,), repeat=1)
+def sustained(rate):
+    """
+    records rate events per second in small bursts while the log writes them
+    in the background, reporting how late the event loop woke up for each burst
+    """
+
+    async def run():
+        directory = tempfile.mkdtemp()
+        log = _log(directory, flush_interval=0.5)
+        log.start()
+
+        burst = rate // 100
+        interval = burst / rate
+        lag = []
+        start = time.perf_counter()
+        due = start
+        while due - start < SUSTAINED_SECONDS:
+            for i in range(burst):
+                log.record(i, 2, 'pack', i, 2, 1.5, 0)
+            due += interval
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+            lag.append(max(0.0, time.perf_counter() - due))
+        log.close()
+
+        lag.sort()
+        return {
+            'rate': rate,
+            'recorded': log.recorded,
+            'written': log.written,
+            'dropped': log.dropped,
+            'loop_lag_p50': lag[len(lag) // 2],
+            'loop_lag_p99': lag[int(len(lag) * 0.99)],
+            'loop_lag_max': lag[-1],
+        }
+
+    return run
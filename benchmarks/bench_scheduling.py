@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules
+import math
+import random
+import time
+
+# local modules
+from cardpack import FlashCard
+from fakes import make_pack
+from harness import benchmark
+from scheduling import DAY, make_scheduler
+
+
+REVIEW_SIZES = (1000, 100000, 1000000)
+
+# size of the simulated pack and how many days it's studied for
+SIMULATED_CARDS = 1000
+SIMULATED_DAYS = 180
+
+
+def review_batch(name):
+    """
+    reschedules every card in a pack at once, a day apart each run
+    """
+
+    def bench(size):
+        pack = make_pack(size, make_scheduler(name))
+        indexes = range(size)
+        rng = random.Random(0)
+        correct = [rng.random() < 0.85 for _ in indexes]
+        now = time.time()
+
+        def run():
+            nonlocal now
+            now += DAY
+            pack.scheduler.review_batch(pack, indexes, correct, now)
+
+        return run
+
+    return bench
+
+
+def simulate(name):
+    """
+    studies a pack once a day with a simulated learner, reporting how many
+    reviews the scheduler needed for each card that's remembered at the end
+
+    the learner remembers each card with probability 0.9 ** (elapsed days /
+    memory), where memory grows with every successful review (more so the
+    harder the recall was) and shrinks when the card was forgotten, the model
+    is only meant for comparing schedulers with each other
+    """
+
+    def bench(size):
+
+        def run():
+            rng = random.Random(0)
+            start = time.time() + 1.0
+            pack = make_pack(size, make_scheduler(name))
+            correct = FlashCard.Result.CORRECT.value
+            incorrect = FlashCard.Result.INCORRECT.value
+
+            # learner state per card, a memory of 0 means the card hasn't been seen yet
+            memory = [0.0] * size
+            last = [0.0] * size
+
+            reviews = 0
+            for day in range(SIMULATED_DAYS):
+                now = start + day * DAY
+                pack.round.setup_round(now)
+                for i in pack.round._indexes:
+                    if memory[i]:
+                        recall = 0.9 ** ((now - last[i]) / DAY / memory[i])
+                    else:
+                        recall = 0.5
+                    if rng.random() < recall:
+                        pack._set_result(i, correct)
+                        memory[i] = max(1.0, memory[i] * (2.0 + 3.0 * (1.0 - recall)))
+                    else:
+                        pack._set_result(i, incorrect)
+                        memory[i] = max(0.5, memory[i] * 0.3)
+                    last[i] = now
+                reviews += len(pack.round)
+                pack.next_round(now)
+
+            # chance of remembering each card the day after studying stopped
+            end = start + SIMULATED_DAYS * DAY
+            retention = math.fsum(
+                0.9 ** ((end - last[i]) / DAY / memory[i]) if memory[i] else 0.0
+                for i in range(size)
+            ) / size
+            return {
+                'cards': size,
+                'days': SIMULATED_DAYS,
+                'reviews': reviews,
+                'retention': retention,
+                'reviews_per_retained_card': reviews / (retention * size) if retention else None,
+            }
+
+        return run
+
+    return bench
+
+
+for scheduler_name in ('sm2', 'fsrs'):
+    benchmark(f'scheduling.review_batch.{scheduler_name}', REVIEW_SIZES, per_item=True)(review_batch(scheduler_name))
+
+for scheduler_name in ('rounds', 'sm2', 'fsrs'):
+    benchmark(f'scheduling.simulate.{scheduler_name}', (SIMULATED_CARDS,), repeat=1)(simulate(scheduler_name))
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+the quiz scoreboard with lots of players, scores are kept for the whole quiz
+so the leaderboard can be shown on every card, and paged at the end
+"""
+
+
+# standard library modules
+import random
+
+# local modules
+from constants import Emojis
+from harness import benchmark
+from scoreboard import FIELD_CHARACTERS, PAGE_SIZE, Scoreboard, leaderboard, scoreboard_embeds
+
+
+SCOREBOARD_SIZES = (100, 10000)
+
+# cards in the simulated quiz, so scores range from 0 to QUIZ_CARDS
+QUIZ_CARDS = 50
+
+
+def _scoreboard(size: int):
+    """
+    returns a scoreboard of size players at the end of a quiz, with their display names
+    """
+
+    rng = random.Random(size)
+    scoreboard = Scoreboard()
+    names = {}
+    for player_id in range(size):
+        scoreboard.add(player_id, rng.randint(0, QUIZ_CARDS))
+        names[player_id] = f'player {rng.randrange(size)}'
+    return scoreboard, names
+
+
+def _sorted_columns(players, names):
+    """
+    the scoreboard as it was built before, sorting every player and concatenating single columns
+    """
+
+    ranks = ''
+    players_column = ''
+    scores = ''
+    prev = -1
+    rank = 0
+    name_score = sorted(players.items(), key=lambda x: names[x[0]])
+    for player_id, score in sorted(name_score, key=lambda x: x[1], reverse=True):
+        if score != prev:
+            rank += 1
+        scores += f'{Emojis.blank}{score}\n'
+        players_column += f'{names[player_id]}{Emojis.blank}\n'
+        ranks += f'{Emojis.medals.get(rank, Emojis.blank)} {rank}{Emojis.blank}\n'
+        prev = score
+    return ranks, players_column, scores
+
+
+@benchmark('scoreboard.card', SCOREBOARD_SIZES, per_item=True)
+def card(size):
+    """
+    a card of a quiz: every player scores, then the leaderboard is shown
+    """
+
+    scoreboard, names = _scoreboard(size)
+    players = list(range(size))
+
+    def run():
+        for player_id in players:
+            scoreboard.add(player_id)
+        return leaderboard(scoreboard, names)
+
+    return run
+
+
+@benchmark('scoreboard.leaderboard', SCOREBOARD_SIZES)
+def leaderboard_(size):
+    scoreboard, names = _scoreboard(size)
+
+    def run():
+        return leaderboard(scoreboard, names)
+
+    return run
+
+
+@benchmark('scoreboard.leaderboard.sorted', SCOREBOARD_SIZES)
+def leaderboard_sorted(size):
+    """
+    the leaderboard from sorting every player, as the scoreboard did at the end of a quiz
+    """
+
+    scoreboard, names = _scoreboard(size)
+    players = dict(scoreboard.items())
+
+    def run():
+        return sorted(players.items(), key=lambda x: (-x[1], names[x[0]]))[:3]
+
+    return run
+
+
+@benchmark('scoreboard.embeds', SCOREBOARD_SIZES, per_item=True)
+def embeds(size):
+    scoreboard, names = _scoreboard(size)
+    pages = scoreboard_embeds(scoreboard, names, 'pack', 'Pack by author')
+    assert sum(page['fields'][0]['value'].count('\n') + 1 for page in pages) == size, 'players went missing'
+    assert all(
+        len(field['value']) <= FIELD_CHARACTERS and field['value'].count('\n') < PAGE_SIZE
+        for page in pages for field in page['fields']
+    ), 'a page is over discord\'s limits'
+
+    def run():
+        return scoreboard_embeds(scoreboard, names, 'pack', 'Pack by author')
+
+    return run
+
+
+@benchmark('scoreboard.embeds.sorted', SCOREBOARD_SIZES, per_item=True)
+def embeds_sorted(size):
+    """
+    the old single page scoreboard, which is over discord's limits past a dozen or so players
+    """
+
+    scoreboard, names = _scoreboard(size)
+    players = dict(scoreboard.items())
+
+    def run():
+        return _sorted_columns(players, names)
+
+    return run
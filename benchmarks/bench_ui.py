@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules
+import itertools
+import random
+
+# third-party packages - discord related
+import discord
+
+# local modules
+import ui
+from bench_cardpack import PACK_SIZES
+from fakes import make_pack
+from harness import benchmark
+
+
+@benchmark('ui.make_card_page.cached', PACK_SIZES)
+def make_card_page_cached(size):
+    """
+    shows the same cards again, as when flipping back and forth through a round
+    """
+
+    pack = make_pack(size)
+    rng = random.Random(0)
+    indexes = [rng.randrange(len(pack.round)) for _ in range(min(size, 64))]
+    for i in indexes:
+        ui.render_card(pack, i)
+    cycle = itertools.cycle(indexes)
+
+    async def run():
+        await ui.make_card_page(pack, next(cycle))
+
+    return run
+
+
+@benchmark('ui.make_card_page.uncached', PACK_SIZES)
+def make_card_page_uncached(size):
+    pack = make_pack(size)
+    rng = random.Random(0)
+
+    def setup():
+        ui._renders.pop(pack, None)
+        return rng.randrange(len(pack.round))
+
+    async def run(i):
+        await ui.make_card_page(pack, i)
+
+    return setup, run
+
+
+@benchmark('ui.make_card_page.quiz', PACK_SIZES)
+def make_card_page_quiz(size):
+    """
+    renders the cards of a quiz snapshot in order, each for the first time
+    """
+
+    snapshot = make_pack(size).snapshot()
+    position = 0
+
+    def setup():
+        nonlocal position
+        position = (position + 1) % len(snapshot)
+        if position == 0:
+            ui._renders.pop(snapshot, None)
+        return position
+
+    async def run(i):
+        await ui.make_card_page(snapshot, i, quiz_mode=True)
+
+    return setup, run
+
+
+# cards in the quiz decks paged through, up to what a quiz pre-renders
+QUIZ_DECK_SIZES = (10, 1000)
+
+
+def _page_through():
+    """
+    returns a run showing every card of a quiz snapshot in order, as the quiz
+    does after its first card, each render is turned into the embed it sends
+    """
+
+    async def run(snapshot):
+        for i in range(len(snapshot)):
+            discord.Embed.from_dict(ui.render_card(snapshot, i, quiz_mode=True))
+
+    return run
+
+
+@benchmark('ui.quiz_deck.cold', QUIZ_DECK_SIZES, per_item=True)
+def quiz_deck_cold(size):
+    """
+    pages through a quiz of a pack that's never been rendered
+    """
+
+    pack = make_pack(size)
+
+    def setup():
+        ui._renders.pop(pack, None)
+        return pack.snapshot()
+
+    return setup, _page_through()
+
+
+@benchmark('ui.quiz_deck.warm', QUIZ_DECK_SIZES, per_item=True)
+def quiz_deck_warm(size):
+    """
+    pages through a quiz of a pack whose cards an earlier quiz rendered
+    """
+
+    pack = make_pack(size)
+    earlier = pack.snapshot()
+    for i in range(len(earlier)):
+        ui.render_card(earlier, i, quiz_mode=True)
+
+    return pack.snapshot, _page_through()
+
+
+@benchmark('ui.quiz_deck.prerendered', QUIZ_DECK_SIZES, per_item=True)
+def quiz_deck_prerendered(size):
+    """
+    pages through a quiz that was pre-rendered when it started, as the quiz cog does
+    """
+
+    pack = make_pack(size)
+
+    async def setup():
+        ui._renders.pop(pack, None)
+        snapshot = pack.snapshot()
+        await ui.prerender_deck(snapshot)
+        return snapshot
+
+    return setup, _page_through()
+
+
+@benchmark('ui.prerender_deck', QUIZ_DECK_SIZES, per_item=True)
+def prerender_deck(size):
+    pack = make_pack(size)
+
+    def setup():
+        ui._renders.pop(pack, None)
+        return pack.snapshot()
+
+    async def run(snapshot):
+        await ui.prerender_deck(snapshot)
+
+    return setup, run
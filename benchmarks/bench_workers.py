@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+how long the event loop is held up by large pack operations, with and
+without the worker pools, the loop's lag is sampled by a task that sleeps
+for LAG_INTERVAL at a time while the operation runs
+"""
+
+
+# standard library modules
+import asyncio
+import csv
+import os
+import tempfile
+import time
+
+# local modules
+from cardpack import FlashCard
+from fakes import make_pack
+from harness import benchmark
+from importer import import_file, import_file_async
+from workers import Workers, next_round
+
+
+LARGE_SIZES = (1000000,)
+
+LAG_INTERVAL = 0.005
+
+
+class LagProbe:
+    """
+    class for measuring how late the event loop wakes up a sleeping task
+    """
+
+    def __init__(self):
+        """initializer"""
+
+        self.lags = []
+        self._task = None
+
+
+    def __enter__(self):
+        self._task = asyncio.ensure_future(self._run())
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self._task.cancel()
+
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(LAG_INTERVAL)
+            self.lags.append(time.perf_counter() - start - LAG_INTERVAL)
+
+
+    def results(self):
+        lags = sorted(self.lags) or [0.0]
+        return {
+            'max_loop_lag_ms': lags[-1] * 1e3,
+            'p99_loop_lag_ms': lags[int(0.99 * (len(lags) - 1))] * 1e3,
+        }
+
+
+def _csv_file(size):
+    path = os.path.join(tempfile.mkdtemp(), 'pack.csv')
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        csv.writer(f).writerows((f'question {i}', f'answer {i}') for i in range(size))
+    return path
+
+
+def import_lag(background):
+    """
+    imports a csv file of size cards into an empty pack
+    """
+
+    def bench(size):
+        path = _csv_file(size)
+        workers = Workers()
+
+        def setup():
+            return make_pack(0)
+
+        async def run(pack):
+            with LagProbe() as probe:
+
+                # lets the probe start sleeping before the import begins
+                await asyncio.sleep(0)
+                if background:
+                    stats = await import_file_async(pack, path, workers=workers)
+                else:
+                    stats = import_file(pack, path)
+                await asyncio.sleep(LAG_INTERVAL)
+            assert stats.imported == len(pack) == size
+            return probe.results()
+
+        return setup, run
+
+    return bench
+
+
+def next_round_lag(threshold):
+    """
+    advances a pack of size cards with every card in the round answered
+    """
+
+    def bench(size):
+        pack = make_pack(size)
+        workers = Workers(threshold=threshold)
+
+        def setup():
+            for i in range(len(pack.round)):
+                pack._set_result(pack.round._indexes[i], FlashCard.Result.CORRECT.value)
+            return pack
+
+        async def run(pack):
+            with LagProbe() as probe:
+                await asyncio.sleep(0)
+                await next_round(pack, workers=workers)
+                await asyncio.sleep(LAG_INTERVAL)
+            return probe.results()
+
+        return setup, run
+
+    return bench
+
+
+benchmark('workers.import_lag.inline', LARGE_SIZES, repeat=1)(import_lag(False))
+benchmark('workers.import_lag.background', LARGE_SIZES, repeat=1)(import_lag(True))
+benchmark('workers.next_round_lag.inline', LARGE_SIZES, repeat=3)(next_round_lag(float('inf')))
+benchmark('workers.next_round_lag.offloaded', LARGE_SIZES, repeat=3)(next_round_lag(0))
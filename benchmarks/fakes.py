@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules - typing
+from __future__ import annotations  # fixes some typehinting issues
+from typing import Any, Dict, List, Optional
+
+# standard library modules
+import asyncio
+import collections
+import itertools
+
+# local modules
+from cache import UserCache
+from cardpack import CardPack
+from scheduling import Scheduler
+from workers import Workers
+
+
+# discord-like snowflake ids
+_ids = itertools.count(10 ** 17)
+
+
+class FakeUser:
+    """
+    stand-in for a discord.User/Member
+    """
+
+    def __init__(self, name: str = 'user'):
+        """initializer"""
+
+        self.id = next(_ids)
+        self.name = name
+        self.display_name = name
+        self.bot = False
+
+
+    def __str__(self):
+        return self.name
+
+
+class FakeGuild:
+    """
+    stand-in for a discord.Guild
+    """
+
+    def __init__(self):
+        """initializer"""
+
+        self.id = next(_ids)
+
+
+class FakeMessage:
+    """
+    stand-in for a discord.Message, every API call is counted instead of sent
+    """
+
+    def __init__(self, channel: FakeChannel, embed: Any = None):
+        """initializer"""
+
+        self.id = next(_ids)
+        self.channel = channel
+        self.guild = channel.guild
+        self.embed = embed
+        self.reactions: List[FakeReaction] = []
+        channel.messages[self.id] = self
+
+
+    async def edit(self, embed: Any = None, **kwargs) -> None:
+        self.channel.calls['edit'] += 1
+        self.embed = embed
+
+
+    async def add_reaction(self, emoji: str) -> None:
+        self.channel.calls['add_reaction'] += 1
+
+
+    async def remove_reaction(self, emoji: str, member: Any) -> None:
+        self.channel.calls['remove_reaction'] += 1
+
+
+    async def clear_reactions(self) -> None:
+        self.channel.calls['clear_reactions'] += 1
+
+
+class FakeReaction:
+    """
+    stand-in for a discord.Reaction, holding the users that reacted
+    """
+
+    def __init__(self, emoji: str, users: List[FakeUser]):
+        """initializer"""
+
+        self.emoji = emoji
+        self._users = users
+
+
+    def users(self) -> FakeReaction:
+        return self
+
+
+    async def flatten(self) -> List[FakeUser]:
+        return list(self._users)
+
+
+class FakeChannel:
+    """
+    stand-in for a discord text or DM channel
+    """
+
+    def __init__(self, guild: Optional[FakeGuild] = None):
+        """initializer"""
+
+        self.id = next(_ids)
+        self.guild = guild
+        self.calls: Dict[str, int] = collections.Counter()
+        self.messages: Dict[int, FakeMessage] = {}
+
+
+    async def send(self, embed: Any = None, **kwargs) -> FakeMessage:
+        self.calls['send'] += 1
+        return FakeMessage(self, embed)
+
+
+    async def fetch_message(self, message_id: int) -> FakeMessage:
+        self.calls['fetch_message'] += 1
+        return self.messages[message_id]
+
+
+class FakeContext:
+    """
+    stand-in for a commands.Context
+    """
+
+    def __init__(self, author: FakeUser, channel: FakeChannel, bot: Optional[FakeBot] = None):
+        """initializer"""
+
+        self.author = author
+        self.channel = channel
+        self.guild = channel.guild
+        self.bot = bot
+
+        # the message that invoked the command
+        self.message = FakeMessage(channel)
+
+
+    async def send(self, **kwargs) -> FakeMessage:
+        return await self.channel.send(**kwargs)
+
+
+    async def fetch_message(self, message_id: int) -> FakeMessage:
+        return await self.channel.fetch_message(message_id)
+
+
+class FakePayload:
+    """
+    stand-in for a discord.RawReactionActionEvent
+    """
+
+    __slots__ = ('user_id', 'message_id', 'emoji', 'member')
+
+    def __init__(self, user: FakeUser, message: FakeMessage, emoji: str, member: bool = True):
+        """initializer"""
+
+        # the member is left out like the gateway does without the members intent
+        self.user_id = user.id
+        self.message_id = message.id
+        self.emoji = emoji
+        self.member = user if member else None
+
+
+class DirectOutbound:
+    """
+    stand-in for the bot's outbound Dispatcher that makes every call straight
+    away, so simulations measure the bot's own work rather than rate limits
+    """
+
+    async def send(self, destination, priority=None, **kwargs):
+        return await destination.send(**kwargs)
+
+
+    async def edit(self, message, priority=None, **kwargs):
+        return await message.edit(**kwargs)
+
+
+    async def add_reaction(self, message, emoji, priority=None):
+        return await message.add_reaction(emoji)
+
+
+    async def remove_reaction(self, message, emoji, member, priority=None):
+        return await message.remove_reaction(emoji, member)
+
+
+    async def clear_reactions(self, message, priority=None):
+        return await message.clear_reactions()
+
+
+class FakeBot:
+    """
+    stand-in for the Packle bot with just the attributes the cogs use
+    """
+
+    def __init__(self, reviews=None):
+        """initializer"""
+
+        self.user = FakeUser('Packle')
+        self.user.bot = True
+        self.outbound = DirectOutbound()
+        self.user_cache = UserCache(self)
+        self.reviews = reviews
+        self.workers = Workers()
+
+        # the gateway's cache of users, and every user that exists (any of them can be fetched)
+        self.users: Dict[int, FakeUser] = {}
+        self.known: Dict[int, FakeUser] = {}
+
+        # REST calls made, by endpoint
+        self.calls: Dict[str, int] = collections.Counter()
+
+
+    def get_user(self, user_id: int) -> Optional[FakeUser]:
+        return self.users.get(user_id)
+
+
+    async def fetch_user(self, user_id: int) -> FakeUser:
+        self.calls['fetch_user'] += 1
+        return self.known[user_id]
+
+
+    async def wait_for(self, event: str, timeout: Optional[float] = None, check: Any = None) -> Any:
+        """
+        nobody reacts to menus in simulations, so waiting for an event only ever times out
+        """
+
+        if timeout is None:
+            await asyncio.Event().wait()
+        await asyncio.sleep(timeout)
+        raise asyncio.TimeoutError
+
+
+def make_rows(size: int) -> List[tuple]:
+    """
+    returns (question, answer) rows for a pack
+    """
+
+    return [(f'question {i}', f'answer {i}') for i in range(size)]
+
+
+def make_pack(size: int, scheduler: Optional[Scheduler] = None, name: str = 'bench') -> CardPack:
+    """
+    creates a pack of size cards owned by a fake user
+    """
+
+    author = FakeUser('author')
+    return CardPack(make_rows(size), name, author, FakeChannel(), scheduler=scheduler)
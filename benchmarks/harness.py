@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules - typing
+from __future__ import annotations  # fixes some typehinting issues
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# standard library modules
+import asyncio
+import datetime
+import gc
+import inspect
+import json
+import platform
+import statistics
+import sys
+import time
+
+
+class Benchmark:
+    """
+    class for a single registered benchmark
+
+    func is called with each size (or None when there are no sizes) and
+    returns either a run callable, or a (setup, run) pair in which case setup
+    is called before every run and its return value is passed to run, outside
+    of the timing, run may be a coroutine function and may return a dict of
+    extra values (e.g. simulation results) to store with the timings
+    """
+
+    __slots__ = ('name', 'func', 'sizes', 'per_item', 'repeat')
+
+    def __init__(
+            self,
+            name: str,
+            func: Callable,
+            sizes: Iterable[Optional[int]],
+            per_item: bool,
+            repeat: Optional[int],
+    ):
+        """initializer"""
+
+        self.name = name
+        self.func = func
+        self.sizes = tuple(sizes)
+        self.per_item = per_item
+        self.repeat = repeat
+
+
+    def label(self, size: Optional[int]) -> str:
+        return self.name if size is None else f'{self.name}[{size}]'
+
+
+# every benchmark, in registration order
+BENCHMARKS: List[Benchmark] = []
+
+
+def benchmark(
+        name: str,
+        sizes: Iterable[Optional[int]] = (None,),
+        per_item: bool = False,
+        repeat: Optional[int] = None,
+) -> Callable:
+    """
+    decorator registering a benchmark, per_item also reports the time and
+    throughput per item (size) and repeat overrides the amount of samples,
+    e.g. 1 for simulations that are only worth running once
+    """
+
+    def decorator(func):
+        BENCHMARKS.append(Benchmark(name, func, sizes, per_item, repeat))
+        return func
+
+    return decorator
+
+
+class Result:
+    """
+    class for the timings of a single benchmark at a single size
+    """
+
+    __slots__ = ('name', 'size', 'samples', 'number', 'extra', 'per_item')
+
+    def __init__(
+            self,
+            name: str,
+            size: Optional[int],
+            samples: List[float],
+            number: int,
+            extra: Optional[Dict[str, Any]] = None,
+            per_item: bool = False,
+    ):
+        """initializer"""
+
+        # seconds per call of each sample, and the amount of calls per sample
+        self.name = name
+        self.size = size
+        self.samples = samples
+        self.number = number
+        self.extra = extra or {}
+        self.per_item = per_item
+
+
+    @property
+    def min(self) -> float:
+        return min(self.samples)
+
+
+    @property
+    def median(self) -> float:
+        return statistics.median(self.samples)
+
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {
+            'size': self.size,
+            'min': self.min,
+            'median': self.median,
+            'mean': statistics.mean(self.samples),
+            'stdev': statistics.stdev(self.samples) if len(self.samples) > 1 else 0.0,
+            'samples': len(self.samples),
+            'number': self.number,
+        }
+        if self.per_item and self.size:
+            result['per_item'] = self.min / self.size
+            result['items_per_second'] = self.size / self.min if self.min else 0.0
+        if self.extra:
+            result['extra'] = self.extra
+        return result
+
+
+def _sampler(run: Callable, setup: Optional[Callable], loop: asyncio.AbstractEventLoop) -> Callable:
+    """
+    returns a function that calls run number times and returns (seconds, last return value)
+    """
+
+    is_async = inspect.iscoroutinefunction(run)
+    timer = time.perf_counter
+
+    if setup is None and not is_async:
+        def sample(number):
+            start = timer()
+            for _ in range(number):
+                value = run()
+            return timer() - start, value
+
+    elif setup is None:
+        async def calls(number):
+            start = timer()
+            for _ in range(number):
+                value = await run()
+            return timer() - start, value
+
+        def sample(number):
+            return loop.run_until_complete(calls(number))
+
+    # with a setup every call has to be timed on its own
+    elif not is_async:
+        def sample(number):
+            elapsed = 0.0
+            for _ in range(number):
+                state = setup()
+                start = timer()
+                value = run(state)
+                elapsed += timer() - start
+            return elapsed, value
+
+    else:
+        async def calls(number):
+            elapsed = 0.0
+            for _ in range(number):
+                state = setup()
+                if inspect.isawaitable(state):
+                    state = await state
+                start = timer()
+                value = await run(state)
+                elapsed += timer() - start
+            return elapsed, value
+
+        def sample(number):
+            return loop.run_until_complete(calls(number))
+
+    return sample
+
+
+def measure(
+        run: Callable,
+        setup: Optional[Callable] = None,
+        repeat: int = 5,
+        min_time: float = 0.2,
+        max_time: float = 30.0,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+) -> Tuple[List[float], int, Any]:
+    """
+    times run, returning (seconds per call of each sample, calls per sample, last return value)
+
+    the amount of calls per sample is picked so each sample takes about
+    min_time / repeat, and no more samples are taken once max_time has
+    passed (including setups), so the slowest benchmarks end up with a single
+    call and sample
+    """
+
+    sample = _sampler(run, setup, loop)
+    target = min_time / repeat
+    deadline = time.perf_counter() + max_time
+
+    # the garbage collector is disabled while timing, as timeit does
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+
+        # find the amount of calls per sample, the calibration runs count as samples
+        number = 1
+        while True:
+            elapsed, value = sample(number)
+            if elapsed >= target or time.perf_counter() >= deadline:
+                break
+            number = max(number * 2, int(number * target / max(elapsed, 1e-9) * 1.2))
+        samples = [elapsed / number]
+
+        while len(samples) < repeat and time.perf_counter() < deadline:
+            elapsed, value = sample(number)
+            samples.append(elapsed / number)
+    finally:
+        if enabled:
+            gc.enable()
+
+    return samples, number, value
+
+
+def _cancel_tasks(loop: asyncio.AbstractEventLoop) -> None:
+    """
+    cancels the tasks a benchmark left running, e.g. background drivers
+    """
+
+    tasks = asyncio.all_tasks(loop)
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+
+
+def run_benchmarks(
+        benchmarks: Iterable[Benchmark],
+        max_size: Optional[int] = None,
+        repeat: int = 5,
+        min_time: float = 0.2,
+        max_time: float = 30.0,
+        report: Callable[[Result], None] = None,
+) -> List[Result]:
+    """
+    runs benchmarks at every size up to max_size
+    """
+
+    results = []
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        for bench in benchmarks:
+            for size in bench.sizes:
+                if max_size is not None and size is not None and size > max_size:
+                    continue
+                try:
+                    case = bench.func() if size is None else bench.func(size)
+                    if inspect.isawaitable(case):
+                        case = loop.run_until_complete(case)
+                    setup, run = case if isinstance(case, tuple) else (None, case)
+                    samples, number, value = measure(
+                        run,
+                        setup,
+                        repeat=bench.repeat or repeat,
+                        min_time=min_time,
+                        max_time=max_time,
+                        loop=loop,
+                    )
+                except Exception as e:
+                    print(f'`Error: benchmark {bench.label(size)} failed: {e!r}`', file=sys.stderr)
+                    continue
+                finally:
+                    _cancel_tasks(loop)
+                result = Result(
+                    bench.label(size),
+                    size,
+                    samples,
+                    number,
+                    value if isinstance(value, dict) else None,
+                    bench.per_item,
+                )
+                results.append(result)
+                if report is not None:
+                    report(result)
+    finally:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+    return results
+
+
+def metadata() -> Dict[str, Any]:
+    """
+    returns details about the machine and interpreter, results are only comparable on the same ones
+    """
+
+    return {
+        'time': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+    }
+
+
+def to_json(results: Iterable[Result], meta: Dict[str, Any]) -> Dict[str, Any]:
+    return {'meta': meta, 'results': {result.name: result.to_dict() for result in results}}
+
+
+def write_json(data: Dict[str, Any], path: str) -> None:
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def read_json(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(
+        results: Dict[str, Dict[str, Any]],
+        baseline: Dict[str, Dict[str, Any]],
+        threshold: float = 0.25,
+) -> List[Tuple[str, float, float, float]]:
+    """
+    returns (name, baseline seconds, seconds, ratio) of every benchmark that
+    got more than threshold (e.g. 0.25 for 25%) slower than the baseline
+
+    the fastest sample is compared, as it's the least affected by whatever
+    else the machine was doing
+    """
+
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None or not old['min']:
+            continue
+        ratio = result['min'] / old['min']
+        if ratio > 1.0 + threshold:
+            regressions.append((name, old['min'], result['min'], ratio))
+    return regressions
+
+
+def format_seconds(seconds: float) -> str:
+    """
+    formats a duration with a sensible unit
+    """
+
+    if seconds < 1e-6:
+        return f'{seconds * 1e9:.0f}ns'
+    if seconds < 1e-3:
+        return f'{seconds * 1e6:.1f}µs'
+    if seconds < 1.0:
+        return f'{seconds * 1e3:.1f}ms'
+    return f'{seconds:.2f}s'
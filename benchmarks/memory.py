@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+reports how much memory a corpus of users holding copies of the same deck uses,
+and how much a single large pack's card layout costs
+
+    python benchmarks/memory.py                       200 users with the same 5k card deck, and a 1M card pack
+    python benchmarks/memory.py --users 1000 --cards 5000 --layout-cards 100000
+
+the deck is held in four ways: as separate lists of strings per user (what
+per-user copies of the text cost), as packs each built from their own copy of
+the rows into their own text buffer (as when users imported the same file),
+as packs built from their own rows into the shared text table (as when the
+copies of a cloned deck are loaded from storage), and as clones of a single
+pack (as when a deck is shared)
+
+the large pack, whose cards are all different, is held as a list of
+FlashCard objects with an attribute dict each (the layout CardPack used
+before it stored its cards in columns) and as a CardPack, which keeps its
+text in its own buffer, both are built from newly read rows and include
+the text they keep
+"""
+
+
+# standard library modules - typing
+from typing import Callable, List
+
+# standard library modules
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+
+# the benchmarks import the bot's modules the same way the bot does
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [HERE, os.path.join(os.path.dirname(HERE), 'packle')]
+
+
+def deck_rows(cards: int) -> List[tuple]:
+    """
+    returns newly created (question, answer) rows of the deck, the strings are
+    equal to every other call's but are different objects, like rows read from storage
+    """
+
+    return [
+        (f'What is the meaning of term number {i} in the shared deck?', f'Definition number {i}, as given in the deck')
+        for i in range(cards)
+    ]
+
+
+def measure(build: Callable[[], object]) -> int:
+    """
+    returns the bytes still allocated by build once it returns, while its result is alive
+    """
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    gc.collect()
+    return after - before
+
+
+class ObjectFlashCard:
+    """
+    the FlashCard that CardPack used to hold a list of, one object per card
+    """
+
+    def __init__(self, question: str, answer: str, proficiency: int = 1):
+        """initializer"""
+
+        self.question = str(question)
+        self.answer = str(answer)
+        self.proficiency = int(proficiency)
+        self.result = 1  # UNANSWERED
+
+
+def format_bytes(size: float) -> str:
+    for unit in ('B', 'KiB', 'MiB'):
+        if abs(size) < 1024:
+            return f'{size:.1f}{unit}'
+        size /= 1024
+    return f'{size:.1f}GiB'
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description='packle deck memory report')
+    parser.add_argument('--users', type=int, default=200, help='users holding the deck')
+    parser.add_argument('--cards', type=int, default=5000, help='cards in the deck')
+    parser.add_argument('--layout-cards', type=int, default=1000000, help='cards in the large pack (0 to skip it)')
+    args = parser.parse_args(argv)
+
+    from cardpack import CardPack
+    from fakes import FakeChannel, FakeUser
+    from texts import shared_texts
+
+    users = [FakeUser(f'user {i}') for i in range(args.users)]
+    channel = FakeChannel()
+
+    def copies():
+        return [deck_rows(args.cards) for _ in users]
+
+    def imported():
+        return [CardPack(deck_rows(args.cards), 'deck', user, channel) for user in users]
+
+    def loaded():
+        return [CardPack(deck_rows(args.cards), 'deck', user, channel, texts=shared_texts) for user in users]
+
+    def cloned():
+        deck = CardPack(deck_rows(args.cards), 'deck', users[0], channel)
+        return [deck] + [deck.clone(author=user) for user in users[1:]]
+
+    print(f'{args.users} users holding the same {args.cards} card deck')
+    print(f"{'':<22} {'total':>10} {'per user':>10}")
+    for name, build in (
+            ('separate copies', copies),
+            ('imported packs', imported),
+            ('loaded shared packs', loaded),
+            ('cloned packs', cloned),
+    ):
+        size = measure(build)
+        print(f'{name:<22} {format_bytes(size):>10} {format_bytes(size / args.users):>10}')
+
+    # the text shared by the cloned packs, while one copy of the deck is held
+    deck = CardPack(deck_rows(args.cards), 'deck', users[0], channel, texts=shared_texts)
+    stats = shared_texts.stats()
+    print(f"{'shared text':<22} {format_bytes(stats['text_bytes']):>10} ({stats['texts']} distinct texts)")
+    del deck
+
+    if args.layout_cards:
+        def objects():
+            return [ObjectFlashCard(question, answer) for question, answer in deck_rows(args.layout_cards)]
+
+        def columns():
+            return CardPack(deck_rows(args.layout_cards), 'deck', users[0], channel)
+
+        print(f'\n{args.layout_cards} card pack, including its text')
+        print(f"{'':<22} {'total':>10} {'per card':>10}")
+        for name, build in (('flashcard objects', objects), ('columns', columns)):
+            size = measure(build)
+            print(f'{name:<22} {format_bytes(size):>10} {format_bytes(size / args.layout_cards):>10}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+runs the benchmarks, saves the results as json, and flags regressions against a baseline
+
+    python benchmarks/run.py                      run everything, pack sizes up to 1M
+    python benchmarks/run.py --quick              sizes up to 10k with fewer samples
+    python benchmarks/run.py -k cardpack -k ui    only benchmarks whose names contain a pattern
+    python benchmarks/run.py --save-baseline      store the results as the new baseline
+
+the benchmarks run against the packle modules with a fake discord client,
+so discord.py and dpymenus need to be installed but no bot token is required,
+results are only comparable with a baseline from the same machine, so the
+baseline isn't checked in, save one before making changes and compare after
+"""
+
+
+# standard library modules - typing
+from typing import List
+
+# standard library modules
+import argparse
+import importlib
+import os
+import sys
+
+
+# the benchmarks import the bot's modules the same way the bot does
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [HERE, os.path.join(os.path.dirname(HERE), 'packle')]
+
+MODULES = (
+    'bench_cardpack',
+    'bench_ui',
+    'bench_scheduling',
+    'bench_reviewlog',
+    'bench_quiz',
+    'bench_reminders',
+    'bench_packfile',
+    'bench_workers',
+    'bench_profiler',
+    'bench_scoreboard',
+)
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='packle benchmarks')
+    parser.add_argument('-k', dest='patterns', action='append', default=[],
+                        help='only run benchmarks whose name contains this (repeatable)')
+    parser.add_argument('--quick', action='store_true',
+                        help='sizes up to 10k and fewer samples, for a fast check')
+    parser.add_argument('--max-size', type=int, default=None,
+                        help='skip sizes above this')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='samples per benchmark')
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help='seconds of timing per benchmark, spread over the samples')
+    parser.add_argument('--max-time', type=float, default=30.0,
+                        help='seconds after which a benchmark stops taking samples')
+    parser.add_argument('--output', default=os.path.join(HERE, 'results.json'),
+                        help='where to save the results')
+    parser.add_argument('--baseline', default=os.path.join(HERE, 'baseline.json'),
+                        help='results to compare against')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='also save the results as the baseline')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='slowdown that counts as a regression (0.25 = 25%%)')
+    parser.add_argument('--no-metrics', action='store_true',
+                        help='run with the metrics instrumentation disabled')
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.max_size = min(args.max_size or 10000, 10000)
+        args.repeat = min(args.repeat, 3)
+        args.min_time = min(args.min_time, 0.05)
+    return args
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+
+    # has to be set before the instrumented modules are imported
+    if args.no_metrics:
+        os.environ['PACKLE_METRICS'] = '0'
+
+    from harness import BENCHMARKS, compare, format_seconds, metadata, read_json, run_benchmarks, to_json, write_json
+    for module in MODULES:
+        importlib.import_module(module)
+
+    benchmarks = [
+        bench for bench in BENCHMARKS
+        if not args.patterns or any(pattern in bench.name for pattern in args.patterns)
+    ]
+
+    # find the length of the longest benchmark name for padding purposes
+    sz = max((len(bench.label(size)) for bench in benchmarks for size in bench.sizes), default=0)
+
+    def report(result):
+        line = f'{result.name:<{sz}}  {format_seconds(result.min):>9}  (median {format_seconds(result.median)}'
+        if result.per_item and result.size:
+            line += f', {format_seconds(result.min / result.size)}/item, {result.size / result.min:,.0f} items/s'
+        print(line + ')', flush=True)
+        for key, value in result.extra.items():
+            print(f"{' ' * (sz + 2)}{key}: {value:.4g}" if isinstance(value, float) else f"{' ' * (sz + 2)}{key}: {value}")
+
+    meta = metadata()
+    meta.update(quick=args.quick, metrics=not args.no_metrics)
+    results = run_benchmarks(
+        benchmarks,
+        max_size=args.max_size,
+        repeat=args.repeat,
+        min_time=args.min_time,
+        max_time=args.max_time,
+        report=report,
+    )
+    data = to_json(results, meta)
+    write_json(data, args.output)
+    print(f'\nresults saved to {args.output}')
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        baseline = read_json(args.baseline)
+        for key in ('machine', 'python', 'metrics'):
+            if baseline['meta'].get(key) != meta.get(key):
+                print(f'warning: the baseline was made with a different {key}, comparisons may be meaningless')
+        regressions = compare(data['results'], baseline['results'], args.threshold)
+        print(f'compared against {args.baseline}: {len(regressions)} regression(s)')
+        for name, old, new, ratio in regressions:
+            print(f'    {name}: {format_seconds(old)} -> {format_seconds(new)} ({ratio:.2f}x)')
+
+    if args.save_baseline:
+        write_json(data, args.baseline)
+        print(f'baseline saved to {args.baseline}')
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
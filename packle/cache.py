@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules - typing
+from __future__ import annotations  # fixes some typehinting issues
+from typing import Callable, Dict, Optional, Tuple, Union
+
+# standard library modules
+import collections
+import time
+
+# third-party packages - discord related
+import discord
+from discord.ext import commands
+
+
+class UserCache:
+    """
+    bounded LRU cache of discord users with a time to live
+
+    lookups try the member sent with a gateway event, then this cache, then
+    the client's gateway cache, and only fall back to a REST fetch on a miss
+    """
+
+    def __init__(
+            self,
+            bot: commands.Bot,
+            maxsize: int = 10000,
+            ttl: float = 3600.0,
+            clock: Callable[[], float] = time.monotonic,
+    ):
+        """initializer"""
+
+        self.bot = bot
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+
+        # user_id: (expiry time, user), least recently used first
+        self._users: collections.OrderedDict[int, Tuple[float, Union[discord.User, discord.Member]]] = (
+            collections.OrderedDict()
+        )
+
+        # metrics
+        self.hits = 0
+        self.gateway_hits = 0
+        self.misses = 0
+
+
+    def __len__(self):
+        return len(self._users)
+
+
+    def stats(self) -> Dict[str, int]:
+        """
+        returns the hit and miss counters
+        """
+
+        return {
+            'size': len(self),
+            'hits': self.hits,
+            'gateway_hits': self.gateway_hits,
+            'misses': self.misses,
+        }
+
+
+    def put(self, user: Union[discord.User, discord.Member]) -> None:
+        """
+        adds or refreshes a user in the cache
+        """
+
+        self._users[user.id] = (self.clock() + self.ttl, user)
+        self._users.move_to_end(user.id)
+        while len(self._users) > self.maxsize:
+            self._users.popitem(last=False)
+
+
+    def get_cached(self, user_id: int) -> Optional[Union[discord.User, discord.Member]]:
+        """
+        returns a user without making any requests, or None if it isn't cached
+        """
+
+        entry = self._users.get(user_id)
+        if entry is not None:
+            expiry, user = entry
+            if expiry > self.clock():
+                self._users.move_to_end(user_id)
+                self.hits += 1
+                return user
+            del self._users[user_id]
+
+        user = self.bot.get_user(user_id)
+        if user is not None:
+            self.gateway_hits += 1
+            self.put(user)
+        return user
+
+
+    async def get(
+            self,
+            user_id: int,
+            member: Optional[discord.Member] = None,
+    ) -> Union[discord.User, discord.Member]:
+        """
+        returns a user, only fetching it from discord if it isn't cached anywhere
+        """
+
+        # members sent along with gateway events are always the freshest
+        if member is not None:
+            self.gateway_hits += 1
+            self.put(member)
+            return member
+
+        user = self.get_cached(user_id)
+        if user is not None:
+            return user
+
+        self.misses += 1
+        user = await self.bot.fetch_user(user_id)
+        self.put(user)
+        return user
@@ -4,21 +4,38 @@
 # standard library modules - typing
 from __future__ import annotations  # fixes some typehinting issues
 from typing import TYPE_CHECKING  # fixes some typehinting issues
-from typing import Union, List
+from typing import Union, Dict, Iterable, List, Optional, Sequence, Tuple
 
 # standard library modules
+from array import array
+import collections
 import enum
+import itertools
+import operator
 import random
+import sys
+import time
 
 # third-party packages - discord related
 import discord
 
+# local modules
+from metrics import timed
+from scheduling import RoundScheduler, Scheduler
+from texts import TextBuffer, TextColumns, TextTable, shared_texts
+
 
 class FlashCard:
     """
     class for storing information for a specific flashcard
+
+    a FlashCard either holds its own values (when created directly or popped
+    from a pack) or is a lightweight view of a single row in a CardPack's
+    columns, views are only valid until the pack's cards are removed/reordered
     """
 
+    __slots__ = ('_pack', '_index', '_question', '_answer', '_proficiency', '_result')
+
     class Result(enum.Enum):
         UNANSWERED = enum.auto()
         CORRECT = enum.auto()
@@ -32,17 +49,124 @@ class FlashCard:
     ):
         """initializer"""
 
-        self.question = str(question)
-        self.answer = str(answer)
-        self.proficiency = int(proficiency)
-        self.result = FlashCard.Result.UNANSWERED
+        self._pack = None
+        self._index = -1
+        self._question = sys.intern(str(question))
+        self._answer = sys.intern(str(answer))
+        self._proficiency = int(proficiency)
+        self._result = FlashCard.Result.UNANSWERED.value
+
+
+    @classmethod
+    def _view(cls, pack: CardPack, index: int) -> FlashCard:
+        """
+        creates a FlashCard that reads and writes row index of pack's columns
+        """
+
+        card = cls.__new__(cls)
+        card._pack = pack
+        card._index = index
+        return card
+
+
+    @classmethod
+    def _detached(cls, question: str, answer: str, proficiency: int, result: int) -> FlashCard:
+        """
+        creates a FlashCard holding its own copy of a row's values
+        """
+
+        card = cls.__new__(cls)
+        card._pack = None
+        card._index = -1
+        card._question = question
+        card._answer = answer
+        card._proficiency = proficiency
+        card._result = result
+        return card
+
+
+    @property
+    def question(self) -> str:
+        if self._pack is None:
+            return self._question
+        return self._pack._texts[self._pack._questions[self._index]]
+
+
+    @property
+    def answer(self) -> str:
+        if self._pack is None:
+            return self._answer
+        return self._pack._texts[self._pack._answers[self._index]]
+
+
+    @property
+    def proficiency(self) -> int:
+        if self._pack is None:
+            return self._proficiency
+        return self._pack._proficiency[self._index]
+
+
+    @proficiency.setter
+    def proficiency(self, value: int):
+        if self._pack is None:
+            self._proficiency = int(value)
+        else:
+            self._pack._set_proficiency(self._index, value)
+
+
+    @property
+    def result(self) -> FlashCard.Result:
+        if self._pack is None:
+            return FlashCard.Result(self._result)
+        return FlashCard.Result(self._pack._results[self._index])
+
+
+    @result.setter
+    def result(self, value: FlashCard.Result):
+        if self._pack is None:
+            self._result = value.value
+        else:
+            self._pack._set_result(self._index, value.value)
 
 
 class CardPack:
     """
     class for holding and using flashcards
+
+    cards are stored column-wise rather than as FlashCard objects, the text as
+    arrays of ids into the pack's own TextBuffer, and the proficiencies and
+    results in int8 arrays, once a pack is cloned its text is moved into the
+    content-addressed TextTable shared with every other copy of the deck
+
+    the pack also keeps a bucket of card indexes per proficiency level and a
+    tally of results per level, both updated incrementally on every change so
+    rounds never have to rescan the whole pack
+
+    snapshots share the pack's columns, so the columns are copied the first
+    time a card is changed or removed after a snapshot has been taken
+
+    which cards make up each round is decided by the pack's scheduler, by
+    default the fixed round table of proficiency levels
     """
 
+    # highest proficiency that fits in the int8 proficiency column
+    MAX_PROFICIENCY = 127
+
+    # proficiency change for each FlashCard.Result value when advancing rounds
+    RESULT_DELTAS = (0, 0, 1, -1)
+
+    # lookup table clamping proficiency + delta (0 to MAX_PROFICIENCY + 1) back into range
+    CLAMPED = (1,) + tuple(range(1, MAX_PROFICIENCY + 1)) + (MAX_PROFICIENCY,)
+
+    # proficiency level at which a card is mastered
+    MASTERED = 4
+
+    # result of new cards, looked up once as it's needed for every card added
+    UNANSWERED = FlashCard.Result.UNANSWERED.value
+
+    # texts a pack's buffer may hold per text its cards refer to before popping a card compacts it
+    MAX_BUFFER_WASTE = 2
+
     class Round:
 
         # spaced repetition proficiency levels by round
@@ -64,17 +188,24 @@ class CardPack:
 
             self.pack = pack
             self.active = True
-            self._indexes = []
+
+            # indexes of the round's cards in the pack, in the order they're studied
+            self._indexes = array('i')
             self.setup_round()
 
 
         @property
         def unstudied(self) -> int:
-            cnt = 0
-            for card in self:
-                if card.result == FlashCard.Result.UNANSWERED:
-                    cnt += 1
-            return cnt
+            unanswered = FlashCard.Result.UNANSWERED.value
+            levels = self.pack.scheduler.levels(self.pack)
+            if levels is None:
+                results = self.pack._results
+                return sum(results[i] == unanswered for i in self._indexes)
+            return sum(
+                self.pack._tally[level][unanswered]
+                for level in levels
+                if level in self.pack._tally
+            )
 
 
         @property
@@ -83,26 +214,64 @@ class CardPack:
             checks if all FlashCards in this round have been answered
             """
 
-            for card in self:
-                if card.result == FlashCard.Result.UNANSWERED:
-                    return False
-            return True
+            return self.unstudied == 0
 
 
-        def setup_round(self):
+        def setup_round(self, now: float = None):
             """
-            adds all FlashCards matching the current round's proficiency levels
+            adds all FlashCards the pack's scheduler picks for this round
+            (by default the ones matching the round's proficiency levels)
             then randomizes their order
             """
 
-            self._indexes.clear()
-            cur_round = self.ROUNDS[self.pack.round_index]
-            for index, card in enumerate(self.pack):
-                if card.proficiency in cur_round:
-                    self._indexes.append(index)
+            now = time.time() if now is None else now
+            self._indexes = array('i', self.pack.scheduler.select(self.pack, now))
             self.shuffle()
 
 
+        def _insert(self, index: int):
+            """
+            adds a FlashCard to this round at a random position
+            """
+
+            self._indexes.append(index)
+            j = random.randrange(len(self._indexes))
+            self._indexes[-1], self._indexes[j] = self._indexes[j], index
+
+
+        def _insert_many(self, indexes: Iterable[int]):
+            """
+            adds FlashCards to this round, each at a random position
+            """
+
+            order = self._indexes
+            rand = random.random
+            for index in indexes:
+                order.append(index)
+                j = int(rand() * len(order))
+                order[-1] = order[j]
+                order[j] = index
+
+
+        def _discard(self, index: int):
+            """
+            removes a FlashCard from this round if it's in it
+            """
+
+            try:
+                self._indexes.remove(index)
+            except ValueError:
+                pass
+
+
+        def _pop(self, index: int):
+            """
+            removes a FlashCard that was popped from the pack and shifts the indexes after it
+            """
+
+            self._indexes = array('i', [i - (i > index) for i in self._indexes if i != index])
+
+
         def __getitem__(self, i: int) -> FlashCard:
             """
             overloads the index operator for this class
@@ -129,7 +298,11 @@ class CardPack:
             in-place order randomization of the FlashCards in this round
             """
 
-            random.shuffle(self._indexes)
+            # shuffling a list then converting it back is faster than shuffling the array in place
+            indexes = self._indexes.tolist()
+            random.shuffle(indexes)
+            self._indexes = array('i', indexes)
+            self.pack.version += 1
 
 
     def __init__(
@@ -140,13 +313,36 @@ class CardPack:
             dm_channel: discord.DMChannel,
             category: str = 'No Category',
             difficulty: str = 'No Difficulty',
+            round_index: int = 0,
+            scheduler: Scheduler = None,
+            texts: Union[TextBuffer, TextTable] = None,
     ):
         """initializer"""
 
-        self.__cards: List[FlashCard] = []
+        # card columns, the question and answer columns hold text ids owned by self._columns
+        self._texts = TextBuffer() if texts is None else texts
+        self._columns = TextColumns(self._texts)
+        self._questions = self._columns.questions
+        self._answers = self._columns.answers
+        self._proficiency = array('b')
+        self._results = array('b')
+
+        # card indexes by proficiency level, each card's position in its bucket,
+        # and the amount of cards with each result by proficiency level
+        self._buckets: Dict[int, array] = {}
+        self._slots = array('i')
+        self._tally: Dict[int, List[int]] = {}
+
+        # whether the columns are shared with a PackSnapshot
+        self._shared = False
+
+        # incremented on every change to the cards or their order, so anything
+        # derived from the pack (e.g. rendered embeds) can tell when it's outdated
+        self.version = 0
 
         # current round
-        self.__round_index = 0
+        self.scheduler = scheduler or RoundScheduler()
+        self.__round_index = int(round_index) % len(CardPack.Round.ROUNDS)
         self.round = CardPack.Round(self)
 
         # full pack
@@ -162,6 +358,11 @@ class CardPack:
         self.dm_channel = dm_channel
         self.remind_channel = self.dm_channel
 
+        # ids of the channels as they were last stored, kept for when the
+        # channels can't be resolved (e.g. before the bot's cache is filled)
+        self.dm_channel_id: Optional[int] = getattr(dm_channel, 'id', None)
+        self.remind_channel_id: Optional[int] = self.dm_channel_id
+
 
     @property
     def round_index(self):
@@ -178,75 +379,332 @@ class CardPack:
         returns whether or not all cards are at proficiency level 4 (mastered)
         """
 
-        for card in self:
-            if card.proficiency < 4:
-                return False
-        return True
+        return not any(self._buckets.get(level) for level in range(1, self.MASTERED))
+
+
+    @staticmethod
+    def _clamp(proficiency: int) -> int:
+        """
+        keeps a proficiency within the range of the proficiency column
+        """
+
+        return max(1, min(int(proficiency), CardPack.MAX_PROFICIENCY))
+
+
+    @staticmethod
+    def _row(card) -> Tuple[str, str, int, int]:
+        """
+        converts a FlashCard or a (question, answer[, proficiency]) sequence into a column row
+        """
+
+        if isinstance(card, FlashCard):
+            return card.question, card.answer, CardPack._clamp(card.proficiency), card.result.value
+        return CardPack._fields(*card)
+
+
+    @staticmethod
+    def _fields(question: str, answer: str, proficiency: int = 1) -> Tuple[str, str, int, int]:
+        """
+        converts FlashCard initializer arguments into a column row without creating a FlashCard
+        """
+
+        # proficiencies already in range (e.g. validated by the importer) skip clamping
+        if type(proficiency) is not int or not 1 <= proficiency <= CardPack.MAX_PROFICIENCY:
+            proficiency = CardPack._clamp(proficiency)
+        return str(question), str(answer), proficiency, CardPack.UNANSWERED
 
 
-    def next_round(self):
+    @timed('packle_cardpack_seconds', op='next_round')
+    def next_round(self, now: float = None):
         """
         cleans up current round and then sets up a new one
         """
 
-        # set new proficiencies for the current cards before advancing rounds
-        for card in self.__cards:
-            if card.result == FlashCard.Result.CORRECT:
-                card.proficiency += 1
-                card.result = FlashCard.Result.UNANSWERED
-            elif card.result == FlashCard.Result.INCORRECT:
-                card.proficiency -= 1
-                if card.proficiency < 1:
-                    card.proficiency = 1
-                card.result = FlashCard.Result.UNANSWERED
+        now = time.time() if now is None else now
+        answered = self._reschedule(now)
+        self._advance(answered, self.transition(self._proficiency, self._results))
+        self.round.setup_round(now)
+
+
+    def _reschedule(self, now: float, answered: Sequence[int] = None) -> Sequence[int]:
+        """
+        reschedules the answered cards, returning their indexes
+        """
+
+        unanswered = FlashCard.Result.UNANSWERED.value
+        correct = FlashCard.Result.CORRECT.value
+        if answered is None:
+            answered = list(itertools.compress(range(len(self)), map(unanswered.__ne__, self._results)))
+        results = map(self._results.__getitem__, answered)
+        self.scheduler.review_batch(self, answered, map(correct.__eq__, results), now)
+        return answered
+
+
+    def _advance(self, answered: Sequence[int], new: array, index: Tuple[Dict[int, array], array] = None):
+        """
+        moves on to the next round index with the new proficiency column (see transition),
+        and optionally its (buckets, slots) index (see index_levels) instead of updating
+        the current one, the new round still has to be set up
+        """
+
+        # set new proficiencies for the current cards before advancing rounds,
+        # done as whole column operations so no python code runs per card
+        unanswered = FlashCard.Result.UNANSWERED.value
+        old = self._proficiency
+        self._proficiency = new
+        self._results = array('b', [unanswered]) * len(self)
+
+        # only the answered cards can have changed level
+        if index is None:
+            for i in answered:
+                if old[i] != new[i]:
+                    self._unindex(i, old[i])
+                    self._index(i, new[i])
+        else:
+            self._buckets, self._slots = index
+        self._tally = {level: [0, len(bucket), 0, 0] for level, bucket in self._buckets.items()}
+        self.version += 1
 
         # increment the round index, wrapping around to 0 when required
         self.__round_index += 1
         if self.__round_index == len(CardPack.Round.ROUNDS):
             self.__round_index = 0
-        self.round.setup_round()
 
 
-    def reset(self):
+    @staticmethod
+    def transition(proficiency: array, results: array) -> array:
+        """
+        returns the proficiency column after applying a column of results,
+        correct answers go up a level and incorrect ones down a level (min 1)
+        """
+
+        deltas = map(CardPack.RESULT_DELTAS.__getitem__, results)
+        return array('b', map(CardPack.CLAMPED.__getitem__, map(operator.add, proficiency, deltas)))
+
+
+    @staticmethod
+    def index_levels(proficiency: array) -> Tuple[Dict[int, array], array]:
+        """
+        returns the buckets of card indexes by proficiency level and each card's slot in its bucket
+        """
+
+        buckets = {
+            level: array('i', itertools.compress(range(len(proficiency)), map(level.__eq__, proficiency)))
+            for level in sorted(set(proficiency))
+        }
+        slots = array('i', [0]) * len(proficiency)
+        for bucket in buckets.values():
+            for slot, i in enumerate(bucket):
+                slots[i] = slot
+        return buckets, slots
+
+
+    @timed('packle_cardpack_seconds', op='reset')
+    def reset(self, now: float = None):
         """
-        resets the card proficiencies and round index
+        resets the card proficiencies, their schedules, and round index
         """
 
-        for card in self.__cards:
-            card.proficiency = 1
+        now = time.time() if now is None else now
+        self.scheduler.reset(self, now)
+        self._proficiency = array('b', [1]) * len(self)
+        self._buckets = {1: array('i', range(len(self)))} if self else {}
+        self._slots = array('i', range(len(self)))
+        self._tally = {1: [0] + [self._results.count(value) for value in (1, 2, 3)]} if self else {}
         self.__round_index = 0
-        self.round.setup_round()
+        self.round.setup_round(now)
+
+
+    def set_scheduler(self, scheduler: Scheduler, now: float = None):
+        """
+        switches to a different scheduler and sets up the current round again with it
+        """
+
+        now = time.time() if now is None else now
+        self.scheduler = scheduler
+        scheduler.extended(self, 0, now)
+        self.round.setup_round(now)
+        self.version += 1
+
+
+    def _index(self, i: int, level: int):
+        """
+        adds card i to the bucket and tally of a proficiency level
+        """
+
+        bucket = self._buckets.get(level)
+        if bucket is None:
+            bucket = self._buckets[level] = array('i')
+            self._tally[level] = [0, 0, 0, 0]
+        self._slots[i] = len(bucket)
+        bucket.append(i)
+        self._tally[level][self._results[i]] += 1
+
+
+    def _unindex(self, i: int, level: int):
+        """
+        removes card i from the bucket and tally of a proficiency level
+        """
+
+        # swap the last card in the bucket into the removed card's slot
+        bucket = self._buckets[level]
+        slot = self._slots[i]
+        last = bucket.pop()
+        if last != i:
+            bucket[slot] = last
+            self._slots[last] = slot
+        self._tally[level][self._results[i]] -= 1
+        if not bucket:
+            del self._buckets[level]
+            del self._tally[level]
+
+
+    def _set_proficiency(self, i: int, value: int):
+        """
+        changes the proficiency of card i, keeping the index and round in sync
+        """
+
+        old = self._proficiency[i]
+        new = self._clamp(value)
+        if old == new:
+            return
+        self._unshare()
+        self._unindex(i, old)
+        self._proficiency[i] = new
+        self._index(i, new)
+        self.version += 1
+        self.scheduler.proficiency_changed(self, i, old, new)
+
+
+    def _set_result(self, i: int, value: int):
+        """
+        changes the result of card i, keeping the tally in sync
+        """
+
+        self._unshare()
+        tally = self._tally[self._proficiency[i]]
+        tally[self._results[i]] -= 1
+        tally[value] += 1
+        self._results[i] = value
+        self.version += 1
+
+
+    def _unshare(self):
+        """
+        copies the columns if they're shared with a snapshot, before they're changed in place
+        """
+
+        if self._shared:
+            self._columns = self._columns.copy()
+            self._questions = self._columns.questions
+            self._answers = self._columns.answers
+            self._proficiency = array('b', self._proficiency)
+            self._results = array('b', self._results)
+            self._shared = False
+
+
+    def snapshot(self) -> PackSnapshot:
+        """
+        returns a read-only snapshot of every FlashCard in this pack without copying them
+        """
+
+        return PackSnapshot(self, range(len(self)))
+
+
+    def clone(
+            self,
+            name: str = None,
+            author: Union[discord.Member, discord.User] = None,
+            dm_channel: discord.DMChannel = None,
+    ) -> CardPack:
+        """
+        returns an unstudied copy of this pack, e.g. for another user,
+        the copy shares the cards' text so only the text ids are copied
+        """
+
+        self._share_texts()
+        pack = CardPack(
+            (),
+            name=self.name if name is None else name,
+            author=self.author if author is None else author,
+            dm_channel=dm_channel,
+            category=self.category,
+            difficulty=self.difficulty,
+            texts=shared_texts,
+        )
+        unanswered = FlashCard.Result.UNANSWERED.value
+        pack._append(
+            self._texts.share(self._questions),
+            self._texts.share(self._answers),
+            array('b', [1]) * len(self),
+            array('b', [unanswered]) * len(self),
+        )
+        return pack
+
+
+    def _share_texts(self):
+        """
+        moves the cards' text from the pack's buffer into the shared text table,
+        snapshots keep the buffer and columns
+        """
+
+        if not isinstance(self._texts, TextBuffer):
+            return
+
+        # each distinct text is acquired once, then the cards share its id
+        buffer, (questions, answers) = self._texts.compact(self._questions, self._answers)
+        ids = shared_texts.acquire(map(buffer.__getitem__, range(len(buffer))))
+        try:
+            self._columns = TextColumns(
+                shared_texts,
+                shared_texts.share(map(ids.__getitem__, questions)),
+                shared_texts.share(map(ids.__getitem__, answers)),
+            )
+        finally:
+            shared_texts.release(ids)
+        self._texts = shared_texts
+        self._questions = self._columns.questions
+        self._answers = self._columns.answers
 
 
     def __getitem__(self, s: Union[int, slice]):
         """
         overloads the index operator for this class
         used for indexing, slicing, and iteration
+
+        slices are read-only snapshots of the cards
         """
 
         if isinstance(s, int):
-            return self.__cards[s]
+            if s < 0:
+                s += len(self)
+            if not 0 <= s < len(self):
+                raise IndexError('card index out of range')
+            return FlashCard._view(self, s)
 
         elif isinstance(s, slice):
-            return CardPack(
-                self.__cards[s],
-                name=self.name,
-                category=self.category,
-                author=self.author,
-                difficulty=self.difficulty,
-            )
+            return PackSnapshot(self, range(len(self))[s])
 
         else:
             raise TypeError('s must be of type int or slice')
 
 
+    def __iter__(self):
+        """
+        iterates over views of every FlashCard in this pack
+        """
+
+        for i in range(len(self)):
+            yield FlashCard._view(self, i)
+
+
     def __len__(self):
         """
         sets the length/size of this class,
         used for iteration, truthiness, len function, etc
         """
 
-        return len(self.__cards)
+        return len(self._questions)
 
 
     def __iadd__(self, card: FlashCard):
@@ -255,22 +713,56 @@ class CardPack:
         """
 
         if isinstance(card, FlashCard):
-            self.__cards += card
-            self.round.setup_round()
-            return
+            self.extend((card,))
+            return self
         raise TypeError('card must be type FlashCard')
 
 
+    @timed('packle_cardpack_seconds', op='pop')
     def pop(self, i):
         """
         removes the FlashCard at index i and returns it
         """
 
-        card = self.__cards.pop(i)
-        self.round.setup_round()
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('pop index out of range')
+
+        # remove the card from the index, then shift the indexes after it down
+        self._unshare()
+        self._unindex(i, self._proficiency[i])
+        self._slots.pop(i)
+        for level, bucket in self._buckets.items():
+            self._buckets[level] = array('i', [j - (j > i) for j in bucket])
+        self.round._pop(i)
+        self.version += 1
+
+        question = self._questions.pop(i)
+        answer = self._answers.pop(i)
+        card = FlashCard(self._texts[question], self._texts[answer], self._proficiency.pop(i))
+        card._result = self._results.pop(i)
+        self._texts.release((question, answer))
+
+        # popped cards' text stays in the buffer, until it's mostly text that isn't used
+        if isinstance(self._texts, TextBuffer) and len(self._texts) > self.MAX_BUFFER_WASTE * 2 * len(self) + 64:
+            self._compact()
+        self.scheduler.popped(self, i)
         return card
 
 
+    def _compact(self):
+        """
+        moves the cards' text into a new buffer without the texts of popped cards,
+        snapshots keep the old buffer and columns
+        """
+
+        self._texts, (questions, answers) = self._texts.compact(self._questions, self._answers)
+        self._columns = TextColumns(self._texts, questions, answers)
+        self._questions = questions
+        self._answers = answers
+
+
     def append(self, card: FlashCard):
         """
         adds on FlashCard into this pack
@@ -279,14 +771,157 @@ class CardPack:
         return self.__iadd__(card)
 
 
+    @timed('packle_cardpack_seconds', op='extend')
     def extend(self, cards):
         """
         extends this pack with an iterable of FlashCards
+        or (question, answer[, proficiency]) sequences
+        """
+
+        rows = list(map(self._row, cards))
+        if not rows:
+            return
+        questions, answers, proficiency, results = zip(*rows)
+        self._append(self._texts.acquire(questions), self._texts.acquire(answers), proficiency, results)
+
+
+    def _append(self, questions: array, answers: array, proficiency: Sequence[int], results: Sequence[int]):
+        """
+        appends whole columns of cards at once, the question and answer ids must already be acquired
         """
 
-        for card in cards:
-            if isinstance(card, FlashCard):
-                self.__cards.append(card)
+        start = len(self)
+        self._questions.extend(questions)
+        self._answers.extend(answers)
+        self._proficiency.extend(proficiency)
+        self._results.extend(results)
+        self._slots.extend(array('i', [0]) * len(questions))
+        self.version += 1
+
+        # index the new cards a level at a time, then let the scheduler add the ones in the current round to it
+        new = range(start, len(self))
+        tally = collections.Counter(zip(proficiency, results))
+        slots = self._slots
+        for level in {level for level, _ in tally}:
+            bucket = self._buckets.get(level)
+            if bucket is None:
+                bucket = self._buckets[level] = array('i')
+                self._tally[level] = [0, 0, 0, 0]
+            indexes = array('i', itertools.compress(new, map(level.__eq__, proficiency)))
+            if len(indexes) == len(new):
+                slots[start:] = array('i', range(len(bucket), len(bucket) + len(indexes)))
             else:
-                self.__cards.append(FlashCard(*card))
-        self.round.setup_round()
+                for slot, i in enumerate(indexes, len(bucket)):
+                    slots[i] = slot
+            bucket.extend(indexes)
+        for (level, result), count in tally.items():
+            self._tally[level][result] += count
+        self.scheduler.extended(self, start, time.time())
+
+
+class PackSnapshot:
+    """
+    class for a read-only view of some of a CardPack's cards at a point in time
+
+    the snapshot references the pack's columns and a range or array of card
+    indexes instead of copying the cards, the pack copies its columns before
+    changing them again so the snapshot never changes
+    """
+
+    __slots__ = (
+        'pack', 'version', 'name', 'author', 'category', 'difficulty', '_texts', '_columns',
+        '_questions', '_answers', '_proficiency', '_results', '_indexes', '__weakref__',
+    )
+
+    def __init__(
+            self,
+            pack: CardPack,
+            indexes: Sequence[int],
+    ):
+        """initializer"""
+
+        pack._shared = True
+        self.pack = pack
+        self.version = pack.version
+        self.name = pack.name
+        self.author = pack.author
+        self.category = pack.category
+        self.difficulty = pack.difficulty
+
+        # holding the pack's text columns keeps their texts alive for as long as the snapshot
+        self._texts = pack._texts
+        self._columns = pack._columns
+        self._questions = pack._questions
+        self._answers = pack._answers
+        self._proficiency = pack._proficiency
+        self._results = pack._results
+        self._indexes = indexes
+
+
+    @property
+    def outdated(self) -> bool:
+        """
+        returns whether the pack has changed since this snapshot was taken
+        """
+
+        return self.pack.version != self.version
+
+
+    def __getitem__(self, s: Union[int, slice]):
+        """
+        overloads the index operator for this class
+        used for indexing, slicing, and iteration
+
+        cards are detached copies, so changing them doesn't change the snapshot or the pack
+        """
+
+        if isinstance(s, int):
+            i = self._indexes[s]
+            return FlashCard._detached(
+                self._texts[self._questions[i]],
+                self._texts[self._answers[i]],
+                self._proficiency[i],
+                self._results[i],
+            )
+
+        elif isinstance(s, slice):
+            snapshot = PackSnapshot.__new__(PackSnapshot)
+            for attr in PackSnapshot.__slots__[:-1]:
+                setattr(snapshot, attr, getattr(self, attr))
+            snapshot._indexes = self._indexes[s]
+            return snapshot
+
+        else:
+            raise TypeError('s must be of type int or slice')
+
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+    def __len__(self):
+        return len(self._indexes)
+
+
+    def to_pack(self, dm_channel: Optional[discord.DMChannel] = None) -> CardPack:
+        """
+        copies the snapshot's cards into a new CardPack, sharing their text
+        """
+
+        pack = CardPack(
+            (),
+            name=self.name,
+            author=self.author,
+            dm_channel=dm_channel,
+            category=self.category,
+            difficulty=self.difficulty,
+            texts=self._texts,
+        )
+        pack._append(
+            self._texts.share(map(self._questions.__getitem__, self._indexes)),
+            self._texts.share(map(self._answers.__getitem__, self._indexes)),
+            array('b', map(self._proficiency.__getitem__, self._indexes)),
+            array('b', map(self._results.__getitem__, self._indexes)),
+        )
+        return pack
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules
+import collections
+import io
+import time
+
+# third-party packages - discord related
+import discord
+from discord.ext import commands
+
+# local modules
+import metrics
+from constants import Colors
+from outbound import Priority
+from packlebot import Packle
+from texts import shared_texts
+from utils import send_error_msg
+
+
+def format_seconds(seconds: float) -> str:
+    """
+    formats a latency with a sensible unit
+    """
+
+    if seconds < 1e-3:
+        return f'{seconds * 1e6:.0f}µs'
+    if seconds < 1.0:
+        return f'{seconds * 1e3:.1f}ms'
+    return f'{seconds:.2f}s'
+
+
+class Owner(commands.Cog, name='owner'):
+
+    def __init__(self, bot: Packle) -> None:
+        """initializer"""
+
+        self.bot = bot
+
+
+    async def cog_check(self, ctx: commands.Context) -> bool:
+        """
+        every command in this cog is for the bot owner only
+        """
+
+        return await self.bot.is_owner(ctx.author)
+
+
+    @commands.command(
+        description='bot metrics (owner only)',
+        help='Shows latency percentiles, request counts and queue depths.',
+        hidden=True,
+    )
+    async def stats(self, ctx: commands.Context) -> None:
+        """
+        sends a summary of the bot's metrics
+        """
+
+        embed = discord.Embed(
+            title='Packle Stats',
+            color=Colors.info,
+        )
+
+        # latency percentiles of every histogram
+        registry = metrics.registry
+        lines = []
+        for (name, labels), histogram in sorted(registry.histograms().items()):
+            if not histogram.count:
+                continue
+            label = ','.join(value for _, value in labels)
+            lines.append(
+                f'{name.replace("packle_", "")}{f"[{label}]" if label else ""}: '
+                f'n={histogram.count} '
+                f'p50={format_seconds(histogram.quantile(0.5))} '
+                f'p99={format_seconds(histogram.quantile(0.99))} '
+                f'max={format_seconds(histogram.max)}'
+            )
+        value = '\n'.join(lines) if registry.enabled else 'metrics are disabled'
+        embed.add_field(name='Latency', value=f'```\n{value[:1000] or "no data"}\n```', inline=False)
+
+        # counters
+        lines = []
+        for (name, labels), counter in sorted(registry.counters().items()):
+            label = ','.join(value for _, value in labels)
+            lines.append(f'{name.replace("packle_", "")}{f"[{label}]" if label else ""}: {counter.value}')
+        embed.add_field(name='Counters', value=f'```\n{chr(10).join(lines)[:1000] or "no data"}\n```', inline=False)
+
+        # component stats
+        components = {
+            'outbound': self.bot.outbound.stats(),
+            'user cache': self.bot.user_cache.stats(),
+            'reviews': self.bot.reviews.stats(),
+            'reminders': {'scheduled': len(self.bot.reminders)},
+            'packs': {'cached': len(self.bot.packs), 'conflicts': getattr(self.bot.packs, 'conflicts', 0)},
+            'card text': shared_texts.stats(),
+            'workers': self.bot.workers.stats(),
+            'event loop': self.bot.profiler.stats(),
+        }
+        quiz = self.bot.get_cog('quiz_mode')
+        if quiz is not None:
+            components['quizzes'] = {'running': len(quiz.sessions), 'advancing': quiz.sessions.in_flight}
+        for name, values in components.items():
+            value = '\n'.join(
+                f'{key}: {value:.3f}' if isinstance(value, float) else f'{key}: {value}'
+                for key, value in values.items()
+            )
+            embed.add_field(name=name.title(), value=value, inline=True)
+
+        await self.bot.outbound.send(ctx, Priority.INTERACTIVE, embed=embed)
+
+
+    @commands.command(
+        description='event loop profile (owner only)',
+        help=(
+            'Samples what the event loop is doing for a number of seconds (default 10, max 60) '
+            'and sends it as collapsed stacks for flame graph tools, along with the latest slow callbacks.'
+        ),
+        hidden=True,
+    )
+    async def profile(self, ctx: commands.Context, seconds: float = 10.0) -> None:
+        """
+        sends a sampled flame graph profile of the event loop
+        """
+
+        seconds = max(1.0, min(60.0, seconds))
+        try:
+            stacks = await self.bot.profiler.sample(seconds)
+        except RuntimeError as e:
+            return await send_error_msg(ctx, str(e).capitalize())
+
+        # what the samples were spent on, by owner (the root of each stack)
+        owners = collections.Counter()
+        for line in stacks.splitlines():
+            stack, count = line.rsplit(' ', 1)
+            owners[stack.split(';', 1)[0]] += int(count)
+
+        embed = discord.Embed(
+            title='Packle Profile',
+            description=f'{sum(owners.values())} samples over {seconds:g}s',
+            color=Colors.info,
+        )
+        value = '\n'.join(f'{name}: {count}' for name, count in owners.most_common(10))
+        embed.add_field(name='Samples', value=f'```\n{value[:1000] or "no data"}\n```', inline=False)
+
+        # latest callbacks that held up the loop
+        lines = [
+            f'{time.strftime("%H:%M:%S", time.gmtime(when))} {format_seconds(elapsed)} {label}'
+            for when, label, elapsed in reversed(self.bot.profiler.slow_callbacks)
+        ]
+        if not self.bot.profiler.running:
+            lines = ['profiling is disabled, set PACKLE_PROFILE to time callbacks']
+        embed.add_field(name='Slow Callbacks', value=f'```\n{chr(10).join(lines)[:1000] or "none"}\n```', inline=False)
+
+        file = discord.File(io.BytesIO(stacks.encode('utf-8')), filename='profile.folded')
+        await self.bot.outbound.send(ctx, Priority.INTERACTIVE, embed=embed, file=file)
+
+
+def setup(bot: Packle) -> None:
+    """function the bot uses to load this cog"""
+
+    bot.add_cog(Owner(bot))
@@ -1,21 +1,30 @@
 # -*- coding: utf-8 -*-
 
 
+# standard library modules - typing
+from typing import Any, Dict, List, Set
+
 # standard library modules
 import asyncio
+import sys
+import time
+import traceback
 
 # third-party packages - discord related
 import discord
 from discord.ext import commands
 import dpymenus
-from dpymenus import ButtonMenu
+from dpymenus import ButtonMenu, PaginatedMenu
 
 # local modules
+from metrics import timed
 from utils import send_error_msg
-from cardpack import CardPack
+from cardpack import CardPack, FlashCard
 from packlebot import Packle
-from ui import make_card_page
-from constants import Colors, Emojis
+from sessions import QuizSession, SessionManager
+from scoreboard import leaderboard, scoreboard_embeds
+from ui import make_card_page, page_from_dict, prerender_deck, render_card
+from constants import Emojis
 
 
 class Quiz(commands.Cog, name='quiz_mode'):
@@ -26,17 +35,33 @@ class Quiz(commands.Cog, name='quiz_mode'):
         self.bot = bot
 
         # quiz mode logic specific
-        self.quiz_sessions_by_user_id = {}
-        self.quiz_messages_by_id = {}
+        self.sessions = SessionManager(self._quiz_advance)
         self.quiz_interval_default = 10
 
+        # keep the reactions on the quiz message for the whole quiz rather than clearing
+        # and re-adding them every card, so each card only costs a single message edit
+        self.quiz_persistent_reactions = True
+
+        # cards rendered before a quiz starts, later cards are rendered when they're shown
+        self.quiz_prerender_cards = 1000
+
+        # players shown on each card while the quiz is running (0 to hide them),
+        # and seconds the menu for browsing a scoreboard of several pages stays open
+        self.quiz_leaderboard_size = 3
+        self.quiz_scoreboard_timeout = 300
+
+        # scoreboard menus still open after their quiz ended, referenced until they close
+        self.scoreboard_menus: Set[asyncio.Task] = set()
+
 
     @commands.command(
         description='multiplayer quiz mode',
         help=(
             'This is a multiplayer quiz mode where anyone can join in. '
             'Just answer the question and then reveal the spoiler to see if you were '
-            'correct, react with the check mark if you were, and the cross if not. '
+            'correct, click the check mark if you were, and the cross if not '
+            '(clicking a reaction you already added counts as a new answer, '
+            'and removing the one you added for the current card takes your answer back). '
             'Questions will automatically keep changing based on either the default '
             'interval or a custom one you set when you start the quiz '
             '(min 5 seconds, max 60 seconds). '
@@ -65,57 +90,51 @@ class Quiz(commands.Cog, name='quiz_mode'):
             interval = min(60.0, interval)
             interval = max(5.0, interval)
 
-        # send error message and return if they already have a quiz session
-        if ctx.author.id in self.quiz_sessions_by_user_id:
-            msg = "You're already running a Quiz session"
+        # send error message and return if they already have a quiz session,
+        # or there are too many quizzes running, otherwise hold the quiz's slots
+        # so another quiz can't be admitted while this one is starting
+        msg = self.sessions.reserve(ctx.author.id, ctx.guild.id, ctx.channel.id)
+        if msg is not None:
             return await send_error_msg(ctx, msg)
 
-        # send error message and return if pack doesn't exist
-        if (
-            ctx.author.id not in self.bot.packs
-            or pack_name not in self.bot.packs[ctx.author.id]
-        ):
-            msg = 'pack not found'
-            return await send_error_msg(ctx, msg)
+        try:
 
-        # send error message and return if the pack doesn't exist
-        if ctx.author.id not in self.bot.packs or pack_name not in self.bot.packs[ctx.author.id]:
-            msg = 'Pack not found'
-            return await send_error_msg(ctx, msg)
+            # get the pack, loading it from storage if required
+            pack = self.bot.packs.get(ctx.author.id, pack_name)
 
-        # get the pack
-        pack = self.bot.packs[ctx.author.id][pack_name]
+            # send error message and return if the pack doesn't exist
+            if pack is None:
+                msg = 'Pack not found'
+                return await send_error_msg(ctx, msg)
 
-        # start the quiz
-        return await self._quiz(ctx, pack, interval)
+            # start the quiz
+            return await self._quiz(ctx, pack, interval)
+        finally:
 
+            # gives the slots back if the quiz didn't start
+            self.sessions.release(ctx.author.id)
 
-    @quiz.after_invoke
-    async def quiz_after_invoke(self, ctx: commands.Context):
+
+    def cog_unload(self) -> None:
         """
-        handle cleaning up the mp quiz session dicts even if there is an error
+        stops driving the quiz sessions and closes the scoreboard menus when this cog is unloaded
         """
 
-        if ctx.author.id in self.quiz_sessions_by_user_id:
-            message_id = self.quiz_sessions_by_user_id[ctx.author.id]['message'].id
-            if message_id in self.quiz_messages_by_id:
-                self.quiz_messages_by_id.pop(message_id, None)
-            self.quiz_sessions_by_user_id.pop(ctx.author.id, None)
+        self.sessions.stop()
+        for task in self.scoreboard_menus:
+            task.cancel()
 
 
     async def _quiz(self, ctx: commands.Context, pack: CardPack, interval: float):
         """
-        backend for quiz command
+        backend for quiz command, sends the first card and hands the quiz over to the session manager
         """
 
-        pack = CardPack(
-            (card for card in pack),
-            dm_channel=None,
-            name=pack.name,
-            author=pack.author,
-            category=pack.category,
-            difficulty=pack.difficulty,
-        )
+        # the quiz reads from a snapshot so changes to the pack while it's running don't affect it
+        pack = pack.snapshot()
+
+        # render the quiz's cards up front, the renders are shared with later quizzes of the unchanged pack
+        await prerender_deck(pack, quiz_mode=True, limit=self.quiz_prerender_cards)
 
         # create initial page
         page = await make_card_page(pack, 0, quiz_mode=True)
@@ -134,7 +153,7 @@ class Quiz(commands.Cog, name='quiz_mode'):
                 message: discord.Message = menu.output
 
                 # this might throw an exception if missing permissions to clear reactions
-                await message.clear_reactions()
+                await self.bot.outbound.clear_reactions(message)
 
         # menu timeout hook
         menu.add_hook(
@@ -154,106 +173,186 @@ class Quiz(commands.Cog, name='quiz_mode'):
         await menu.open()
         message: discord.Message = menu.output
 
-        # create a dict that stores the game information, scores, the message
-        # that the game is being played in, the players, whether or not the 
-        # game creator wants to exit
-        self.quiz_sessions_by_user_id.update({
-            ctx.author.id: {
-                'message': message,
-                'players': {ctx.author: 0},
-                'configuring': False,
-                'exit': False,
-            }
-        })
-        self.quiz_messages_by_id.update({message.id: message})
-
-        # each iteration of this loop is a quiz flashcard
-        for index, _ in enumerate(pack):
-
-            # clear the reactions so they're fresh for the next card
-            await message.clear_reactions()
-
-            # if the person who started the quiz clicked exit, we break the loop
-            if self.quiz_sessions_by_user_id[ctx.author.id]['exit']:
-                break
-
-            # we already made the first card so we skip making it
-            if index != 0:
-                page = await make_card_page(pack, index, quiz_mode=True)
-                await menu.output.edit(embed=page.as_safe_embed())
-
-            # re-add the buttons
-            await message.add_reaction(Emojis.check)
-            await message.add_reaction(Emojis.cross)
-            await message.add_reaction(Emojis.exit)
-
-            # sleep for the set interval
-            await asyncio.sleep(interval)
-
-            # check to see answered correctly, 
-            # since answering incorrectly doesn't change anything
-            await self._quiz_update_scores(ctx, message)
-
-        # make scoreboard embed
-        embed = discord.Embed(
-            title='SCOREBOARD',
-            color=Colors.embed,
+        # add the buttons for the first card, in persistent mode they stay for the whole quiz
+        await self.bot.outbound.clear_reactions(message)
+        await self._quiz_add_buttons(message)
+
+        # the session manager advances the quiz every interval from here on
+        session = QuizSession(ctx, message, pack, interval, persistent=self.quiz_persistent_reactions)
+        self.sessions.add(session)
+
+
+    @timed('packle_quiz_seconds', step='advance')
+    async def _quiz_advance(self, session: QuizSession) -> bool:
+        """
+        scores the current card and shows the next one,
+        returns False once the quiz has ended
+        """
+
+        # check to see answered correctly, 
+        # since answering incorrectly doesn't change anything
+        await self._quiz_update_scores(session)
+
+        # if the person who started the quiz clicked exit, or there are no cards left, end the quiz
+        session.index += 1
+        if session.exit or session.index >= len(session.pack):
+            await self._quiz_scoreboard(session)
+            return False
+
+        # each card starts a new vote epoch, in classic mode the reactions
+        # are also cleared so they're fresh for the next card
+        if not session.persistent:
+            await self.bot.outbound.clear_reactions(session.message)
+        session.new_card()
+
+        # the card's render is shared with the cache, so the leaderboard goes on a copy
+        card = render_card(session.pack, session.index, quiz_mode=True)
+        top = leaderboard(session.players, session.names, self.quiz_leaderboard_size)
+        if top:
+            card = dict(card, fields=card['fields'] + [{'name': 'Leaderboard', 'value': top, 'inline': False}])
+        embed = discord.Embed.from_dict(card)
+        await self.bot.outbound.edit(session.message, embed=embed)
+        session.shown_at = time.monotonic()
+
+        # re-add the buttons
+        if not session.persistent:
+            await self._quiz_add_buttons(session.message)
+        return True
+
+
+    async def _quiz_scoreboard(self, session: QuizSession):
+        """
+        replaces the quiz message with the final scoreboard
+        """
+
+        # page the scoreboard across embeds, off the event loop for quizzes with a huge amount of players
+        players = session.players
+        embeds = await self.bot.workers.run_sized(
+            len(players),
+            scoreboard_embeds,
+            players,
+            session.names,
+            session.pack.name,
+            f'Pack by {session.ctx.author.display_name}',
         )
 
-        # create rank/name/score columns
-        players = self.quiz_sessions_by_user_id[ctx.author.id]['players']
-        scores = ''
-        names = ''
-        ranks = ''
-        prev = -1
-        rank = 0
-        name_score = sorted(players.items(), key=lambda x: x[0].display_name)
-        for player, score in sorted(name_score, key=lambda x: x[1], reverse=True):
-            if score != prev:
-                rank += 1
-            scores += f'{Emojis.blank}{score}\n'
-            names += f'{player.display_name}{Emojis.blank}\n'
-            emoji_medal = Emojis.medals.get(rank, Emojis.blank)
-            ranks += f'{emoji_medal} {rank}{Emojis.blank}\n'
-            prev = score
+        # the quiz message shows the first page
+        await self.bot.outbound.clear_reactions(session.message)
+        await self.bot.outbound.edit(session.message, embed=discord.Embed.from_dict(embeds[0]))
+
+        # the whole scoreboard can be browsed in a menu, which is left running after the quiz has ended
+        if len(embeds) > 1:
+            task = asyncio.ensure_future(self._quiz_scoreboard_menu(session, embeds))
+            self.scoreboard_menus.add(task)
+            task.add_done_callback(self.scoreboard_menus.discard)
+
 
-        name = '__Rank__'
-        embed.add_field(name=name, value=ranks, inline=True)
+    async def _quiz_scoreboard_menu(self, session: QuizSession, embeds: List[Dict[str, Any]]):
+        """
+        sends a menu for browsing every page of the final scoreboard
+        """
 
-        name = '__Name__'
-        embed.add_field(name=name, value=names, inline=True)
+        try:
+            menu = PaginatedMenu(session.ctx)
+            menu.persist_on_close()
+            menu.set_timeout(self.quiz_scoreboard_timeout)
+            menu.add_pages([page_from_dict(embed) for embed in embeds])
+            await menu.open()
+        except Exception:
+            print(f'`Error: scoreboard menu for user {session.author_id} failed`', file=sys.stderr)
+            traceback.print_exc()
 
-        name = '__Score__'
-        embed.add_field(name=name, value=scores, inline=True)
 
-        embed.set_author(name=pack.name)
-        embed.set_footer(text=f'Pack by {ctx.author.display_name}')
+    async def _quiz_add_buttons(self, message: discord.Message):
+        """
+        adds the check, cross, and exit reaction buttons to a quiz message
+        """
 
-        await message.clear_reactions()
-        await message.edit(embed=embed)
+        await self.bot.outbound.add_reaction(message, Emojis.check)
+        await self.bot.outbound.add_reaction(message, Emojis.cross)
+        await self.bot.outbound.add_reaction(message, Emojis.exit)
 
 
-    async def _quiz_update_scores(self, ctx: commands.Context, message: discord.Message):
+    @timed('packle_quiz_seconds', step='update_scores')
+    async def _quiz_update_scores(self, session: QuizSession):
+        """
+        updates the scores for a current quiz session from the card's votes
+        """
+
+        # reactions may have been missed while the gateway was reconnecting
+        if session.gap:
+            await self._quiz_reconcile_votes(session)
+
+        players = session.players
+        for user_id, emoji in session.votes.items():
+            if emoji == Emojis.check:
+                players.add(user_id)
+
+        # log every answer to the card, votes picked up by reconciling don't have a time
+        pack = session.pack
+        correct = FlashCard.Result.CORRECT.value
+        incorrect = FlashCard.Result.INCORRECT.value
+        for user_id, emoji in session.votes.items():
+            voted_at = session.voted_at.get(user_id)
+            self.bot.reviews.record(
+                user_id,
+                session.author_id,
+                pack.name,
+                session.index,
+                correct if emoji == Emojis.check else incorrect,
+                None if voted_at is None else voted_at - session.shown_at,
+                pack.pack.round_index,
+            )
+
+
+    async def _quiz_reconcile_votes(self, session: QuizSession):
         """
-        updates the scores for a current quiz session
+        brings the current card's votes up to date with the message's reactions,
+        by comparing who holds each answer reaction against the session's ledger
         """
 
-        message = await ctx.channel.fetch_message(message.id)
-        reaction: discord.Reaction = discord.utils.get(message.reactions, emoji=Emojis.check)
-        reactors = await reaction.users().flatten()
-        for reactor in reactors:
+        session.gap = False
+        message = await session.ctx.channel.fetch_message(session.message.id)
+        for emoji in (Emojis.check, Emojis.cross):
+            reaction: discord.Reaction = discord.utils.get(message.reactions, emoji=emoji)
+            reactors = [] if reaction is None else await reaction.users().flatten()
+            user_ids = set()
+            for reactor in reactors:
 
-            # exclude the bot
-            if reactor.id == self.bot.user.id:
-                continue
+                # exclude the bot
+                if reactor.id == self.bot.user.id:
+                    continue
 
-            if reactor in self.quiz_sessions_by_user_id[ctx.author.id]['players']:
-                self.quiz_sessions_by_user_id[ctx.author.id]['players'][reactor] += 1
-            else:
-                self.quiz_sessions_by_user_id[ctx.author.id]['players'][reactor] = 1
+                user_ids.add(reactor.id)
+                session.names.setdefault(reactor.id, reactor.display_name)
+            session.reconcile(emoji, user_ids)
+
+
+    @commands.Cog.listener(name='on_ready')
+    async def _quiz_ready_listener(self) -> None:
+        """
+        listener for new gateway sessions, reactions sent while disconnected
+        weren't replayed so the votes of running quizzes need reconciling
+        """
+
+        for session in self.sessions:
+            session.gap = True
+
+
+    def _quiz_record_name(self, session: QuizSession, payload: discord.RawReactionActionEvent):
+        """
+        remembers the display name of a player for the scoreboard
+        """
+
+        if payload.member is not None:
+            session.names[payload.user_id] = payload.member.display_name
+        elif payload.user_id not in session.names:
+            user = self.bot.user_cache.get_cached(payload.user_id)
+            session.names[payload.user_id] = user.display_name if user else str(payload.user_id)
 
 
     @commands.Cog.listener(name='on_raw_reaction_add')
+    @timed('packle_listener_seconds', listener='quiz_reaction_add')
     async def _quiz_add_reaction_listener(
             self,
             payload: discord.RawReactionActionEvent
@@ -266,33 +365,71 @@ class Quiz(commands.Cog, name='quiz_mode'):
         if payload.user_id == self.bot.user.id:
             return
 
-        # ignore reactions to messages that aren't in the session dicts
-        if payload.message_id not in self.quiz_messages_by_id:
+        # ignore reactions to messages that aren't quiz sessions
+        session = self.sessions.by_message(payload.message_id)
+        if session is None:
             return
 
-        message: discord.Message = self.quiz_messages_by_id[payload.message_id]
+        message: discord.Message = session.message
+
+        # record the user's vote for the current card
+        emoji = str(payload.emoji)
+        if emoji in (Emojis.check, Emojis.cross):
+            session.react(payload.user_id, emoji, time.monotonic())
+            self._quiz_record_name(session, payload)
+
+        # persistent reactions are toggles, so there is nothing to remove
+        if session.persistent and emoji in (Emojis.check, Emojis.cross):
+            return
 
         # remove user's x reaction if they just reacted with a check
-        if str(payload.emoji) == Emojis.check:
+        if emoji == Emojis.check:
             try:
-                user = await self.bot.fetch_user(payload.user_id)
-                await message.remove_reaction(Emojis.cross, user)
+                user = await self.bot.user_cache.get(payload.user_id, payload.member)
+                await self.bot.outbound.remove_reaction(message, Emojis.cross, user)
             except discord.NotFound:
                 pass
 
         # remove user's check reaction if they just reacted with an x
-        elif str(payload.emoji) == Emojis.cross:
+        elif emoji == Emojis.cross:
             try:
-                user = await self.bot.fetch_user(payload.user_id)
-                await message.remove_reaction(Emojis.check, user)
+                user = await self.bot.user_cache.get(payload.user_id, payload.member)
+                await self.bot.outbound.remove_reaction(message, Emojis.check, user)
             except discord.NotFound:
                 pass
 
         # check for quiz cancellation
-        elif str(payload.emoji) == Emojis.exit:
-            if payload.user_id in self.quiz_sessions_by_user_id:
-                if payload.message_id == self.quiz_sessions_by_user_id[payload.user_id]['message'].id:
-                    self.quiz_sessions_by_user_id[payload.user_id]['exit'] = True
+        elif emoji == Emojis.exit:
+            if payload.user_id == session.author_id:
+                session.exit = True
+                self.sessions.wake(session)
+
+
+    @commands.Cog.listener(name='on_raw_reaction_remove')
+    @timed('packle_listener_seconds', listener='quiz_reaction_remove')
+    async def _quiz_remove_reaction_listener(
+            self,
+            payload: discord.RawReactionActionEvent
+    ) -> None:
+        """
+        listener for removed reactions on messages that are in the multiplayer session dicts
+        """
+
+        # ignore bot reactions
+        if payload.user_id == self.bot.user.id:
+            return
+
+        session = self.sessions.by_message(payload.message_id)
+        if session is None:
+            return
+
+        # withdraws the vote for the current card, or in persistent mode
+        # un-clicking a reaction left over from an earlier card is a vote
+        emoji = str(payload.emoji)
+        if emoji in (Emojis.check, Emojis.cross):
+            session.unreact(payload.user_id, emoji, time.monotonic())
+            if payload.user_id in session.votes:
+                self._quiz_record_name(session, payload)
 
 
 def setup(bot: Packle) -> None:
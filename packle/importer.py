@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules - typing
+from __future__ import annotations  # fixes some typehinting issues
+from typing import Iterable, Iterator, List, Optional, TextIO, Tuple
+
+# standard library modules
+import contextlib
+import csv
+import html
+import io
+import itertools
+import os
+import re
+import sqlite3
+import tempfile
+import zipfile
+
+# third-party packages
+import aiohttp
+
+# third-party packages - discord related
+import discord
+
+# local modules
+from cardpack import CardPack
+from packfile import EXTENSION as PACKFILE_EXTENSION, PackFile
+from workers import Workers, shared_workers
+
+
+# rows are handed to CardPack.extend in chunks of this many cards
+CHUNK_SIZE = 4096
+
+# when importing in the background the chunks are smaller, so extending the
+# pack with each one only holds up the event loop for a few milliseconds
+ASYNC_CHUNK_SIZE = 256
+
+# cards have to fit in an embed field, answers are also wrapped in || spoiler tags
+MAX_QUESTION_LENGTH = 1024
+MAX_ANSWER_LENGTH = 1020
+
+# largest attachment that will be downloaded for importing
+MAX_ATTACHMENT_SIZE = 64 * 1024 * 1024
+
+# file extensions understood by the importer
+DELIMITERS = {
+    '.csv': ',',
+    '.tsv': '\t',
+    '.txt': '\t',
+}
+ANKI_EXTENSIONS = ('.apkg', '.colpkg')
+
+# anki note fields are html separated by the unit separator
+ANKI_FIELD_SEPARATOR = '\x1f'
+HTML_TAG = re.compile(r'<[^>]+>')
+HTML_BREAK = re.compile(r'<br\s*/?>|</div>|</p>', re.IGNORECASE)
+
+# a header row that gets skipped if present
+HEADER = ('question', 'answer')
+
+
+class ImportStats:
+    """
+    class for reporting the outcome of an import
+    """
+
+    __slots__ = ('imported', 'skipped', 'errors')
+
+    # only the first few reasons for skipping rows are kept
+    MAX_ERRORS = 10
+
+    def __init__(self):
+        """initializer"""
+
+        self.imported = 0
+        self.skipped = 0
+        self.errors: List[str] = []
+
+
+    def skip(self, line: int, reason: str):
+        """
+        records a row that was rejected
+        """
+
+        self.skipped += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append(f'row {line}: {reason}')
+
+
+def read_delimited(fp: TextIO, delimiter: str = ',') -> Iterator[List[str]]:
+    """
+    lazily reads the rows of a csv/tsv file
+    """
+
+    return csv.reader(fp, delimiter=delimiter)
+
+
+def read_anki(path: str) -> Iterator[List[str]]:
+    """
+    lazily reads the first two fields of every note in an anki deck package
+    """
+
+    with contextlib.ExitStack() as stack:
+
+        # sqlite can only open real files, so the collection is extracted to a temporary directory
+        tmp_dir = stack.enter_context(tempfile.TemporaryDirectory())
+        with zipfile.ZipFile(path) as package:
+            names = set(package.namelist())
+            for name in ('collection.anki21', 'collection.anki2'):
+                if name in names:
+                    break
+            else:
+                raise ValueError('file is not a supported anki deck')
+            collection = package.extract(name, tmp_dir)
+
+        # the rows are read lazily, so an async import advances this generator (and closes it)
+        # on whichever I/O thread is free, one call at a time, never from two threads at once
+        db = stack.enter_context(contextlib.closing(sqlite3.connect(collection, check_same_thread=False)))
+        cursor = db.execute('SELECT flds FROM notes ORDER BY id')
+        while True:
+            notes = cursor.fetchmany(CHUNK_SIZE)
+            if not notes:
+                break
+            for fields, in notes:
+                yield [_strip_html(field) for field in fields.split(ANKI_FIELD_SEPARATOR)[:2]]
+
+
+def _strip_html(text: str) -> str:
+    """
+    converts an anki html field into plain text
+    """
+
+    text = HTML_BREAK.sub('\n', text)
+    text = HTML_TAG.sub('', text)
+    return html.unescape(text).strip()
+
+
+def validate(rows: Iterable[List[str]], stats: ImportStats) -> Iterator[Tuple[str, str, int]]:
+    """
+    filters rows down to valid (question, answer, proficiency) tuples, recording any rejected rows
+    """
+
+    for line, row in enumerate(rows, 1):
+        row = [field.strip() for field in row]
+
+        # skip blank lines and a header row
+        if not any(row):
+            continue
+        if line == 1 and tuple(field.lower() for field in row[:2]) == HEADER:
+            continue
+
+        if len(row) not in (2, 3):
+            stats.skip(line, f'expected 2 or 3 columns, got {len(row)}')
+            continue
+        question, answer = row[:2]
+        if not question or not answer:
+            stats.skip(line, 'question and answer must not be empty')
+            continue
+        if len(question) > MAX_QUESTION_LENGTH or len(answer) > MAX_ANSWER_LENGTH:
+            stats.skip(line, 'question or answer is too long')
+            continue
+
+        proficiency = 1
+        if len(row) == 3 and row[2]:
+            try:
+                proficiency = int(row[2])
+            except ValueError:
+                stats.skip(line, 'proficiency must be a whole number')
+                continue
+            if not 1 <= proficiency <= CardPack.MAX_PROFICIENCY:
+                stats.skip(line, f'proficiency must be between 1 and {CardPack.MAX_PROFICIENCY}')
+                continue
+
+        yield question, answer, proficiency
+
+
+def chunked(rows: Iterable, size: int = CHUNK_SIZE) -> Iterator[List]:
+    """
+    groups an iterable into lists of at most size items
+    """
+
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def import_rows(pack: CardPack, rows: Iterable[List[str]], chunk_size: int = CHUNK_SIZE) -> ImportStats:
+    """
+    validates rows and adds them to a pack in bulk, one chunk at a time
+    """
+
+    stats = ImportStats()
+    for chunk in chunked(validate(rows, stats), chunk_size):
+        pack.extend(chunk)
+        stats.imported += len(chunk)
+    return stats
+
+
+async def import_rows_async(
+        pack: CardPack,
+        rows: Iterable[List[str]],
+        workers: Workers = None,
+        chunk_size: int = ASYNC_CHUNK_SIZE,
+) -> ImportStats:
+    """
+    import_rows without blocking the event loop, the rows are read and
+    validated in the I/O thread pool and the pack extended one chunk at a time
+    """
+
+    workers = workers or shared_workers
+    stats = ImportStats()
+    chunks = chunked(validate(rows, stats), chunk_size)
+    while True:
+        chunk = await workers.run_io(next, chunks, None)
+        if chunk is None:
+            return stats
+        pack.extend(chunk)
+        stats.imported += len(chunk)
+
+
+@contextlib.contextmanager
+def open_rows(path: str, filename: Optional[str] = None) -> Iterator[Iterable[List[str]]]:
+    """
+    opens a csv/tsv file, an anki deck, or a pack file for lazily reading its rows,
+    the format is picked by the extension of filename (or path)
+    """
+
+    ext = os.path.splitext(filename or path)[1].lower()
+    if ext == PACKFILE_EXTENSION:
+        with PackFile(path) as f:
+            yield ([question, answer, str(proficiency)] for question, answer, proficiency in f.rows())
+    elif ext in ANKI_EXTENSIONS:
+        yield read_anki(path)
+    elif ext in DELIMITERS:
+        with open(path, encoding='utf-8-sig', newline='') as fp:
+            yield read_delimited(fp, DELIMITERS[ext])
+    else:
+        raise ValueError(f'unsupported file type {ext!r}')
+
+
+def import_file(pack: CardPack, path: str, filename: Optional[str] = None) -> ImportStats:
+    """
+    imports cards into a pack from a csv/tsv file, an anki deck, or a pack file,
+    the format is picked by the extension of filename (or path)
+    """
+
+    with open_rows(path, filename) as rows:
+        return import_rows(pack, rows)
+
+
+async def import_file_async(
+        pack: CardPack,
+        path: str,
+        filename: Optional[str] = None,
+        workers: Workers = None,
+) -> ImportStats:
+    """
+    import_file without blocking the event loop, see import_rows_async
+    """
+
+    with open_rows(path, filename) as rows:
+        return await import_rows_async(pack, rows, workers)
+
+
+async def import_attachment(pack: CardPack, attachment: discord.Attachment) -> ImportStats:
+    """
+    streams a discord attachment to a temporary file and imports it into a pack
+    """
+
+    if attachment.size > MAX_ATTACHMENT_SIZE:
+        raise ValueError('attachment is too large to import')
+
+    with tempfile.NamedTemporaryFile() as tmp:
+
+        # download in chunks rather than holding the whole attachment in memory
+        async with aiohttp.ClientSession() as session:
+            async with session.get(attachment.url) as response:
+                response.raise_for_status()
+                async for data in response.content.iter_chunked(io.DEFAULT_BUFFER_SIZE * 8):
+                    tmp.write(data)
+        tmp.flush()
+
+        return await import_file_async(pack, tmp.name, filename=attachment.filename)
@@ -4,7 +4,10 @@
 # standard library modules
 import os
 import sys
-import traceback
+import time
+
+# measured before the imports below, so the startup report includes them
+STARTED = time.perf_counter()
 
 # third-party packages
 from dotenv import load_dotenv
@@ -15,6 +18,8 @@ import discord
 # local modules
 from packlebot import Packle
 from packle_help import PackleHelp
+from sharding import ShardConfig
+from startup import load_cogs
 
 
 def main(bot: Packle, indent: int = 4, underline: bool = True) -> None:
@@ -38,21 +43,20 @@ def main(bot: Packle, indent: int = 4, underline: bool = True) -> None:
         'cogs.study',
     ]
 
-    # load the default cogs
-    title = 'loading cogs'
-    print(title)
-    if underline:
-        print(f"{'-' * len(title)}")
-    for cog in default_cogs:
-        try:
-            bot.load_extension(cog)
-            print(f"{' ' * indent}{cog}")
-        except:
-
-            # print traceback and continue loading remaining cogs
-            print(f'`Error: failed to load extension {cog}`', file=sys.stderr)
-            traceback.print_exc()
-    print()
+    # cogs only loaded once one of their commands is used, with their command names
+    lazy_cogs = {
+        'cogs.quiz': ('quiz',),
+    }
+
+    # load the default cogs and report how long startup took
+    report = load_cogs(bot, default_cogs, STARTED, lazy=lazy_cogs)
+    report.print(indent=indent, underline=underline)
+    report_path = os.getenv('PACKLE_STARTUP_REPORT')
+    if report_path:
+        report.write(report_path)
+    budget = os.getenv('PACKLE_STARTUP_BUDGET')
+    if budget and report.over_budget(float(budget)):
+        print(f'`Warning: startup took {report.elapsed:.3f}s, over the {budget}s budget`', file=sys.stderr)
 
     # run the bot
     bot.run(token, bot=True, reconnect=True)
@@ -65,12 +69,25 @@ if __name__ == '__main__':
     indent = 4
     underline = True
 
+    # load the database path into system environment from .env file
+    load_dotenv()
+
+    # reminders due for the same channel are only grouped into a digest when PACKLE_REMINDER_DIGEST_WINDOW
+    # is set to a window in seconds, since a reminder can be held back for up to the whole window
+    reminder_digest_window = float(os.getenv('PACKLE_REMINDER_DIGEST_WINDOW', 0)) or None
+
     # intialize the bot
     bot = Packle(
         command_prefix=['$'],
         description='Packle\nSupport Server: <https://discord.gg/V2TXDrAfZs>',
         case_insensitive=True,
         help_command=PackleHelp(),
+        db_path=os.getenv('PACKLE_DB', 'packle.db'),
+        shards=ShardConfig.from_env(),
+        metrics_port=int(os.getenv('PACKLE_METRICS_PORT', 0)) or None,
+        reminder_digest_window=reminder_digest_window,
+        profile=os.getenv('PACKLE_PROFILE', '0') not in ('', '0'),
+        slow_callback=float(os.getenv('PACKLE_SLOW_CALLBACK', 0.1)),
     )
 
     # add/override on_ready method to bot
@@ -81,13 +98,15 @@ if __name__ == '__main__':
         prints some useful status info to the terminal
         """
 
-        print('--- startup complete ---\n')
+        print(f'--- startup complete ({time.perf_counter() - STARTED:.1f}s) ---\n')
 
         # print information about the bot
         bot_info = [
             ['bot username', f"'{bot.user.name}#{bot.user.discriminator}'"],
             ['bot id', bot.user.id],
             ['server count', len(bot.guilds)],
+            ['shards', f'{sorted(bot.shards)} of {bot.shard_count}'],
+            ['process', f'{bot.shards_config.process_index + 1} of {bot.shards_config.process_count}'],
             ['discord.py version', discord.__version__],
         ]
         title = 'bot information'
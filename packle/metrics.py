@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules - typing
+from __future__ import annotations  # fixes some typehinting issues
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# standard library modules
+import asyncio
+import bisect
+import functools
+import inspect
+import logging
+import math
+import os
+import sys
+import time
+
+
+# (name, labels as sorted (key, value) pairs)
+MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class Histogram:
+    """
+    HDR-style latency histogram
+
+    values are counted in log-linear buckets, 16 per power of two from 1
+    microsecond to about an hour, so every quantile is accurate to ~4%
+    regardless of the value while recording stays a single bisect
+    """
+
+    __slots__ = ('counts', 'count', 'sum', 'max')
+
+    # upper bounds of the buckets in seconds
+    BOUNDS = [1e-6 * 2 ** (i / 16) for i in range(16 * 32)]
+
+    # bucket bounds included in the prometheus export
+    EXPORT_BOUNDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self):
+        """initializer"""
+
+        # the last bucket holds everything over the highest bound
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.BOUNDS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+
+    def quantile(self, q: float) -> float:
+        """
+        returns the upper bound of the bucket holding the q quantile (0 to 1)
+        """
+
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.BOUNDS[i], self.max) if i < len(self.BOUNDS) else self.max
+        return self.max
+
+
+    def cumulative(self, bounds) -> List[int]:
+        """
+        returns the amount of values <= each bound, as prometheus buckets
+        """
+
+        cumulative = []
+        seen = 0
+        i = 0
+        for bound in bounds:
+            while i < len(self.BOUNDS) and self.BOUNDS[i] <= bound:
+                seen += self.counts[i]
+                i += 1
+            cumulative.append(seen)
+        return cumulative
+
+
+class Counter:
+    """
+    monotonically increasing count
+    """
+
+    __slots__ = ('value',)
+
+    def __init__(self):
+        """initializer"""
+
+        self.value = 0
+
+
+    def inc(self, amount: int = 1) -> None:
+        self.value += amount
+
+
+class Registry:
+    """
+    class for every metric, exported in the prometheus text format
+
+    when disabled, the helpers below skip recording after a single attribute
+    check, so instrumented code costs close to nothing
+    """
+
+    def __init__(self, enabled: bool = True):
+        """initializer"""
+
+        self.enabled = enabled
+        self._histograms: Dict[MetricKey, Histogram] = {}
+        self._counters: Dict[MetricKey, Counter] = {}
+        self._help: Dict[str, str] = {}
+
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, Any]) -> MetricKey:
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+    def histogram(self, name: str, help: str = '', **labels) -> Histogram:
+        """
+        returns a histogram, creating it if required
+        """
+
+        key = self._key(name, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram()
+            self._help.setdefault(name, help)
+        return histogram
+
+
+    def counter(self, name: str, help: str = '', **labels) -> Counter:
+        """
+        returns a counter, creating it if required
+        """
+
+        key = self._key(name, labels)
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters[key] = Counter()
+            self._help.setdefault(name, help)
+        return counter
+
+
+    def histograms(self) -> Dict[MetricKey, Histogram]:
+        return dict(self._histograms)
+
+
+    def counters(self) -> Dict[MetricKey, Counter]:
+        return dict(self._counters)
+
+
+    @staticmethod
+    def _labels(labels: Tuple[Tuple[str, str], ...], **extra) -> str:
+        pairs = list(labels) + [(key, str(value)) for key, value in extra.items()]
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{key}="{value}"' for key, value in pairs) + '}'
+
+
+    def render(self) -> str:
+        """
+        returns every metric in the prometheus text exposition format
+        """
+
+        lines = []
+        declared = set()
+
+        def declare(name, kind):
+            if name not in declared:
+                declared.add(name)
+                if self._help.get(name):
+                    lines.append(f'# HELP {name} {self._help[name]}')
+                lines.append(f'# TYPE {name} {kind}')
+
+        for (name, labels), counter in sorted(self._counters.items()):
+            declare(name, 'counter')
+            lines.append(f'{name}{self._labels(labels)} {counter.value}')
+
+        for (name, labels), histogram in sorted(self._histograms.items()):
+            declare(name, 'histogram')
+            bounds = Histogram.EXPORT_BOUNDS
+            for bound, count in zip(bounds, histogram.cumulative(bounds)):
+                lines.append(f'{name}_bucket{self._labels(labels, le=bound)} {count}')
+            lines.append(f'{name}_bucket{self._labels(labels, le="+Inf")} {histogram.count}')
+            lines.append(f'{name}_sum{self._labels(labels)} {histogram.sum}')
+            lines.append(f'{name}_count{self._labels(labels)} {histogram.count}')
+
+        return '\n'.join(lines) + '\n'
+
+
+# the registry used by the helpers below, disabled with PACKLE_METRICS=0
+registry = Registry(enabled=os.getenv('PACKLE_METRICS', '1') != '0')
+
+
+def count(name: str, amount: int = 1, **labels) -> None:
+    """
+    increments a counter
+    """
+
+    if registry.enabled:
+        registry.counter(name, **labels).inc(amount)
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """
+    records a value in a histogram
+    """
+
+    if registry.enabled:
+        registry.histogram(name, **labels).observe(value)
+
+
+class timer:
+    """
+    context manager recording how long its block took in a histogram
+    """
+
+    __slots__ = ('name', 'labels', 'start')
+
+    def __init__(self, name: str, **labels):
+        """initializer"""
+
+        self.name = name
+        self.labels = labels
+        self.start = 0.0
+
+
+    def __enter__(self):
+        if registry.enabled:
+            self.start = time.perf_counter()
+        return self
+
+
+    def __exit__(self, *exc_info):
+        if registry.enabled and self.start:
+            registry.histogram(self.name, **self.labels).observe(time.perf_counter() - self.start)
+
+
+def timed(name: str, help: str = '', **labels) -> Callable:
+    """
+    decorator recording how long each call of a function or coroutine function takes,
+    functions decorated while metrics are disabled aren't wrapped at all
+    """
+
+    def decorator(func):
+        if not registry.enabled:
+            return func
+
+        # look the histogram up once rather than on every call
+        histogram: Optional[Histogram] = None
+
+        def get_histogram() -> Histogram:
+            nonlocal histogram
+            if histogram is None:
+                histogram = registry.histogram(name, help, **labels)
+            return histogram
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                if not registry.enabled:
+                    return await func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    get_histogram().observe(time.perf_counter() - start)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not registry.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    get_histogram().observe(time.perf_counter() - start)
+        return wrapper
+
+    return decorator
+
+
+class RateLimitCounter(logging.Handler):
+    """
+    counts the rate limits discord.py handles internally, which it only logs
+    """
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.levelno >= logging.WARNING and str(record.msg).startswith('We are being rate limited'):
+            count('packle_discord_rate_limited_total', source='http')
+
+
+class MetricsServer:
+    """
+    minimal HTTP server exporting the registry for prometheus to scrape
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 9100):
+        """initializer"""
+
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await asyncio.wait_for(reader.readline(), timeout=5.0)
+            parts = request.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+                status = '200 OK'
+                body = registry.render().encode()
+            else:
+                status = '404 Not Found'
+                body = b'not found\n'
+            writer.write(
+                f'HTTP/1.1 {status}\r\n'
+                'Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+                f'Content-Length: {len(body)}\r\n'
+                'Connection: close\r\n\r\n'.encode()
+                + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        except Exception as e:
+            print(f'`Error: metrics request failed: {e}`', file=sys.stderr)
+        finally:
+            writer.close()
@@ -0,0 +1,443 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules - typing
+from __future__ import annotations  # fixes some typehinting issues
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+# standard library modules
+import asyncio
+import collections
+import enum
+import time
+
+# third-party packages - discord related
+import discord
+
+# local modules
+import metrics
+
+
+class Priority(enum.IntEnum):
+    """
+    outbound lanes, lower values are sent first
+    """
+
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+class TokenBucket:
+    """
+    class for rate limiting a stream of requests
+    """
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        """initializer"""
+
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+
+    def wait_time(self, now: float) -> float:
+        """
+        refills the bucket and returns how long until a token is available
+        """
+
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+
+    def take(self) -> None:
+        """
+        uses up a token, only call after wait_time returned 0
+        """
+
+        self.tokens -= 1.0
+
+
+    def pause(self, seconds: float, now: float) -> None:
+        """
+        holds back the next token for at least seconds, e.g. after being rate limited
+        """
+
+        self.wait_time(now)
+        self.tokens = min(self.tokens, 1.0 - seconds * self.rate)
+
+
+def retry_after(error: Exception, attempt: int, backoff: float = 1.0) -> float:
+    """
+    returns how long to wait before retrying a rate limited request, as told by
+    discord's Retry-After header, or backing off exponentially without one
+    """
+
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers['Retry-After'])
+    except (KeyError, TypeError, ValueError):
+        return backoff * 2 ** attempt
+
+
+class Job:
+    """
+    class for a single queued discord request
+    """
+
+    __slots__ = ('priority', 'channel_id', 'call', 'kwargs', 'future', 'enqueued', 'key', 'attempts')
+
+    def __init__(
+            self,
+            priority: Priority,
+            channel_id: Optional[int],
+            call: Callable[..., Awaitable],
+            kwargs: Dict[str, Any],
+            enqueued: float,
+    ):
+        """initializer"""
+
+        self.priority = priority
+        self.channel_id = channel_id
+        self.call = call
+        self.kwargs = kwargs
+        self.future = asyncio.get_event_loop().create_future()
+        self.enqueued = enqueued
+
+        # message id for edits that can be coalesced
+        self.key: Optional[int] = None
+
+        # times the job was rate limited and retried
+        self.attempts = 0
+
+
+class Dispatcher:
+    """
+    rate limit aware queue for every outbound discord request
+
+    requests wait in priority lanes until both the global and their channel's
+    token buckets allow them through, queued edits of the same message are
+    coalesced so only the latest content is sent
+
+    requests that are rate limited anyway (a 429 response) go back to the front
+    of their lane and their channel (or every channel, for the global limit) is
+    held back for the Retry-After time, up to max_retries times
+    """
+
+    # idle channel buckets are dropped once there are more than this many
+    MAX_CHANNEL_BUCKETS = 10000
+
+    def __init__(
+            self,
+            global_rate: float = 40.0,
+            global_burst: float = 40.0,
+            channel_rate: float = 2.0,
+            channel_burst: float = 5.0,
+            max_in_flight: int = 32,
+            max_retries: int = 3,
+            retry_backoff: float = 1.0,  # first wait when a 429 has no Retry-After, doubled every retry
+            clock: Callable[[], float] = time.monotonic,
+    ):
+        """initializer"""
+
+        self.clock = clock
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.channel_rate = channel_rate
+        self.channel_burst = channel_burst
+        self._global = TokenBucket(global_rate, global_burst, clock())
+        self._channels: Dict[Optional[int], TokenBucket] = {}
+
+        # queued jobs by priority, and queued edits by message id for coalescing
+        self._lanes: List[Deque[Job]] = [collections.deque() for _ in Priority]
+        self._edits: Dict[int, Job] = {}
+        self._wakeup = asyncio.Event()
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._task: Optional[asyncio.Task] = None
+
+        # metrics
+        self.sent = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.retried = 0
+        self.errors = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+
+    def start(self) -> None:
+        """
+        starts sending queued requests
+        """
+
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+
+    def stop(self) -> None:
+        """
+        stops sending queued requests
+        """
+
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+    @property
+    def queue_depth(self) -> Dict[str, int]:
+        """
+        amount of queued requests in each lane
+        """
+
+        return {priority.name.lower(): len(self._lanes[priority]) for priority in Priority}
+
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        returns the queue depths and request metrics
+        """
+
+        return {
+            'queue_depth': self.queue_depth,
+            'sent': self.sent,
+            'coalesced': self.coalesced,
+            'rate_limited': self.rate_limited,
+            'retried': self.retried,
+            'errors': self.errors,
+            'latency_avg': self.latency_total / self.sent if self.sent else 0.0,
+            'latency_max': self.latency_max,
+        }
+
+
+    def send(
+            self,
+            destination: discord.abc.Messageable,
+            priority: Priority = Priority.INTERACTIVE,
+            **kwargs,
+    ) -> asyncio.Future:
+        """
+        queues a message to be sent to a channel, user, or context
+        """
+
+        channel = getattr(destination, 'channel', destination)
+        return self._submit(priority, getattr(channel, 'id', None), destination.send, kwargs)
+
+
+    def edit(
+            self,
+            message: discord.Message,
+            priority: Priority = Priority.INTERACTIVE,
+            **kwargs,
+    ) -> asyncio.Future:
+        """
+        queues a message edit, replacing the content of an edit to the same message that is still queued
+        """
+
+        job = self._edits.get(message.id)
+        if job is not None:
+            job.kwargs = kwargs
+            self.coalesced += 1
+            return job.future
+
+        job = self._submit(priority, message.channel.id, message.edit, kwargs, future=False)
+        job.key = message.id
+        self._edits[message.id] = job
+        return job.future
+
+
+    def add_reaction(
+            self,
+            message: discord.Message,
+            emoji,
+            priority: Priority = Priority.INTERACTIVE,
+    ) -> asyncio.Future:
+        """
+        queues adding a reaction to a message
+        """
+
+        return self._submit(priority, message.channel.id, message.add_reaction, {'emoji': emoji})
+
+
+    def remove_reaction(
+            self,
+            message: discord.Message,
+            emoji,
+            member: discord.abc.Snowflake,
+            priority: Priority = Priority.INTERACTIVE,
+    ) -> asyncio.Future:
+        """
+        queues removing a member's reaction from a message
+        """
+
+        kwargs = {'emoji': emoji, 'member': member}
+        return self._submit(priority, message.channel.id, message.remove_reaction, kwargs)
+
+
+    def clear_reactions(
+            self,
+            message: discord.Message,
+            priority: Priority = Priority.INTERACTIVE,
+    ) -> asyncio.Future:
+        """
+        queues clearing all reactions from a message
+        """
+
+        return self._submit(priority, message.channel.id, message.clear_reactions, {})
+
+
+    def _submit(self, priority, channel_id, call, kwargs, future=True):
+        """
+        queues a job, returning its future (or the job itself if future is False)
+        """
+
+        job = Job(Priority(priority), channel_id, call, kwargs, self.clock())
+        self._lanes[job.priority].append(job)
+        self._wakeup.set()
+        return job.future if future else job
+
+
+    def _channel_bucket(self, channel_id: Optional[int], now: float) -> TokenBucket:
+        bucket = self._channels.get(channel_id)
+        if bucket is None:
+            if len(self._channels) >= self.MAX_CHANNEL_BUCKETS:
+                for key, old in list(self._channels.items()):
+                    old.wait_time(now)
+                    if old.tokens >= old.capacity:
+                        del self._channels[key]
+            bucket = self._channels[channel_id] = TokenBucket(self.channel_rate, self.channel_burst, now)
+        return bucket
+
+
+    def _next_job(self, now: float):
+        """
+        pops the first job whose channel isn't rate limited, highest priority lane first,
+        returns the job or how long to wait until one might be ready
+        """
+
+        wait = None
+        for lane in self._lanes:
+            for skipped in range(len(lane)):
+                job = lane[0]
+                bucket_wait = self._channel_bucket(job.channel_id, now).wait_time(now)
+                if bucket_wait == 0.0:
+
+                    # put the skipped jobs back in front so each channel stays in order
+                    lane.popleft()
+                    lane.rotate(skipped)
+                    return job
+
+                # rotate jobs for rate limited channels out of the way
+                lane.rotate(-1)
+                wait = bucket_wait if wait is None else min(wait, bucket_wait)
+        return wait
+
+
+    async def _run(self) -> None:
+        """
+        sends queued jobs as fast as the rate limits allow
+        """
+
+        while True:
+            now = self.clock()
+
+            # wait for the global rate limit
+            global_wait = self._global.wait_time(now)
+            if global_wait > 0.0:
+                await asyncio.sleep(global_wait)
+                continue
+
+            # wait for a free request slot before picking the next job,
+            # so a job that is rate limited meanwhile is retried ahead of it
+            if self._in_flight.locked():
+                await self._in_flight.acquire()
+                self._in_flight.release()
+                continue
+
+            job = self._next_job(now)
+            if not isinstance(job, Job):
+
+                # nothing is queued, or everything queued is for rate limited channels
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=job)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._global.take()
+            self._channels[job.channel_id].take()
+            await self._in_flight.acquire()
+            asyncio.ensure_future(self._execute(job))
+
+
+    async def _execute(self, job: Job) -> None:
+        """
+        runs a job and resolves its future
+        """
+
+        # the job can no longer be coalesced with later edits once it has started
+        if job.key is not None and self._edits.get(job.key) is job:
+            del self._edits[job.key]
+
+        retry = None
+        try:
+            result = await job.call(**job.kwargs)
+        except Exception as e:
+            if isinstance(e, discord.HTTPException) and e.status == 429:
+                self.rate_limited += 1
+                metrics.count('packle_discord_rate_limited_total', source='outbound')
+                if job.attempts < self.max_retries:
+                    retry = retry_after(e, job.attempts, self.retry_backoff)
+                    headers = getattr(e.response, 'headers', None) or {}
+                    is_global = str(headers.get('X-RateLimit-Global', '')).lower() == 'true'
+            if retry is None:
+                self.errors += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+        else:
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self._in_flight.release()
+
+        if retry is not None:
+            self._retry(job, retry, is_global)
+            return
+
+        latency = self.clock() - job.enqueued
+        self.sent += 1
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+        metrics.observe('packle_outbound_latency_seconds', latency, priority=job.priority.name.lower())
+
+
+    def _retry(self, job: Job, seconds: float, is_global: bool = False) -> None:
+        """
+        queues a rate limited job again at the front of its lane, holding back its channel (or every channel)
+        """
+
+        now = self.clock()
+        job.attempts += 1
+        self.retried += 1
+        if is_global:
+            self._global.pause(seconds, now)
+        else:
+            self._channel_bucket(job.channel_id, now).pause(seconds, now)
+
+        # a newer edit of the same message was queued meanwhile, which replaces this one
+        if job.key is not None:
+            if job.key in self._edits:
+                self.coalesced += 1
+                if not job.future.done():
+                    job.future.set_result(None)
+                return
+            self._edits[job.key] = job
+
+        self._lanes[job.priority].appendleft(job)
+        self._wakeup.set()
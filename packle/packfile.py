@@ -0,0 +1,483 @@
+# -*- coding: utf-8 -*-
+"""
+compact binary pack format
+
+a pack file is laid out as little-endian sections, each aligned to 8 bytes
+
+    header      magic, version, flags, counts, round state, and section offsets
+    meta        the pack's name, category, difficulty, and scheduler name
+    texts       (text_count + 1) uint64 offsets into a blob of the pack's distinct utf-8 texts
+    records     a fixed-width (question, answer, proficiency, result) record per card
+    schedule    (optional) the due, stability, difficulty, and reps column of a due scheduler
+
+opening a file memory-maps it and only parses the header and meta, cards are
+read on demand, and since every record has the same width a card's proficiency
+or result can be changed in place without rewriting the file
+"""
+
+
+# standard library modules - typing
+from __future__ import annotations  # fixes some typehinting issues
+from typing import Iterator, List, Optional, Tuple, Union
+
+# standard library modules
+from array import array
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+# third-party packages - discord related
+import discord
+
+# local modules
+from cardpack import CardPack, FlashCard
+from scheduling import DueScheduler, make_scheduler
+from texts import TextBuffer, TextTable
+
+
+MAGIC = b'PKLE'
+VERSION = 1
+EXTENSION = '.packle'
+
+# magic, version, flags, card count, text count, round index, round active,
+# then the offsets of the meta, texts, records, and schedule sections
+HEADER = struct.Struct('<4sHHQQHBB4xQQQQ')
+
+# round index and round active, rewritten in place at their offset in the header
+ROUND = struct.Struct('<HB')
+ROUND_OFFSET = 24
+
+# question text index, answer text index, proficiency, result
+RECORD = struct.Struct('<IIbbxx')
+
+# header flags
+FLAG_SCHEDULE = 1
+
+# columns of the schedule section and their typecodes
+SCHEDULE_COLUMNS = ('d', 'd', 'd', 'i')
+
+# values a card's result can have
+RESULTS = frozenset(result.value for result in FlashCard.Result)
+
+ALIGNMENT = 8
+
+
+def _padding(offset: int) -> bytes:
+    return bytes(-offset % ALIGNMENT)
+
+
+def _little_endian(column: array) -> array:
+    """
+    returns a column in the file's byte order
+    """
+
+    if sys.byteorder != 'little':
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column
+
+
+def _encode(text: str) -> bytes:
+    return text.encode('utf-8', 'surrogatepass')
+
+
+def _decode(data: Union[bytes, memoryview]) -> str:
+    try:
+        return str(data, 'utf-8', 'surrogatepass')
+    except UnicodeDecodeError:
+        pass
+
+    # a view of the mapped file would be kept alive by the error (and this frame), so the file couldn't be closed
+    del data
+    raise ValueError('pack file is corrupt')
+
+
+def write(pack: CardPack, path: str) -> None:
+    """
+    writes a pack to a pack file, atomically replacing any existing file at path
+    """
+
+    size = len(pack)
+
+    # number the pack's distinct texts in the order they first appear
+    local = {}
+    for i in pack._questions:
+        local.setdefault(i, len(local))
+    for i in pack._answers:
+        local.setdefault(i, len(local))
+    questions = array('I', map(local.__getitem__, pack._questions))
+    answers = array('I', map(local.__getitem__, pack._answers))
+
+    # the string table
+    texts = [_encode(pack._texts[i]) for i in local]
+    offsets = array('Q', [0])
+    total = 0
+    for text in texts:
+        total += len(text)
+        offsets.append(total)
+
+    # the card records, the columns are interleaved with strided writes
+    records = bytearray(RECORD.size * size)
+    view = memoryview(records)
+    view.cast('I')[0::3] = memoryview(_little_endian(questions))
+    view.cast('I')[1::3] = memoryview(_little_endian(answers))
+    view.cast('b')[8::RECORD.size] = memoryview(pack._proficiency)
+    view.cast('b')[9::RECORD.size] = memoryview(pack._results)
+
+    schedule = isinstance(pack.scheduler, DueScheduler)
+    meta = b''.join(
+        struct.pack('<I', len(field)) + field
+        for field in map(_encode, (pack.name, pack.category, pack.difficulty, pack.scheduler.name))
+    )
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.packle-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(bytes(HEADER.size))
+
+            def section(*chunks) -> int:
+                f.write(_padding(f.tell()))
+                offset = f.tell()
+                for chunk in chunks:
+                    f.write(chunk)
+                return offset
+
+            meta_offset = section(meta)
+            texts_offset = section(_little_endian(offsets), *texts)
+            records_offset = section(records)
+            schedule_offset = 0
+            if schedule:
+                schedule_offset = section(*(
+                    _little_endian(array(typecode, column))
+                    for typecode, column in zip(SCHEDULE_COLUMNS, pack.scheduler.columns())
+                ))
+
+            f.seek(0)
+            f.write(HEADER.pack(
+                MAGIC, VERSION, FLAG_SCHEDULE if schedule else 0, size, len(texts),
+                pack.round_index, int(pack.round.active), 0,
+                meta_offset, texts_offset, records_offset, schedule_offset,
+            ))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class PackFile:
+    """
+    class for reading (and updating in place) a memory-mapped pack file
+
+    opening a file only parses its header and meta, every other read goes
+    straight to the mapped pages, so only the cards actually used are read
+    """
+
+    def __init__(self, path: str, writable: bool = False):
+        """initializer"""
+
+        self.path = path
+        self.writable = writable
+        with open(path, 'r+b' if writable else 'rb') as f:
+            try:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+            except ValueError:  # empty files can't be mapped
+                raise ValueError('not a packle pack file') from None
+        try:
+            self._parse()
+        except BaseException:
+            self._mm.close()
+            raise
+
+
+    def _parse(self):
+        """
+        reads and validates the header and meta
+        """
+
+        mm = self._mm
+        if len(mm) < HEADER.size:
+            raise ValueError('not a packle pack file')
+        (
+            magic, version, self.flags, self.card_count, self.text_count, self.round_index, self.round_active, _,
+            self._meta, self._texts, self._records, self._schedule,
+        ) = HEADER.unpack_from(mm)
+        if magic != MAGIC:
+            raise ValueError('not a packle pack file')
+        if version != VERSION:
+            raise ValueError(f'unsupported pack file version {version}')
+
+        # every section has to fit in the file
+        self._blob = self._texts + 8 * (self.text_count + 1)
+        sections = [(self._meta, 0), (self._texts, self._blob - self._texts), (self._records, RECORD.size * self.card_count)]
+        if self.flags & FLAG_SCHEDULE:
+            sections.append((self._schedule, sum(map(struct.calcsize, SCHEDULE_COLUMNS)) * self.card_count))
+        for offset, length in sections:
+            if offset < HEADER.size or offset % ALIGNMENT or offset + length > len(mm):
+                raise ValueError('pack file is truncated or corrupt')
+        if self._blob + self._offset(self.text_count) > len(mm):
+            raise ValueError('pack file is truncated or corrupt')
+
+        # name, category, difficulty, and scheduler name
+        fields = []
+        offset = self._meta
+        for _ in range(4):
+            if offset + 4 > len(mm):
+                raise ValueError('pack file is truncated or corrupt')
+            length, = struct.unpack_from('<I', mm, offset)
+            offset += 4
+            if offset + length > len(mm):
+                raise ValueError('pack file is truncated or corrupt')
+            fields.append(_decode(mm[offset:offset + length]))
+            offset += length
+        self.name, self.category, self.difficulty, self.scheduler_name = fields
+
+
+    def __enter__(self) -> PackFile:
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def close(self):
+        """
+        flushes any in-place changes and unmaps the file
+        """
+
+        if not self._mm.closed:
+            if self.writable:
+                self._mm.flush()
+            self._mm.close()
+
+
+    def __len__(self):
+        """
+        amount of cards in the file
+        """
+
+        return self.card_count
+
+
+    def _offset(self, i: int) -> int:
+        return struct.unpack_from('<Q', self._mm, self._texts + 8 * i)[0]
+
+
+    def _record(self, i: int) -> Tuple[int, int, int, int]:
+        if not 0 <= i < self.card_count:
+            raise IndexError('card index out of range')
+        return RECORD.unpack_from(self._mm, self._records + RECORD.size * i)
+
+
+    def text(self, i: int) -> str:
+        """
+        returns the text at index i of the string table
+        """
+
+        if not 0 <= i < self.text_count:
+            raise ValueError('pack file is corrupt')
+        start, end = struct.unpack_from('<QQ', self._mm, self._texts + 8 * i)
+        return _decode(self._mm[self._blob + start:self._blob + end])
+
+
+    def question(self, i: int) -> str:
+        return self.text(self._record(i)[0])
+
+
+    def answer(self, i: int) -> str:
+        return self.text(self._record(i)[1])
+
+
+    def proficiency(self, i: int) -> int:
+        return self._record(i)[2]
+
+
+    def result(self, i: int) -> int:
+        return self._record(i)[3]
+
+
+    def set_proficiency(self, i: int, value: int):
+        """
+        changes a card's proficiency in place
+        """
+
+        self._set(i, 8, CardPack._clamp(value))
+
+
+    def set_result(self, i: int, value: int):
+        """
+        changes a card's result in place
+        """
+
+        self._set(i, 9, value)
+
+
+    def _set(self, i: int, field: int, value: int):
+        if not self.writable:
+            raise ValueError('pack file was opened read-only')
+        if not 0 <= i < self.card_count:
+            raise IndexError('card index out of range')
+        struct.pack_into('<b', self._mm, self._records + RECORD.size * i + field, value)
+
+
+    def _column(self, offset: int, typecode: str, stride: int = 0) -> array:
+        """
+        reads a whole column, either a contiguous one or one field of every record
+        """
+
+        column = array(typecode)
+        view = memoryview(self._mm)
+        try:
+            if stride:
+                column.frombytes(view[offset:offset + stride * self.card_count:stride].tobytes())
+            else:
+                column.frombytes(view[offset:offset + column.itemsize * self.card_count])
+        finally:
+            view.release()
+        if column.itemsize > 1 and sys.byteorder != 'little':
+            column.byteswap()
+        return column
+
+
+    def _index_column(self, field: int) -> array:
+        """
+        reads the question (field 0) or answer (field 1) text indexes of every record
+        """
+
+        column = array('I')
+        view = memoryview(self._mm)
+        records = view[self._records:self._records + RECORD.size * self.card_count].cast('I')
+        try:
+            column.frombytes(records[field::3].tobytes())
+        finally:
+            records.release()
+            view.release()
+        if sys.byteorder != 'little':
+            column.byteswap()
+        if column and max(column) >= self.text_count:
+            raise ValueError('pack file is corrupt')
+        return column
+
+
+    def texts(self) -> List[str]:
+        """
+        returns every text of the string table
+        """
+
+        offsets = array('Q')
+        view = memoryview(self._mm)
+        try:
+            offsets.frombytes(view[self._texts:self._blob])
+            if sys.byteorder != 'little':
+                offsets.byteswap()
+            blob = view[self._blob:self._blob + offsets[-1]]
+            try:
+                return [_decode(blob[start:end]) for start, end in zip(offsets, offsets[1:])]
+            finally:
+                blob.release()
+        finally:
+            view.release()
+
+
+    def rows(self) -> Iterator[Tuple[str, str, int]]:
+        """
+        lazily reads every card as a (question, answer, proficiency) tuple
+        """
+
+        for i in range(self.card_count):
+            question, answer, proficiency, _ = self._record(i)
+            yield self.text(question), self.text(answer), proficiency
+
+
+    def to_pack(
+            self,
+            author: Union[discord.Member, discord.User],
+            dm_channel: Optional[discord.DMChannel] = None,
+            texts: Union[TextBuffer, TextTable] = None,
+    ) -> CardPack:
+        """
+        loads every card into a new CardPack, including its study progress
+        """
+
+        texts = TextBuffer() if texts is None else texts
+        if self.flags & FLAG_SCHEDULE:
+            columns = []
+            offset = self._schedule
+            for typecode in SCHEDULE_COLUMNS:
+                columns.append(self._column(offset, typecode))
+                offset += columns[-1].itemsize * self.card_count
+            scheduler = make_scheduler(self.scheduler_name, zip(*columns))
+        else:
+            scheduler = make_scheduler(self.scheduler_name)
+
+        pack = CardPack(
+            (),
+            name=self.name,
+            author=author,
+            dm_channel=dm_channel,
+            category=self.category,
+            difficulty=self.difficulty,
+            round_index=self.round_index,
+            scheduler=scheduler,
+            texts=texts,
+        )
+
+        questions = self._index_column(0)
+        answers = self._index_column(1)
+        proficiency = self._column(self._records + 8, 'b', RECORD.size)
+        results = self._column(self._records + 9, 'b', RECORD.size)
+        if proficiency and not 1 <= min(proficiency) <= max(proficiency) <= CardPack.MAX_PROFICIENCY:
+            raise ValueError('pack file is corrupt')
+        if not RESULTS.issuperset(results):
+            raise ValueError('pack file is corrupt')
+
+        # each distinct text is acquired once, then the cards share its id
+        ids = texts.acquire(self.texts())
+        try:
+            pack._append(
+                texts.share(map(ids.__getitem__, questions)),
+                texts.share(map(ids.__getitem__, answers)),
+                proficiency,
+                results,
+            )
+        finally:
+            texts.release(ids)
+        pack.round.active = bool(self.round_active)
+        return pack
+
+
+    def sync(self, pack: CardPack):
+        """
+        writes a pack's study progress over the file's in place,
+        the pack must have been loaded from this file and still have the same cards
+        """
+
+        if not self.writable:
+            raise ValueError('pack file was opened read-only')
+        if len(pack) != self.card_count:
+            raise ValueError('pack has a different amount of cards than the file')
+        schedule = isinstance(pack.scheduler, DueScheduler)
+        if pack.scheduler.name != self.scheduler_name or schedule != bool(self.flags & FLAG_SCHEDULE):
+            raise ValueError('pack has a different scheduler than the file')
+
+        view = memoryview(self._mm)
+        try:
+            records = view[self._records:self._records + RECORD.size * self.card_count]
+            records[8::RECORD.size] = memoryview(pack._proficiency).cast('B')
+            records[9::RECORD.size] = memoryview(pack._results).cast('B')
+            records.release()
+            if schedule:
+                offset = self._schedule
+                for typecode, column in zip(SCHEDULE_COLUMNS, pack.scheduler.columns()):
+                    data = memoryview(_little_endian(array(typecode, column))).cast('B')
+                    view[offset:offset + len(data)] = data
+                    offset += len(data)
+        finally:
+            view.release()
+
+        ROUND.pack_into(self._mm, ROUND_OFFSET, pack.round_index, int(pack.round.active))
+        self.round_index = pack.round_index
+        self.round_active = int(pack.round.active)
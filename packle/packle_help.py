@@ -16,6 +16,19 @@ class PackleHelp(commands.HelpCommand):
     def __init__(self, **options):
         super().__init__(**options)
 
+    async def prepare_help_command(self, ctx: commands.Context, command: Optional[str] = None) -> None:
+        """
+        loads the deferred extensions help is about, all of them for the full listing
+        """
+
+        await super().prepare_help_command(ctx, command)
+        bot = ctx.bot
+        if command:
+            bot.load_deferred_extension(command.split()[0])
+        else:
+            for command_name in list(bot.deferred_extensions):
+                bot.load_deferred_extension(command_name)
+
     async def send_bot_help(self, mapping: Mapping[Optional[commands.Cog], List[commands.Command]]) -> None:
         pack_cmds = ('__Packs__', [])
         practice_cmds = ('__Practice__', [])
@@ -65,7 +78,7 @@ class PackleHelp(commands.HelpCommand):
         embed.add_field(name=name, value=value, inline=False)
 
         dest = self.get_destination()
-        await dest.send(embed=embed)
+        await self.context.bot.outbound.send(dest, embed=embed)
 
 
     async def send_command_help(self, command: commands.Command) -> None:
@@ -89,7 +102,7 @@ class PackleHelp(commands.HelpCommand):
         embed.add_field(name=name, value=value, inline=False)
 
         dest = self.get_destination()
-        await dest.send(embed=embed)
+        await self.context.bot.outbound.send(dest, embed=embed)
 
 
     async def send_cog_help(self, cog):
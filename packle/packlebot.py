@@ -1,15 +1,281 @@
 # -*- coding: utf-8 -*-
 
 
+# standard library modules - typing
+from typing import Dict, Iterable, Optional
+
+# standard library modules
+import asyncio
+import functools
+import logging
+import sys
+import traceback
+
 # third-party packages - discord related
-from discord.ext import commands
+import discord
+from discord.ext import commands, tasks
 
+# local modules
+import metrics
+from cache import UserCache
+from outbound import Dispatcher
+from profiler import Profiler, owning
+from reminders import ReminderScheduler, send_digest, send_reminder
+from reviewlog import ReviewLog
+from sharding import ShardConfig
+from storage import PackStore, SQLitePackStore
+from workers import Workers, shared_workers
 
-class Packle(commands.Bot):
-    def __init__(self, *args, **kwargs) -> None:
+
+class Packle(commands.AutoShardedBot):
+    def __init__(
+            self,
+            *args,
+            db_path: str = 'packle.db',
+            shards: ShardConfig = None,
+            metrics_port: Optional[int] = None,
+            reminder_digest_window: Optional[float] = None,
+            profile: bool = False,
+            slow_callback: float = 0.1,
+            **kwargs,
+    ) -> None:
         """initializer"""
 
-        super().__init__(*args, **kwargs)
+        # the shards this process runs, by default every shard in a single process
+        self.shards_config = shards or ShardConfig()
+        super().__init__(*args, **self.shards_config.bot_kwargs(), **kwargs)
+
+        # count every discord API request, and the rate limits discord.py retries internally
+        self._instrument_http()
+        logging.getLogger('discord.http').addHandler(metrics.RateLimitCounter())
+
+        # prometheus exporter, only run when a port is given
+        self.metrics_server = metrics.MetricsServer(port=metrics_port) if metrics_port else None
+
+        # storage for each user's FlashCard CardPacks, shared by every process
+        self.packs: PackStore = SQLitePackStore(
+            db_path,
+            resolve_user=self._resolve_user,
+            resolve_channel=self._resolve_channel,
+            shared=self.shards_config.shared,
+        )
+
+        # users shared across cogs, so reaction handling doesn't fetch them every time
+        self.user_cache = UserCache(self)
+
+        # rate limited queue for outbound discord requests
+        self.outbound = Dispatcher()
+
+        # process and thread pools for keeping large card operations and blocking I/O off the event loop
+        self.workers: Workers = shared_workers
+
+        # single scheduler for the spaced repetition reminders sent through this process's shards,
+        # reminders for the same channel within reminder_digest_window seconds are sent as one digest,
+        # without a window (the default) every reminder is sent as soon as it's due
+        self.reminders = ReminderScheduler(
+            self.packs,
+            send=functools.partial(send_reminder, outbound=self.outbound),
+            owns=self.shards_config.owns_guild if self.shards_config.shared else None,
+            send_digest=functools.partial(send_digest, outbound=self.outbound),
+            digest_window=reminder_digest_window,
+            workers=self.workers,
+            resolve=self._fetch_remind_channel,
+        )
+
+        # history of every card review, written in the background
+        self.reviews = ReviewLog(db_path)
+
+        # event loop lag and slow callback profiling, only timing callbacks when profile is set,
+        # though stack samples can always be taken
+        self.profile = profile
+        self.profiler = Profiler(slow_callback=slow_callback)
+
+        # extensions that are only loaded once one of their commands is used, by command name
+        self.deferred_extensions: Dict[str, str] = {}
+
+        # reminders and pack flushing wait for the cache to be filled, so packs they load can
+        # resolve their channels, as a listener it runs alongside any on_ready event
+        self.add_listener(self._start_when_ready, 'on_ready')
+
+
+    async def start(self, *args, **kwargs) -> None:
+        """
+        starts the outbound queue and review logging alongside the bot
+        """
+
+        if self.profile:
+            self.profiler.start()
+        self.outbound.start()
+        self.reviews.start()
+        if self.metrics_server is not None:
+            await self.metrics_server.start()
+        await super().start(*args, **kwargs)
+
+
+    async def _start_when_ready(self) -> None:
+        """
+        starts periodic pack flushing and reminders once the bot is ready,
+        on_ready is dispatched again after reconnecting so they're only started once
+        """
+
+        if not self.flush_packs.is_running():
+            self.flush_packs.start()
+        if not self.reminders.running:
+            self.reminders.start()
+
+
+    async def close(self) -> None:
+        """
+        writes any pending pack changes before shutting down
+        """
+
+        self.reminders.stop()
+        self.outbound.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        self.flush_packs.cancel()
+        self.packs.close()
+        self.reviews.close()
+        self.workers.shutdown()
+        self.profiler.stop()
+        await super().close()
+
+
+    def _instrument_http(self) -> None:
+        """
+        wraps the HTTP client's requests with counters and latency histograms by route
+        """
+
+        request = self.http.request
+
+        async def instrumented_request(route, **kwargs):
+            if not metrics.registry.enabled:
+                return await request(route, **kwargs)
+            metrics.count('packle_discord_requests_total', method=route.method, path=route.path)
+            try:
+                with metrics.timer('packle_discord_request_seconds', method=route.method, path=route.path):
+                    return await request(route, **kwargs)
+            except discord.HTTPException as e:
+                if e.status == 429:
+                    metrics.count('packle_discord_rate_limited_total', source='response')
+                raise
+
+        self.http.request = instrumented_request
+
+
+    async def invoke(self, ctx: commands.Context) -> None:
+        """
+        invokes a command, timing it by command name
+        """
+
+        if ctx.command is None:
+            return await super().invoke(ctx)
+        with owning(f'command {ctx.command.qualified_name}'):
+            with metrics.timer('packle_command_seconds', command=ctx.command.qualified_name):
+                await super().invoke(ctx)
+
+
+    def _schedule_event(self, coro, event_name: str, *args, **kwargs) -> asyncio.Task:
+        """
+        schedules an event listener, which the profiler attributes any time it spends to
+        """
+
+        with owning(f'listener {getattr(coro, "__qualname__", event_name)}'):
+            return super()._schedule_event(coro, event_name, *args, **kwargs)
+
+
+    def defer_extension(self, name: str, command_names: Iterable[str]) -> None:
+        """
+        loads an extension the first time one of its commands is invoked instead of now
+        """
+
+        for command_name in command_names:
+            self.deferred_extensions[command_name.lower()] = name
+
+
+    def load_deferred_extension(self, command_name: str) -> bool:
+        """
+        loads the deferred extension of a command, if there is one, returns whether one was loaded
+        """
+
+        name = self.deferred_extensions.get(command_name.lower())
+        if name is None:
+            return False
+        for deferred_name, extension in list(self.deferred_extensions.items()):
+            if extension == name:
+                del self.deferred_extensions[deferred_name]
+        try:
+            self.load_extension(name)
+        except Exception:
+            print(f'`Error: failed to load extension {name}`', file=sys.stderr)
+            traceback.print_exc()
+        return True
+
+
+    async def process_commands(self, message: discord.Message) -> None:
+        """
+        processes commands, loading deferred extensions on their first command
+        """
+
+        if message.author.bot:
+            return
+
+        ctx = await self.get_context(message)
+        if ctx.command is None and ctx.invoked_with and self.load_deferred_extension(ctx.invoked_with):
+            ctx = await self.get_context(message)
+        await self.invoke(ctx)
+
+
+    @tasks.loop(seconds=30.0)
+    async def flush_packs(self) -> None:
+        """
+        writes changed packs to storage in batches
+        """
+
+        self.packs.flush()
+
+
+    def _resolve_user(self, user_id: int):
+        """
+        gets a user from the cache, falling back to a bare discord.Object
+        """
+
+        return self.get_user(user_id) or discord.Object(id=user_id)
+
+
+    def _resolve_channel(self, channel_id: int, user):
+        """
+        gets a channel from the cache, falling back to the user which can also be messaged
+        """
+
+        channel = self.get_channel(channel_id) if channel_id is not None else None
+        if channel is None and isinstance(user, discord.abc.Messageable):
+            return user
+        return channel
+
+
+    async def _fetch_remind_channel(self, pack) -> bool:
+        """
+        fetches the remind channel of a pack that wasn't cached when the pack was loaded (e.g.
+        DM channels and uncached users after a restart), falling back to messaging its author,
+        returns whether the pack can be reminded about
+        """
+
+        # resolved from the cache, rather than stood in for by the author
+        if pack.remind_channel is not None and pack.remind_channel is not pack.author:
+            return True
+
+        if pack.remind_channel_id is not None:
+            try:
+                pack.remind_channel = await self.fetch_channel(pack.remind_channel_id)
+                return True
+            except (discord.HTTPException, discord.InvalidData):
+                pass
 
-        # storage for each user's FlashCard CardPacks
-        self.packs = {}
+        if not isinstance(pack.author, discord.abc.Messageable):
+            try:
+                pack.author = await self.user_cache.get(pack.author.id)
+            except discord.HTTPException:
+                return False
+        pack.remind_channel = pack.author
+        return True
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules - typing
+from __future__ import annotations  # fixes some typehinting issues
+from typing import Any, Deque, Dict, Optional, Tuple
+
+# standard library modules
+import asyncio
+import collections
+import contextlib
+import contextvars
+import os
+import sys
+import threading
+import time
+
+# local modules
+import metrics
+
+
+# what the code running on the event loop is doing it for, e.g. 'command quiz',
+# tasks inherit it from whatever created them
+owner: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('packle_owner', default=None)
+
+# the event loop runs every callback through this method, the profiler wraps it to time them
+_handle_run = asyncio.events.Handle._run
+
+# the profiler timing the callbacks, only one can be installed at a time
+_installed: Optional[Profiler] = None
+
+
+@contextlib.contextmanager
+def owning(label: str):
+    """
+    attributes everything run within the block, and any task it creates, to label
+    """
+
+    token = owner.set(label)
+    try:
+        yield
+    finally:
+        owner.reset(token)
+
+
+def owner_of(handle: asyncio.Handle) -> str:
+    """
+    returns who a callback is run for: its owner if it was set, otherwise the
+    coroutine of the task it steps, or the callback itself
+    """
+
+    label = handle._context.get(owner) if handle._context is not None else None
+    if label is not None:
+        return label
+    callback = handle._callback
+    task = getattr(callback, '__self__', None)
+    if isinstance(task, asyncio.Task):
+        coro = task.get_coro()
+        return f'task {getattr(coro, "__qualname__", type(coro).__name__)}'
+    return f'callback {getattr(callback, "__qualname__", type(callback).__name__)}'
+
+
+def _timed_run(handle: asyncio.Handle) -> None:
+    """
+    replacement for asyncio.Handle._run that times every callback
+    """
+
+    profiler = _installed
+    if profiler is None:
+        return _handle_run(handle)
+    profiler._current = handle
+    start = time.perf_counter()
+    try:
+        _handle_run(handle)
+    finally:
+        profiler._current = None
+        elapsed = time.perf_counter() - start
+        if elapsed >= profiler.slow_callback:
+            profiler._slow(handle, elapsed)
+
+
+class Profiler:
+    """
+    class for finding out what's holding up the event loop
+
+    once started it samples the loop's lag (how late a sleeping task wakes up)
+    every lag_interval, and times every callback the loop runs, logging the
+    ones slower than slow_callback along with their owner, both only cost a
+    couple of clock reads per callback so it can be left on
+
+    sample records a flame graph profile of a window of time on demand, by
+    sampling the loop thread's stack from another thread
+    """
+
+    def __init__(
+            self,
+            slow_callback: float = 0.1,
+            lag_interval: float = 0.5,
+            history: int = 20,
+    ):
+        """initializer"""
+
+        self.slow_callback = slow_callback
+        self.lag_interval = lag_interval
+
+        # the latest and largest lag, and the latest slow callbacks as (time, owner, seconds)
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.slow_callbacks: Deque[Tuple[float, str, float]] = collections.deque(maxlen=history)
+        self.slow_count = 0
+
+        # callback currently being run, and the thread running the loop
+        self._current: Optional[asyncio.Handle] = None
+        self._thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._sampling = False
+
+
+    @property
+    def running(self) -> bool:
+        return _installed is self
+
+
+    def start(self) -> None:
+        """
+        starts timing callbacks and sampling the lag of the running event loop
+        """
+
+        global _installed
+        if _installed is not None:
+            raise RuntimeError('a profiler is already running')
+        _installed = self
+        asyncio.events.Handle._run = _timed_run
+        self._thread_id = threading.get_ident()
+        self._task = asyncio.ensure_future(self._sample_lag())
+
+
+    def stop(self) -> None:
+        """
+        stops timing callbacks and sampling the loop's lag
+        """
+
+        global _installed
+        if _installed is self:
+            _installed = None
+            asyncio.events.Handle._run = _handle_run
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+    async def _sample_lag(self) -> None:
+        """
+        sleeps for lag_interval at a time, anything over that is time the loop was busy
+        """
+
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.lag_interval)
+            self.lag = max(0.0, time.perf_counter() - start - self.lag_interval)
+            self.max_lag = max(self.max_lag, self.lag)
+            metrics.observe('packle_loop_lag_seconds', self.lag)
+
+
+    def _slow(self, handle: asyncio.Handle, elapsed: float) -> None:
+        """
+        logs a callback that held up the loop
+        """
+
+        label = owner_of(handle)
+        self.slow_count += 1
+        self.slow_callbacks.append((time.time(), label, elapsed))
+        metrics.count('packle_slow_callbacks_total')
+        print(f'`Warning: {label} held up the event loop for {elapsed * 1e3:.0f}ms`', file=sys.stderr)
+
+
+    async def sample(self, seconds: float, interval: float = 0.005) -> str:
+        """
+        samples the event loop thread's stack every interval for seconds, returns
+        the samples as collapsed stacks (one 'root;...;leaf count' line per stack)
+        for flame graph tools, rooted at the owner of the callback running
+        """
+
+        if self._sampling:
+            raise RuntimeError('already sampling')
+        self._sampling = True
+        thread_id = self._thread_id or threading.get_ident()
+        stacks: Dict[str, int] = collections.Counter()
+        done = threading.Event()
+
+        def sampler():
+            while not done.wait(interval):
+                frame = sys._current_frames().get(thread_id)
+                handle = self._current
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f'{os.path.basename(code.co_filename)}:{getattr(code, "co_qualname", code.co_name)}')
+                    frame = frame.f_back
+
+                # the owner is only known while the profiler is timing callbacks
+                if handle is not None:
+                    names.append(owner_of(handle))
+                elif self.running:
+                    names.append('idle')
+                stacks[';'.join(reversed(names))] += 1
+
+        thread = threading.Thread(target=sampler, name='packle-profiler', daemon=True)
+        thread.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            done.set()
+            thread.join()
+            self._sampling = False
+        return ''.join(f'{stack} {count}\n' for stack, count in sorted(stacks.items()))
+
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        returns the loop's lag and the amount of slow callbacks
+        """
+
+        return {
+            'lag': self.lag,
+            'max lag': self.max_lag,
+            'slow callbacks': self.slow_count,
+        }
@@ -1,101 +1,701 @@
 # -*- coding: utf-8 -*-
 
 
+# standard library modules - typing
+from __future__ import annotations  # fixes some typehinting issues
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
 # standard library modules
 import asyncio
+import heapq
 import itertools
+import sys
+import time
+import traceback
 
 # third-party packages - discord related
 import discord
-from discord.ext import tasks
 
 # local modules
+import metrics
 from cardpack import CardPack
 from constants import Colors
+from outbound import Dispatcher, Priority
+from storage import PackStore
+from workers import Workers, next_round
 
 
-async def create_reminder(
-        pack: CardPack,
-        seconds: float = 0.0,
-        minutes: float = 0.0,
-        hours: float = 24.0,
-        count: int = None,  # infinite
-        reconnect: bool = True,
-        loop: asyncio.AbstractEventLoop = None,
-):
-
-    @tasks.loop(
-        seconds=seconds,
-        minutes=minutes,
-        hours=hours,
-        count=count,
-        reconnect=reconnect,
-        loop=loop,
-    )
-    async def reminder() -> None:
-        """
-        sends spaced repetition reminder to practice specified CardPack
-        """
+# most packs listed on a single page of a reminder digest, and the characters of their fields,
+# discord allows at most 25 fields and 6000 characters in an embed
+DIGEST_PAGE_SIZE = 20
+DIGEST_PAGE_CHARACTERS = 5000
+DIGEST_FIELD_NAME_LIMIT = 256
 
-        r: tasks.Loop = pack.reminder
-        if r.current_loop == 0:
-            return
 
-        # if the last round wasn't completed
-        if pack.round.active:
+async def advance_round(pack: CardPack, workers: Workers = None) -> None:
+    """
+    moves a pack on to the round it should be reminded about,
+    the round change of a large pack is worked out off the event loop
+    """
 
-            # skips it and sets up the next one
-            pack.next_round()
+    # if the last round wasn't completed
+    if pack.round.active:
 
-        # otherwise current round was setup when the previous one was completed
-        else:
+        # skips it and sets up the next one
+        await next_round(pack, workers=workers)
 
-            # activates current round
-            pack.round.active = True
+    # otherwise current round was setup when the previous one was completed
+    else:
 
-        # format proficiency the levels of the round
-        proficiency_levels = [str(x) for x in CardPack.Round.ROUNDS[pack.round_index]]
-        if len(proficiency_levels) > 2:
-            start = ', '.join(itertools.islice(proficiency_levels, len(proficiency_levels) - 1))
-            proficiency_levels = f'{start}, and {proficiency_levels[-1]}'
-        else:
-            proficiency_levels = ' and '.join(proficiency_levels)
+        # activates current round
+        pack.round.active = True
 
-        # create the embed
-        title = 'Flashcard Reminder'
-        embed = discord.Embed(
-            color=Colors.embed,
-            title=title
-        )
 
-        name = pack.name
-        value = f"It's time to practice your flashcard pack {repr(pack.name)}"
-        embed.add_field(name=name, value=value, inline=False)
+def _proficiency_levels(pack: CardPack) -> Optional[str]:
+    """
+    formats the proficiency levels of a pack's round, None if the pack's scheduler doesn't use them
+    """
+
+    levels = pack.scheduler.levels(pack)
+    if levels is None:
+        return None
+    proficiency_levels = [str(x) for x in levels]
+    if len(proficiency_levels) > 2:
+        start = ', '.join(itertools.islice(proficiency_levels, len(proficiency_levels) - 1))
+        return f'{start}, and {proficiency_levels[-1]}'
+    return ' and '.join(proficiency_levels)
+
 
-        name = 'Round'
-        value = str(pack.round_index + 1)
-        embed.add_field(name=name, value=value)
+def remind_guild_id(pack: CardPack) -> Optional[int]:
+    """
+    returns the id of the guild a pack is reminded about in, None for direct messages
+    """
 
+    # the author stands in for the channel when the reminder is sent to them directly
+    if pack.remind_channel is pack.author:
+        return None
+    return getattr(getattr(pack.remind_channel, 'guild', None), 'id', None)
+
+
+def make_reminder_embed(pack: CardPack) -> discord.Embed:
+    """
+    creates the spaced repetition reminder embed for a CardPack
+    """
+
+    # format proficiency the levels of the round, if the pack's scheduler uses them
+    proficiency_levels = _proficiency_levels(pack)
+
+    # create the embed
+    title = 'Flashcard Reminder'
+    embed = discord.Embed(
+        color=Colors.embed,
+        title=title
+    )
+
+    name = pack.name
+    value = f"It's time to practice your flashcard pack {repr(pack.name)}"
+    embed.add_field(name=name, value=value, inline=False)
+
+    name = 'Round'
+    value = str(pack.round_index + 1)
+    embed.add_field(name=name, value=value)
+
+    # otherwise the round is made up of the cards that are due
+    if proficiency_levels is None:
+        name = 'Schedule'
+        value = pack.scheduler.name.upper()
+    else:
         name = 'Proficiency Level(s)'
         value = proficiency_levels
-        embed.add_field(name=name, value=value)
+    embed.add_field(name=name, value=value)
 
-        name = 'Cards'
-        value = len(pack.round)
-        embed.add_field(name=name, value=value)
+    name = 'Cards'
+    value = len(pack.round)
+    embed.add_field(name=name, value=value)
 
-        # add information field if the round has no cards
-        if not pack.round:
-            name = 'Notice'
+    # add information field if the round has no cards
+    if not pack.round:
+        name = 'Notice'
+        if proficiency_levels is None:
+            value = 'None of the cards in this pack are due yet, you may add more cards or wait for the next reminder'
+        else:
             value = (
                 'You have already mastered all proficiencies included in '
                 f"this round, your may add more cards or use the `$next_round <pack_name>` "
                 'command to manually advance the pack to the next non-empty round'
             )
+        embed.add_field(name=name, value=value, inline=False)
+
+    return embed
+
+
+def make_digest_embeds(packs: List[CardPack]) -> List[discord.Embed]:
+    """
+    creates the reminder digest for several CardPacks reminded about in the same channel,
+    split into pages when the packs don't fit in a single embed
+    """
+
+    # packs of different users can share a (server) channel, so they're told apart by their author
+    authors = len({pack.author.id for pack in packs}) > 1
+
+    fields = []
+    for pack in packs:
+        name = f'{pack.name} ({pack.author})' if authors else pack.name
+        proficiency_levels = _proficiency_levels(pack)
+        if proficiency_levels is None:
+            value = f'**Round** {pack.round_index + 1} | **Schedule** {pack.scheduler.name.upper()}'
+        else:
+            value = f'**Round** {pack.round_index + 1} | **Proficiency Level(s)** {proficiency_levels}'
+        value += f' | **Cards** {len(pack.round)}'
+        fields.append((name[:DIGEST_FIELD_NAME_LIMIT], value))
+
+    # split the fields into pages that fit discord's embed limits
+    pages = [[]]
+    size = 0
+    for name, value in fields:
+        if len(pages[-1]) == DIGEST_PAGE_SIZE or size + len(name) + len(value) > DIGEST_PAGE_CHARACTERS:
+            pages.append([])
+            size = 0
+        pages[-1].append((name, value))
+        size += len(name) + len(value)
+
+    embeds = []
+    for i, page in enumerate(pages, 1):
+        embed = discord.Embed(
+            color=Colors.embed,
+            title='Flashcard Reminders',
+            description=f"It's time to practice {len(packs)} of your flashcard packs",
+        )
+        for name, value in page:
             embed.add_field(name=name, value=value, inline=False)
+        if len(pages) > 1:
+            embed.set_footer(text=f'page {i} of {len(pages)}')
+        embeds.append(embed)
+    return embeds
+
+
+async def send_reminder(pack: CardPack, outbound: Dispatcher = None) -> None:
+    """
+    sends spaced repetition reminder to practice specified CardPack
+    """
 
-        # send the reminder
+    if pack.remind_channel is None:
+        return
+    embed = make_reminder_embed(pack)
+    if outbound is None:
         await pack.remind_channel.send(embed=embed)
+    else:
+        await outbound.send(pack.remind_channel, Priority.BACKGROUND, embed=embed)
+
+
+async def send_digest(packs: List[CardPack], outbound: Dispatcher = None) -> None:
+    """
+    sends a single reminder digest for several CardPacks with the same remind channel
+    """
+
+    channel = packs[0].remind_channel
+    if channel is None:
+        return
+    for embed in make_digest_embeds(packs):
+        if outbound is None:
+            await channel.send(embed=embed)
+        else:
+            await outbound.send(channel, Priority.BACKGROUND, embed=embed)
+
+
+class Reminder:
+    """
+    class for storing the schedule of a single pack's reminder
+    """
+
+    __slots__ = ('user_id', 'pack_name', 'interval', 'due', 'remaining', 'guild_id', 'cancelled')
+
+    def __init__(
+            self,
+            user_id: int,
+            pack_name: str,
+            interval: float,
+            due: float,
+            remaining: Optional[int] = None,  # infinite
+            guild_id: Optional[int] = None,  # direct messages
+    ):
+        """initializer"""
+
+        self.user_id = user_id
+        self.pack_name = pack_name
+        self.interval = interval
+        self.due = due
+        self.remaining = remaining
+
+        # guild of the pack's remind channel, which decides the process that fires the reminder
+        self.guild_id = guild_id
+        self.cancelled = False
+
+
+    def cancel(self) -> None:
+        """
+        stops this reminder from firing again
+        """
+
+        self.cancelled = True
+
+
+class ReminderDigests:
+    """
+    class for collecting the packs reminded about in the same channel, so
+    they're sent as a single digest instead of one message per pack
+
+    a channel's window opens when its first pack is added, every pack added
+    to the same channel before the window closes joins the same digest
+    """
+
+    def __init__(self, window: float):
+        """initializer"""
+
+        self.window = window
+
+        # (time the window closes, packs) by channel
+        self._pending: Dict[int, Tuple[float, List[CardPack]]] = {}
+
+
+    def __len__(self):
+        """
+        amount of packs waiting for their window to close
+        """
+
+        return sum(len(packs) for _, packs in self._pending.values())
+
+
+    def add(self, pack: CardPack, now: float) -> None:
+        """
+        adds a pack to its channel's digest, packs without a remind channel are dropped
+        """
+
+        channel = pack.remind_channel
+        if channel is None:
+            return
+        key = getattr(channel, 'id', id(channel))
+        entry = self._pending.get(key)
+        if entry is None:
+            entry = self._pending[key] = (now + self.window, [])
+        entry[1].append(pack)
+
+
+    def pop_ready(self, now: float) -> List[List[CardPack]]:
+        """
+        pops the packs of every channel whose window has closed, grouped by channel
+        """
+
+        ready = [key for key, (closes, _) in self._pending.items() if closes <= now]
+        return [self._pending.pop(key)[1] for key in ready]
+
+
+class ReminderScheduler:
+    """
+    fires the reminders of every pack from a single task
+
+    reminders are kept in a heap ordered by due time, every tick all due
+    reminders are popped, their packs advanced in bulk, and the sends handed
+    to a fixed number of workers through a bounded queue, the next due times
+    are written to the pack store so reminders survive restarts
+
+    when several processes share the pack store, each one only fires the
+    reminders it owns (see ShardConfig.owns_guild), reminders scheduled or
+    cancelled by other processes are picked up from the store every sync_interval
+
+    with a digest_window, the packs due for the same channel within the
+    window are sent as a single digest (send_digest) instead of one reminder
+    each, packs that are alone in their window are still sent with send
+
+    a pack whose remind channel couldn't be resolved when it was loaded is
+    given to resolve (e.g. to fetch the channel), if it still can't be sent
+    to the reminder isn't fired but tried again after retry_delay
+    """
+
+    def __init__(
+            self,
+            store: PackStore,
+            send: Callable[[CardPack], Awaitable[None]] = send_reminder,
+            tick: float = 1.0,
+            concurrency: int = 8,
+            batch_size: int = 256,
+            clock: Callable[[], float] = time.time,
+            owns: Callable[[Optional[int]], bool] = None,
+            sync_interval: float = 30.0,
+            send_digest: Callable[[List[CardPack]], Awaitable[None]] = send_digest,
+            digest_window: Optional[float] = None,  # every reminder is sent on its own
+            workers: Workers = None,
+            resolve: Callable[[CardPack], Awaitable[bool]] = None,
+            retry_delay: float = 300.0,
+    ):
+        """initializer"""
+
+        # which guilds' reminders this process fires (None for direct messages), None for all of them
+        self.owns = owns
+        self.sync_interval = sync_interval
+
+        self.store = store
+        self.send = send
+        self.tick = tick
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.clock = clock
+
+        # pools the round changes of large packs are run in
+        self.workers = workers
+
+        # coroutine that resolves a pack's remind channel, returning whether it can be sent to
+        self.resolve = resolve
+        self.retry_delay = retry_delay
+
+        # packs waiting for their channel's digest window to close
+        self.send_digest = send_digest
+        self.digests = None if digest_window is None else ReminderDigests(digest_window)
+
+        # heap of (due, sequence, Reminder), cancelled or rescheduled entries are skipped when popped
+        self._heap: List[Tuple[float, int, Reminder]] = []
+        self._sequence = itertools.count()
+        self._reminders: Dict[Tuple[int, str], Reminder] = {}
+
+        # sends (of one or more packs with the same channel) waiting for a worker
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+
+    def __len__(self):
+        """
+        amount of scheduled reminders
+        """
+
+        return len(self._reminders)
+
+
+    def get(self, user_id: int, pack_name: str) -> Optional[Reminder]:
+        """
+        returns the reminder for a pack, if it has one
+        """
+
+        return self._reminders.get((user_id, pack_name))
+
+
+    def schedule(
+            self,
+            user_id: int,
+            pack: CardPack,
+            seconds: float = 0.0,
+            minutes: float = 0.0,
+            hours: float = 24.0,
+            count: int = None,  # infinite
+    ) -> Reminder:
+        """
+        schedules a pack to be reminded about every interval, replacing any existing reminder
+        """
+
+        interval = seconds + 60.0 * minutes + 3600.0 * hours
+        if interval <= 0:
+            raise ValueError('interval must be greater than 0')
 
+        reminder = Reminder(user_id, pack.name, interval, self.clock() + interval, count, remind_guild_id(pack))
+        if self._owned(reminder.guild_id):
+            self._add(reminder)
+        pack.reminder = reminder
+        self.store.save_reminders([reminder])
+        return reminder
 
-    return reminder
+
+    def cancel(self, user_id: int, pack: CardPack) -> None:
+        """
+        cancels a pack's reminder
+        """
+
+        reminder = self._reminders.pop((user_id, pack.name), None)
+        if reminder is not None:
+            reminder.cancel()
+
+        # the reminder may be fired by another process, which drops it on its next sync
+        self.store.delete_reminder(user_id, pack.name)
+        pack.reminder = None
+
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+
+    def start(self) -> None:
+        """
+        loads the persisted reminders and starts the scheduler and send workers
+        """
+
+        for user_id, pack_name, due, interval, remaining, guild_id in self.store.load_reminders():
+            if self._owned(guild_id):
+                self._add(Reminder(user_id, pack_name, interval, due, remaining, guild_id))
+
+        self._queue = asyncio.Queue(maxsize=self.concurrency * 4)
+        self._tasks.append(asyncio.ensure_future(self._run()))
+        if self.owns is not None:
+            self._tasks.append(asyncio.ensure_future(self._sync_loop()))
+        for _ in range(self.concurrency):
+            self._tasks.append(asyncio.ensure_future(self._worker()))
+
+
+    def stop(self) -> None:
+        """
+        stops the scheduler and send workers
+        """
+
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+
+
+    def _owned(self, guild_id: Optional[int]) -> bool:
+        return self.owns is None or self.owns(guild_id)
+
+
+    def sync(self) -> None:
+        """
+        updates the owned reminders from the store, picking up reminders that
+        other processes have scheduled, changed, or cancelled
+        """
+
+        stored = set()
+        for user_id, pack_name, due, interval, remaining, guild_id in self.store.load_reminders():
+            if not self._owned(guild_id):
+                continue
+            key = (user_id, pack_name)
+            stored.add(key)
+            reminder = self._reminders.get(key)
+            if reminder is None or (reminder.due, reminder.interval, reminder.remaining) != (due, interval, remaining):
+                self._add(Reminder(user_id, pack_name, interval, due, remaining, guild_id))
+
+        for key in self._reminders.keys() - stored:
+            self._reminders.pop(key).cancel()
+
+
+    def _add(self, reminder: Reminder) -> None:
+        """
+        adds a reminder to the heap, replacing any existing reminder for the same pack
+        """
+
+        old = self._reminders.get((reminder.user_id, reminder.pack_name))
+        if old is not None:
+            old.cancel()
+        self._reminders[(reminder.user_id, reminder.pack_name)] = reminder
+        heapq.heappush(self._heap, (reminder.due, next(self._sequence), reminder))
+
+
+    def pop_due(self, now: float) -> List[Reminder]:
+        """
+        pops every reminder that is due at time now
+        """
+
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            when, _, reminder = heapq.heappop(self._heap)
+            if reminder.cancelled or reminder.due != when:
+                continue
+            due.append(reminder)
+        return due
+
+
+    async def fire(self, reminders: List[Reminder], now: float) -> List[CardPack]:
+        """
+        advances the packs of due reminders and reschedules them,
+        returns the packs that need a reminder sent
+        """
+
+        packs = []
+        for reminder in reminders:
+            metrics.observe('packle_reminder_lag_seconds', now - reminder.due)
+
+            # a reminder that fails is still rescheduled so it's tried again next
+            # time, without holding up any of the other reminders
+            try:
+                pack = self._load(reminder)
+
+                # the pack was deleted since the reminder was scheduled
+                if pack is None:
+                    continue
+
+                # the reminder isn't fired until it can be sent, so the pack's round isn't skipped
+                if not await self._resolved(pack):
+                    print(
+                        f'`Warning: no channel to remind user {reminder.user_id} about pack {reminder.pack_name!r} '
+                        f'in, retrying in {self.retry_delay:.0f}s`',
+                        file=sys.stderr,
+                    )
+                    metrics.count('packle_reminder_retries_total')
+                    self._retry(reminder, now)
+                    continue
+
+                await self._advance(reminder, pack)
+            except Exception:
+                print(
+                    f'`Error: failed to fire reminder for pack {reminder.pack_name!r} of user {reminder.user_id}`',
+                    file=sys.stderr,
+                )
+                traceback.print_exc()
+                metrics.count('packle_reminder_errors_total')
+                self._reschedule(reminder, now)
+                continue
+            packs.append(pack)
+
+            if reminder.remaining is not None:
+                reminder.remaining -= 1
+            if reminder.remaining is not None and reminder.remaining <= 0:
+                reminder.cancel()
+                self._reminders.pop((reminder.user_id, reminder.pack_name), None)
+                self.store.delete_reminder(reminder.user_id, reminder.pack_name)
+                pack.reminder = None
+                continue
+            self._reschedule(reminder, now)
+
+        # persist all of the new due times in one batch, if that fails they're
+        # still scheduled here and are persisted the next time they fire, reminders
+        # cancelled by another process since the last sync aren't stored again
+        try:
+            self.store.update_reminders([reminder for reminder in reminders if not reminder.cancelled])
+        except Exception:
+            print('`Error: failed to save reminder schedules`', file=sys.stderr)
+            traceback.print_exc()
+        return packs
+
+
+    def _load(self, reminder: Reminder) -> Optional[CardPack]:
+        """
+        loads the pack of a due reminder, returns None (and drops the reminder) if the pack was deleted
+        """
+
+        pack = self.store.get(reminder.user_id, reminder.pack_name)
+        if pack is None:
+            reminder.cancel()
+            self._reminders.pop((reminder.user_id, reminder.pack_name), None)
+            self.store.delete_reminder(reminder.user_id, reminder.pack_name)
+        return pack
+
+
+    async def _resolved(self, pack: CardPack) -> bool:
+        """
+        returns whether a pack's reminder can be sent, resolving its remind channel if required
+        """
+
+        if self.resolve is None:
+            return pack.remind_channel is not None
+        return await self.resolve(pack)
+
+
+    async def _advance(self, reminder: Reminder, pack: CardPack) -> None:
+        """
+        advances the pack of a due reminder
+        """
+
+        await advance_round(pack, self.workers)
+        pack.reminder = reminder
+        self.store.save(reminder.user_id, pack)
+
+        # reminders stored without their guild are handed over to its owner on the next sync
+        reminder.guild_id = remind_guild_id(pack)
+
+
+    def _retry(self, reminder: Reminder, now: float) -> None:
+        """
+        tries a reminder that couldn't be sent again after retry_delay, without
+        counting it as fired, its next interval starts once it's sent
+        """
+
+        reminder.due = now + self.retry_delay
+        heapq.heappush(self._heap, (reminder.due, next(self._sequence), reminder))
+
+
+    def _reschedule(self, reminder: Reminder, now: float) -> None:
+        """
+        schedules the next time a reminder fires, keeping to the original
+        cadence but skipping any reminders missed while the bot was down
+        """
+
+        reminder.due += reminder.interval
+        if reminder.due <= now:
+            reminder.due += (now - reminder.due) // reminder.interval * reminder.interval + reminder.interval
+        heapq.heappush(self._heap, (reminder.due, next(self._sequence), reminder))
+
+
+    async def _run(self) -> None:
+        """
+        wakes up once per tick and fires every due reminder
+        """
+
+        while True:
+            try:
+                await self.run_once(self.clock(), self._queue.put)
+            except Exception:
+                print('`Error: failed to fire reminders`', file=sys.stderr)
+                traceback.print_exc()
+            await asyncio.sleep(self.tick)
+
+
+    async def run_once(self, now: float, put: Callable[[List[CardPack]], Awaitable[None]]) -> None:
+        """
+        fires every reminder due at time now, handing each send (the packs
+        of a single reminder or digest) to put
+        """
+
+        due = self.pop_due(now)
+
+        # fire in batches so a burst of reminders doesn't block the event loop
+        for i in range(0, len(due), self.batch_size):
+            for pack in await self.fire(due[i:i + self.batch_size], now):
+                if self.digests is None:
+
+                    # waits here if the workers are behind
+                    await put([pack])
+                else:
+                    self.digests.add(pack, now)
+            await asyncio.sleep(0)
+
+        if self.digests is not None:
+            for packs in self.digests.pop_ready(now):
+                await put(packs)
+
+
+    async def _sync_loop(self) -> None:
+        """
+        syncs the owned reminders with the store every sync_interval
+        """
+
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                self.sync()
+            except Exception:
+                print('`Error: failed to sync reminders`', file=sys.stderr)
+                traceback.print_exc()
+
+
+    async def _worker(self) -> None:
+        """
+        sends reminders from the queue
+        """
+
+        while True:
+            packs = await self._queue.get()
+            try:
+                await self.deliver(packs)
+            except Exception:
+                names = ', '.join(repr(pack.name) for pack in packs)
+                print(f'`Error: failed to send reminder for pack(s) {names}`', file=sys.stderr)
+                traceback.print_exc()
+            finally:
+                self._queue.task_done()
+
+
+    async def deliver(self, packs: List[CardPack]) -> None:
+        """
+        sends a reminder for a single pack, or a digest for several packs with the same channel
+        """
+
+        if len(packs) == 1:
+            await self.send(packs[0])
+        else:
+            metrics.count('packle_reminder_digests_total')
+            await self.send_digest(packs)
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules - typing
+from __future__ import annotations  # fixes some typehinting issues
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# standard library modules
+import asyncio
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+
+
+# (time, user_id, owner_id, pack_name, position, result, latency, round_index)
+ReviewEvent = Tuple[float, int, int, str, int, int, float, int]
+
+
+class ReviewLog:
+    """
+    append-only log of every card review
+
+    recording only appends a tuple to an in-memory buffer, the buffer is
+    written to its own SQLite connection in batches by a background task that
+    runs the inserts in a worker thread, so recording never waits on the disk
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS reviews (
+            time REAL NOT NULL,
+            user_id INTEGER NOT NULL,
+            owner_id INTEGER NOT NULL,
+            pack_name TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            result INTEGER NOT NULL,
+            latency REAL,
+            round_index INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS reviews_owner_id_pack_name ON reviews (owner_id, pack_name, time);
+    """
+
+    def __init__(
+            self,
+            path: str,
+            flush_interval: float = 5.0,
+            batch_size: int = 4096,
+            max_buffer: int = 1000000,
+            clock: Callable[[], float] = time.time,
+    ):
+        """initializer"""
+
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_buffer = max_buffer
+        self.clock = clock
+
+        # only ever used by one thread at a time, serialized by the lock
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(self.SCHEMA)
+        self._db.commit()
+        self._lock = threading.Lock()
+
+        self._buffer: List[ReviewEvent] = []
+        self._task: Optional[asyncio.Task] = None
+
+        # metrics
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        returns the buffer size and event counters
+        """
+
+        return {
+            'buffered': len(self._buffer),
+            'recorded': self.recorded,
+            'written': self.written,
+            'dropped': self.dropped,
+        }
+
+
+    def record(
+            self,
+            user_id: int,
+            owner_id: int,
+            pack_name: str,
+            position: int,
+            result: int,
+            latency: Optional[float] = None,
+            round_index: int = 0,
+    ) -> None:
+        """
+        buffers a review of the card at position in a pack, result is a FlashCard.Result value
+        """
+
+        # events are dropped rather than growing without bound if writes can't keep up
+        if len(self._buffer) >= self.max_buffer:
+            self.dropped += 1
+            return
+        self._buffer.append((self.clock(), user_id, owner_id, pack_name, position, result, latency, round_index))
+        self.recorded += 1
+
+
+    def start(self) -> None:
+        """
+        starts writing buffered events periodically
+        """
+
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+
+    def stop(self) -> None:
+        """
+        stops the periodic writes, then writes whatever is left
+        """
+
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.flush()
+
+
+    def close(self) -> None:
+        """
+        writes any buffered events and closes the database
+        """
+
+        self.stop()
+        with self._lock:
+            self._db.close()
+
+
+    def flush(self) -> None:
+        """
+        writes every buffered event
+        """
+
+        # swap the buffer out so recording can carry on while this writes
+        events, self._buffer = self._buffer, []
+        if not events:
+            return
+        try:
+            with self._lock, self._db:
+                for start in range(0, len(events), self.batch_size):
+                    self._db.executemany(
+                        'INSERT INTO reviews '
+                        '(time, user_id, owner_id, pack_name, position, result, latency, round_index) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                        events[start:start + self.batch_size],
+                    )
+        except sqlite3.Error:
+
+            # put the events back so the next flush retries them
+            self._buffer[:0] = events
+            raise
+        self.written += len(events)
+
+
+    def events(self, owner_id: int, pack_name: str, since: float = 0.0) -> Iterable[ReviewEvent]:
+        """
+        returns the written reviews of a pack, oldest first
+        """
+
+        with self._lock:
+            return self._db.execute(
+                'SELECT time, user_id, owner_id, pack_name, position, result, latency, round_index '
+                'FROM reviews WHERE owner_id = ? AND pack_name = ? AND time >= ? ORDER BY time',
+                (owner_id, pack_name, since),
+            ).fetchall()
+
+
+    async def _run(self) -> None:
+        """
+        writes the buffered events every flush_interval in a worker thread
+        """
+
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await loop.run_in_executor(None, self.flush)
+            except Exception:
+                print('`Error: failed to write review events`', file=sys.stderr)
+                traceback.print_exc()
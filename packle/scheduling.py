@@ -0,0 +1,399 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules - typing
+from __future__ import annotations  # fixes some typehinting issues
+from typing import TYPE_CHECKING  # fixes some typehinting issues
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+# standard library modules
+from array import array
+import heapq
+import itertools
+import math
+
+if TYPE_CHECKING:
+    from cardpack import CardPack
+
+
+# seconds in a day, the unit intervals are calculated in
+DAY = 86400.0
+
+# per card scheduler state, (due, stability, difficulty, reps), all None for schedulers without any
+CardState = Tuple[Optional[float], Optional[float], Optional[float], Optional[int]]
+
+
+class Scheduler:
+    """
+    base class for deciding which of a CardPack's cards are studied each round
+
+    every CardPack has its own scheduler instance, the pack calls the hooks
+    below whenever its cards change so schedulers can keep per card state
+    """
+
+    # name the scheduler is stored under
+    name = ''
+
+    def levels(self, pack: CardPack) -> Optional[Tuple[int, ...]]:
+        """
+        returns the proficiency levels studied in the pack's current round,
+        or None if rounds aren't made up of proficiency levels
+        """
+
+        return None
+
+
+    def select(self, pack: CardPack, now: float) -> List[int]:
+        """
+        returns the indexes of the cards to study in a new round
+        """
+
+        raise NotImplementedError
+
+
+    def extended(self, pack: CardPack, start: int, now: float) -> None:
+        """
+        called after cards start onwards were added to the pack
+        """
+
+
+    def popped(self, pack: CardPack, i: int) -> None:
+        """
+        called after card i was removed from the pack
+        """
+
+
+    def proficiency_changed(self, pack: CardPack, i: int, old: int, new: int) -> None:
+        """
+        called after the proficiency of card i was changed outside of a round transition
+        """
+
+
+    def review_batch(self, pack: CardPack, indexes: Sequence[int], correct: Iterable[bool], now: float) -> None:
+        """
+        called with every card answered in a round when the pack moves on to the next one
+        """
+
+
+    def reset(self, pack: CardPack, now: float) -> None:
+        """
+        called after the pack's proficiencies were reset
+        """
+
+
+    def state(self, i: int) -> CardState:
+        """
+        returns card i's state for storage
+        """
+
+        return None, None, None, None
+
+
+class RoundScheduler(Scheduler):
+    """
+    the fixed round table, each round studies every card in some proficiency
+    levels (CardPack.Round.ROUNDS) regardless of when they were last studied
+    """
+
+    name = 'rounds'
+
+    def levels(self, pack: CardPack) -> Tuple[int, ...]:
+        return pack.Round.ROUNDS[pack.round_index]
+
+
+    def select(self, pack: CardPack, now: float) -> List[int]:
+        buckets = pack._buckets
+        return list(itertools.chain.from_iterable(buckets.get(level, ()) for level in self.levels(pack)))
+
+
+    def extended(self, pack: CardPack, start: int, now: float) -> None:
+
+        # add the new cards in the current round to it
+        cur_round = self.levels(pack)
+        new = range(start, len(pack))
+        pack.round._insert_many(itertools.compress(new, map(cur_round.__contains__, pack._proficiency[start:])))
+
+
+    def proficiency_changed(self, pack: CardPack, i: int, old: int, new: int) -> None:
+        cur_round = self.levels(pack)
+        if old in cur_round and new not in cur_round:
+            pack.round._discard(i)
+        elif new in cur_round and old not in cur_round:
+            pack.round._insert(i)
+
+
+class DueScheduler(Scheduler):
+    """
+    base class for schedulers that give every card its own due time
+
+    due times are kept in a heap of (due, index), so a round only pulls the
+    cards that are actually due, outdated entries are skipped when popped
+    """
+
+    def __init__(self, state: Iterable[CardState] = (), max_cards: Optional[int] = None):
+        """initializer"""
+
+        # most cards pulled into a single round, None for every due card
+        self.max_cards = max_cards
+
+        # per card columns, a stability of 0 means the card hasn't been reviewed yet
+        self._due = array('d')
+        self._stability = array('d')
+        self._difficulty = array('d')
+        self._reps = array('i')
+        for due, stability, difficulty, reps in state:
+            self._due.append(due or 0.0)
+            self._stability.append(stability or 0.0)
+            self._difficulty.append(difficulty or 0.0)
+            self._reps.append(reps or 0)
+
+        # filled in once the scheduler is attached to its pack
+        self._heap: List[Tuple[float, int]] = []
+
+
+    def step(self, stability: float, difficulty: float, reps: int, elapsed: float, correct: bool):
+        """
+        returns a card's (stability, difficulty, reps) after a review,
+        elapsed is the amount of days since the card was last reviewed
+        """
+
+        raise NotImplementedError
+
+
+    def interval(self, stability: float) -> float:
+        """
+        returns the amount of days until a card with a stability is due again
+        """
+
+        raise NotImplementedError
+
+
+    def _rebuild(self) -> None:
+        self._heap = list(zip(self._due, range(len(self._due))))
+        heapq.heapify(self._heap)
+
+
+    def _push(self, i: int) -> None:
+        heapq.heappush(self._heap, (self._due[i], i))
+
+        # drop the outdated entries once they outnumber the cards
+        if len(self._heap) > 2 * len(self._due) + 64:
+            self._rebuild()
+
+
+    def select(self, pack: CardPack, now: float) -> List[int]:
+        due = []
+        heap = self._heap
+        while heap and heap[0][0] <= now and (self.max_cards is None or len(due) < self.max_cards):
+            when, i = heapq.heappop(heap)
+            if i < len(self._due) and self._due[i] == when:
+                due.append(i)
+
+        # cards stay in the heap until they're reviewed and get a new due time
+        for i in due:
+            heapq.heappush(heap, (self._due[i], i))
+        return due
+
+
+    def extended(self, pack: CardPack, start: int, now: float) -> None:
+
+        # new cards without any stored state are due straight away
+        missing = len(pack) - len(self._due)
+        if missing > 0:
+            self._due.extend(array('d', [now]) * missing)
+            self._stability.extend(array('d', [0.0]) * missing)
+            self._difficulty.extend(array('d', [0.0]) * missing)
+            self._reps.extend(array('i', [0]) * missing)
+
+        for i in range(start, len(pack)):
+            self._push(i)
+            if self._due[i] <= now:
+                pack.round._insert(i)
+
+
+    def popped(self, pack: CardPack, i: int) -> None:
+        for column in (self._due, self._stability, self._difficulty, self._reps):
+            column.pop(i)
+        self._rebuild()
+
+
+    def review(self, pack: CardPack, i: int, correct: bool, now: float) -> None:
+        """
+        reschedules a single card
+        """
+
+        self.review_batch(pack, (i,), (correct,), now)
+
+
+    def review_batch(self, pack: CardPack, indexes: Sequence[int], correct: Iterable[bool], now: float) -> None:
+
+        # gather the columns of the answered cards, and step each of them
+        now = float(now)
+        stability = [self._stability[i] for i in indexes]
+        elapsed = [(now - self._due[i]) / DAY + self.interval(s) for i, s in zip(indexes, stability)]
+        difficulty = [self._difficulty[i] for i in indexes]
+        reps = [self._reps[i] for i in indexes]
+        steps = map(self.step, stability, difficulty, reps, elapsed, correct)
+
+        # scatter the results back into the columns
+        for i, (s, d, n) in zip(indexes, steps):
+            self._stability[i] = s
+            self._difficulty[i] = d
+            self._reps[i] = n
+            self._due[i] = now + self.interval(s) * DAY
+            self._push(i)
+
+
+    def reset(self, pack: CardPack, now: float) -> None:
+        size = len(pack)
+        self._due = array('d', [now]) * size
+        self._stability = array('d', [0.0]) * size
+        self._difficulty = array('d', [0.0]) * size
+        self._reps = array('i', [0]) * size
+        self._rebuild()
+
+
+    def state(self, i: int) -> CardState:
+        return self._due[i], self._stability[i], self._difficulty[i], self._reps[i]
+
+
+    def columns(self) -> Tuple[array, array, array, array]:
+        """
+        returns the due, stability, difficulty, and reps columns of every card, e.g. for bulk storage
+        """
+
+        return self._due, self._stability, self._difficulty, self._reps
+
+
+class SM2Scheduler(DueScheduler):
+    """
+    SuperMemo 2, stability is the card's interval in days and difficulty its ease factor
+    """
+
+    name = 'sm2'
+
+    INITIAL_EASE = 2.5
+    MIN_EASE = 1.3
+
+    # SM-2 answer qualities (0 to 5) for correct and incorrect answers
+    QUALITY_CORRECT = 4
+    QUALITY_INCORRECT = 2
+
+    def step(self, stability: float, difficulty: float, reps: int, elapsed: float, correct: bool):
+        ease = difficulty or self.INITIAL_EASE
+        if correct:
+            quality = self.QUALITY_CORRECT
+            if reps == 0:
+                interval = 1.0
+            elif reps == 1:
+                interval = 6.0
+            else:
+                interval = stability * ease
+            reps += 1
+        else:
+            quality = self.QUALITY_INCORRECT
+            interval = 1.0
+            reps = 0
+
+        miss = 5 - quality
+        ease = max(self.MIN_EASE, ease + 0.1 - miss * (0.08 + miss * 0.02))
+        return interval, ease, reps
+
+
+    def interval(self, stability: float) -> float:
+        return stability
+
+
+class FSRSScheduler(DueScheduler):
+    """
+    Free Spaced Repetition Scheduler (FSRS-4.5) with its default weights,
+    answers are graded as "again" when incorrect and "good" when correct
+    """
+
+    name = 'fsrs'
+
+    WEIGHTS = (
+        0.4872, 1.4003, 3.7145, 13.8206, 5.1618, 1.2298, 0.8975, 0.031, 1.6474,
+        0.1367, 1.0461, 2.1072, 0.0793, 0.3246, 1.587, 0.2272, 2.8755,
+    )
+
+    # forgetting curve constants
+    DECAY = -0.5
+    FACTOR = 19 / 81
+
+    # grades
+    AGAIN = 1
+    GOOD = 3
+
+    def __init__(
+            self,
+            state: Iterable[CardState] = (),
+            max_cards: Optional[int] = None,
+            retention: float = 0.9,
+            weights: Sequence[float] = WEIGHTS,
+    ):
+        """initializer"""
+
+        super().__init__(state, max_cards)
+
+        # probability of recalling a card when it's due
+        self.retention = retention
+        self.weights = tuple(weights)
+        self._interval_factor = (retention ** (1 / self.DECAY) - 1) / self.FACTOR
+
+
+    @staticmethod
+    def _clamp_difficulty(difficulty: float) -> float:
+        return min(10.0, max(1.0, difficulty))
+
+
+    def step(self, stability: float, difficulty: float, reps: int, elapsed: float, correct: bool):
+        w = self.weights
+        grade = self.GOOD if correct else self.AGAIN
+
+        # first review
+        if reps == 0:
+            return w[grade - 1], self._clamp_difficulty(w[4] - (grade - 3) * w[5]), 1
+
+        retrievability = (1 + self.FACTOR * max(0.0, elapsed) / stability) ** self.DECAY
+
+        # difficulty moves with the grade and reverts towards the initial "good" difficulty
+        difficulty = self._clamp_difficulty(w[7] * w[4] + (1 - w[7]) * (difficulty - w[6] * (grade - 3)))
+
+        if correct:
+            stability *= 1 + (
+                math.exp(w[8])
+                * (11 - difficulty)
+                * stability ** -w[9]
+                * (math.exp(w[10] * (1 - retrievability)) - 1)
+            )
+        else:
+            stability = min(stability, (
+                w[11]
+                * difficulty ** -w[12]
+                * ((stability + 1) ** w[13] - 1)
+                * math.exp(w[14] * (1 - retrievability))
+            ))
+        return stability, difficulty, reps + 1
+
+
+    def interval(self, stability: float) -> float:
+        return stability * self._interval_factor
+
+
+# schedulers by the name they're stored under
+SCHEDULERS: Dict[str, Type[Scheduler]] = {
+    scheduler.name: scheduler
+    for scheduler in (RoundScheduler, SM2Scheduler, FSRSScheduler)
+}
+
+
+def make_scheduler(name: str, state: Iterable[CardState] = ()) -> Scheduler:
+    """
+    creates a scheduler from its stored name and card states
+    """
+
+    scheduler = SCHEDULERS.get(name, RoundScheduler)
+    if issubclass(scheduler, DueScheduler):
+        return scheduler(state)
+    return scheduler()
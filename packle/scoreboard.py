@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules - typing
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+# standard library modules
+import bisect
+import heapq
+
+# local modules
+from constants import Colors, Emojis
+
+
+# most players on a page of the scoreboard, and the most characters in any of its columns,
+# discord allows at most 1024 characters in an embed field
+PAGE_SIZE = 15
+FIELD_CHARACTERS = 1024
+
+# longest display name shown, as discord allows for nicknames
+MAX_NAME_LENGTH = 32
+
+
+class Scoreboard:
+    """
+    class for keeping score of a quiz's players by player id
+
+    players are ranked densely (tied players share a rank, and the next score
+    down gets the next rank) and the ranking is kept up to date as scores
+    change, so the leaders can be read at any time without sorting every player
+    """
+
+    __slots__ = ('_scores', '_players', '_levels')
+
+    def __init__(self):
+        """initializer"""
+
+        # score by player id, player ids by score, and the distinct scores in ascending order
+        self._scores: Dict[int, int] = {}
+        self._players: Dict[int, Set[int]] = {}
+        self._levels: List[int] = []
+
+
+    def __len__(self):
+        """
+        amount of players
+        """
+
+        return len(self._scores)
+
+
+    def __contains__(self, player_id: int) -> bool:
+        return player_id in self._scores
+
+
+    def __getitem__(self, player_id: int) -> int:
+        return self._scores[player_id]
+
+
+    def get(self, player_id: int, default: Optional[int] = None) -> Optional[int]:
+        return self._scores.get(player_id, default)
+
+
+    def items(self) -> Iterator[Tuple[int, int]]:
+        """
+        iterates over (player id, score) in no particular order
+        """
+
+        return iter(self._scores.items())
+
+
+    def add(self, player_id: int, points: int = 1) -> int:
+        """
+        adds points to a player's score, adding the player if required, returns the new score
+        """
+
+        old = self._scores.get(player_id)
+        new = points if old is None else old + points
+        if old == new:
+            return new
+        if old is not None:
+            self._remove(player_id, old)
+        self._scores[player_id] = new
+        players = self._players.get(new)
+        if players is None:
+            players = self._players[new] = set()
+            bisect.insort(self._levels, new)
+        players.add(player_id)
+        return new
+
+
+    def _remove(self, player_id: int, score: int):
+        players = self._players[score]
+        players.discard(player_id)
+        if not players:
+            del self._players[score]
+            del self._levels[bisect.bisect_left(self._levels, score)]
+
+
+    def rank(self, player_id: int) -> int:
+        """
+        returns a player's dense rank, starting from 1
+        """
+
+        return len(self._levels) - bisect.bisect_left(self._levels, self._scores[player_id])
+
+
+    def ranking(self, key: Callable[[int], Any] = None) -> Iterator[Tuple[int, int, int]]:
+        """
+        lazily iterates over (rank, player id, score) from the highest score down,
+        tied players are ordered by key (by default their ids)
+        """
+
+        for rank, score in enumerate(reversed(self._levels), 1):
+            for player_id in sorted(self._players[score], key=key):
+                yield rank, player_id, score
+
+
+    def top(self, n: int, key: Callable[[int], Any] = None) -> List[Tuple[int, int, int]]:
+        """
+        returns the (rank, player id, score) of the first n players, see ranking
+        """
+
+        # only the players that make it in are sorted, so a big tie at the top stays cheap
+        top = []
+        for rank, score in enumerate(reversed(self._levels), 1):
+            if len(top) >= n:
+                break
+            players = heapq.nsmallest(n - len(top), self._players[score], key=key)
+            top.extend((rank, player_id, score) for player_id in players)
+        return top
+
+
+def _name(names: Dict[int, str], player_id: int) -> str:
+    return names.get(player_id, str(player_id))[:MAX_NAME_LENGTH]
+
+
+def leaderboard(scoreboard: Scoreboard, names: Dict[int, str], n: int = 3) -> str:
+    """
+    returns the first n players of a scoreboard that have scored as lines of text,
+    e.g. for showing during a quiz, or an empty string if nobody has scored yet
+    """
+
+    return '\n'.join(
+        f'{Emojis.medals.get(rank, rank)} {_name(names, player_id)} ({score})'
+        for rank, player_id, score in scoreboard.top(n, key=lambda player_id: _name(names, player_id))
+        if score > 0
+    )
+
+
+def _page_columns(rows: List[Tuple[str, str, str]]) -> List[Tuple[str, str, str]]:
+    """
+    joins rows into the columns of a page, splitting them over several pages if a column is too long
+    """
+
+    columns = tuple('\n'.join(column) for column in zip(*rows))
+    if len(rows) > 1 and max(map(len, columns)) > FIELD_CHARACTERS:
+        middle = len(rows) // 2
+        return _page_columns(rows[:middle]) + _page_columns(rows[middle:])
+    return [columns]
+
+
+def scoreboard_columns(scoreboard: Scoreboard, names: Dict[int, str]) -> List[Tuple[str, str, str]]:
+    """
+    returns the rank, name, and score columns of every page of a scoreboard,
+    each page has at most PAGE_SIZE players and FIELD_CHARACTERS in a column
+    """
+
+    rows = [
+        (
+            f'{Emojis.medals.get(rank, Emojis.blank)} {rank}{Emojis.blank}',
+            f'{_name(names, player_id)}{Emojis.blank}',
+            f'{Emojis.blank}{score}',
+        )
+        for rank, player_id, score in scoreboard.ranking(key=lambda player_id: _name(names, player_id))
+    ]
+    if not rows:
+        return [('', '', '')]
+
+    # names are cut short enough that a full page only goes over the limit with enormous ranks or scores
+    pages = []
+    for start in range(0, len(rows), PAGE_SIZE):
+        pages.extend(_page_columns(rows[start:start + PAGE_SIZE]))
+    return pages
+
+
+def scoreboard_embeds(
+        scoreboard: Scoreboard,
+        names: Dict[int, str],
+        pack_name: str,
+        footer: str,
+) -> List[Dict[str, Any]]:
+    """
+    returns the embed dicts of every page of a quiz's final scoreboard
+    """
+
+    pages = scoreboard_columns(scoreboard, names)
+    embeds = []
+    for i, (ranks, players, scores) in enumerate(pages, 1):
+        embeds.append({
+            'type': 'rich',
+            'title': 'SCOREBOARD',
+            'description': f'{len(scoreboard)} players',
+            'color': Colors.embed,
+            'fields': [
+                {'name': '__Rank__', 'value': ranks or Emojis.blank, 'inline': True},
+                {'name': '__Name__', 'value': players or Emojis.blank, 'inline': True},
+                {'name': '__Score__', 'value': scores or Emojis.blank, 'inline': True},
+            ],
+            'author': {'name': pack_name},
+            'footer': {'text': footer if len(pages) == 1 else f'{footer} | page {i} of {len(pages)}'},
+        })
+    return embeds
@@ -0,0 +1,408 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules - typing
+from __future__ import annotations  # fixes some typehinting issues
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+# standard library modules
+import asyncio
+import collections
+import heapq
+import itertools
+import sys
+import time
+import traceback
+
+# third-party packages - discord related
+import discord
+from discord.ext import commands
+
+# local modules
+from cardpack import PackSnapshot
+from scoreboard import Scoreboard
+
+
+class QuizSession:
+    """
+    class for storing the state of a single multiplayer quiz
+    """
+
+    __slots__ = (
+        'ctx', 'author_id', 'guild_id', 'channel_id', 'message', 'pack', 'interval',
+        'index', 'next_tick', 'shown_at', 'players', 'names', 'votes', 'voted_at', 'reactions', 'added',
+        'persistent', 'gap', 'exit', 'done',
+    )
+
+    def __init__(
+            self,
+            ctx: commands.Context,
+            message: discord.Message,
+            pack: PackSnapshot,
+            interval: float,
+            persistent: bool = True,
+    ):
+        """initializer"""
+
+        self.ctx = ctx
+        self.author_id: int = ctx.author.id
+        self.guild_id: Optional[int] = ctx.guild.id if ctx.guild else None
+        self.channel_id: int = ctx.channel.id
+        self.message = message
+        self.pack = pack
+        self.interval = interval
+
+        # index of the card being shown and when the quiz should move on from it
+        self.index = 0
+        self.next_tick = 0.0
+
+        # when the current card was shown, for measuring how long answers took
+        self.shown_at = time.monotonic()
+
+        # scores and display names by user id, and the votes for the current card
+        self.players = Scoreboard()
+        self.players.add(ctx.author.id, 0)
+        self.names: Dict[int, str] = {ctx.author.id: ctx.author.display_name}
+        self.votes: Dict[int, str] = {}
+        self.voted_at: Dict[int, float] = {}
+
+        # ids of the users holding each answer reaction on the message as last seen,
+        # and the (user id, emoji) reactions added while the current card was shown
+        self.reactions: Dict[str, Set[int]] = collections.defaultdict(set)
+        self.added: Set[Tuple[int, str]] = set()
+
+        # whether reactions stay on the message for the whole quiz, whether
+        # reactions may have been missed, and whether the quiz should/has ended
+        self.persistent = persistent
+        self.gap = False
+        self.exit = False
+        self.done = False
+
+
+    def new_card(self) -> None:
+        """
+        starts a new vote epoch for the next card, in classic mode the
+        message's reactions are also cleared so nobody holds one anymore
+        """
+
+        self.votes.clear()
+        self.voted_at.clear()
+        self.added.clear()
+        if not self.persistent:
+            self.reactions.clear()
+
+
+    def react(self, user_id: int, emoji: str, now: Optional[float] = None) -> None:
+        """
+        records an answer reaction being added, which is the user's vote for the current card
+        """
+
+        self.reactions[emoji].add(user_id)
+        self.added.add((user_id, emoji))
+        self._vote(user_id, emoji, now)
+
+
+    def unreact(self, user_id: int, emoji: str, now: Optional[float] = None) -> None:
+        """
+        records an answer reaction being removed, which withdraws the user's vote
+        if it's the reaction they added for the current card
+
+        in persistent mode reactions are left on the message from earlier cards,
+        un-clicking one of those is a vote instead, so every vote takes one click
+        """
+
+        self.reactions[emoji].discard(user_id)
+        if (user_id, emoji) in self.added:
+            self.added.discard((user_id, emoji))
+            if self.votes.get(user_id) == emoji:
+                del self.votes[user_id]
+                self.voted_at.pop(user_id, None)
+        elif self.persistent:
+            self._vote(user_id, emoji, now)
+
+
+    def _vote(self, user_id: int, emoji: str, now: Optional[float]) -> None:
+        self.votes[user_id] = emoji
+        if now is None:
+            self.voted_at.pop(user_id, None)
+        else:
+            self.voted_at[user_id] = now
+
+
+    def reconcile(self, emoji: str, user_ids: Set[int]) -> None:
+        """
+        brings the votes up to date with the users found holding a reaction on the
+        message, as if the reactions added and removed since it was last seen had
+        been received, votes found this way don't have a time
+        """
+
+        held = self.reactions[emoji]
+        for user_id in user_ids - held:
+            self.react(user_id, emoji)
+        for user_id in held - user_ids:
+            self.unreact(user_id, emoji)
+
+
+class SessionManager:
+    """
+    class for admitting, indexing, and driving every running quiz session
+
+    instead of each quiz sleeping inside its own command handler, a single
+    driver task wakes up every tick and advances all of the sessions that are
+    due, with at most max_in_flight advances running at once, sessions that
+    can't be advanced yet are pushed back to the next tick
+
+    starting a quiz takes several requests before its session exists, so the
+    author's, channel's and guild's slots are reserved as soon as it's admitted
+    """
+
+    def __init__(
+            self,
+            advance: Callable[[QuizSession], Awaitable[bool]],
+            tick: float = 0.5,
+            max_sessions: int = 5000,
+            max_per_guild: int = 10,
+            max_per_channel: int = 1,
+            max_in_flight: int = 64,
+            clock: Callable[[], float] = time.monotonic,
+    ):
+        """initializer"""
+
+        # coroutine that moves a session on a card, returning False once the session is over
+        self.advance = advance
+        self.tick = tick
+        self.clock = clock
+
+        # admission limits
+        self.max_sessions = max_sessions
+        self.max_per_guild = max_per_guild
+        self.max_per_channel = max_per_channel
+        self.max_in_flight = max_in_flight
+
+        # indexes
+        self._by_author: Dict[int, QuizSession] = {}
+        self._by_message: Dict[int, QuizSession] = {}
+        self._by_channel: Dict[int, Set[QuizSession]] = {}
+        self._by_guild: Dict[Optional[int], Set[QuizSession]] = {}
+
+        # (guild id, channel id) of the sessions admitted but not added yet by author,
+        # and the amount of them by channel and guild
+        self._reserved: Dict[int, Tuple[Optional[int], int]] = {}
+        self._reserved_channels: Dict[int, int] = collections.Counter()
+        self._reserved_guilds: Dict[Optional[int], int] = collections.Counter()
+
+        # heap of (next_tick, sequence, session), outdated entries are skipped when popped
+        self._heap: List[Tuple[float, int, QuizSession]] = []
+        self._sequence = itertools.count()
+        self._advancing: Set[QuizSession] = set()
+        self._task: Optional[asyncio.Task] = None
+
+        # tasks advancing sessions, referenced until they're done so they can't be garbage collected
+        self._advances: Set[asyncio.Task] = set()
+
+
+    def __len__(self):
+        return len(self._by_author) + len(self._reserved)
+
+
+    def __iter__(self) -> Iterator[QuizSession]:
+        return iter(list(self._by_author.values()))
+
+
+    @property
+    def in_flight(self) -> int:
+        """
+        amount of sessions currently being advanced
+        """
+
+        return len(self._advancing)
+
+
+    def by_author(self, user_id: int) -> Optional[QuizSession]:
+        return self._by_author.get(user_id)
+
+
+    def by_message(self, message_id: int) -> Optional[QuizSession]:
+        return self._by_message.get(message_id)
+
+
+    def by_channel(self, channel_id: int) -> Set[QuizSession]:
+        return self._by_channel.get(channel_id, set())
+
+
+    def by_guild(self, guild_id: Optional[int]) -> Set[QuizSession]:
+        return self._by_guild.get(guild_id, set())
+
+
+    def admission_error(self, author_id: int, guild_id: Optional[int], channel_id: int) -> Optional[str]:
+        """
+        returns why a new session can't be started, or None if it can
+        """
+
+        if author_id in self._by_author or author_id in self._reserved:
+            return "You're already running a Quiz session"
+        if len(self.by_channel(channel_id)) + self._reserved_channels[channel_id] >= self.max_per_channel:
+            return 'There is already a Quiz running in this channel'
+        if len(self.by_guild(guild_id)) + self._reserved_guilds[guild_id] >= self.max_per_guild:
+            return 'Too many Quiz sessions are running in this server, try again later'
+        if len(self) >= self.max_sessions or len(self._advancing) >= self.max_in_flight:
+            return 'Packle is busy right now, try again in a moment'
+        return None
+
+
+    def reserve(self, author_id: int, guild_id: Optional[int], channel_id: int) -> Optional[str]:
+        """
+        admits a new session, holding its slots until it's added or released,
+        returns why it can't be started instead if it can't
+        """
+
+        msg = self.admission_error(author_id, guild_id, channel_id)
+        if msg is None:
+            self._reserved[author_id] = (guild_id, channel_id)
+            self._reserved_channels[channel_id] += 1
+            self._reserved_guilds[guild_id] += 1
+        return msg
+
+
+    def release(self, author_id: int) -> None:
+        """
+        gives back the slots reserved for an author's session, if it wasn't added
+        """
+
+        reserved = self._reserved.pop(author_id, None)
+        if reserved is None:
+            return
+        guild_id, channel_id = reserved
+        for counter, key in ((self._reserved_channels, channel_id), (self._reserved_guilds, guild_id)):
+            counter[key] -= 1
+            if not counter[key]:
+                del counter[key]
+
+
+    def add(self, session: QuizSession) -> None:
+        """
+        indexes a session and schedules its first tick, taking over the slots reserved for it
+        """
+
+        self.release(session.author_id)
+        self._by_author[session.author_id] = session
+        self._by_message[session.message.id] = session
+        self._by_channel.setdefault(session.channel_id, set()).add(session)
+        self._by_guild.setdefault(session.guild_id, set()).add(session)
+        self.schedule(session, self.clock() + session.interval)
+
+        # started lazily since the driver needs a running event loop
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+
+    def remove(self, session: QuizSession) -> None:
+        """
+        removes a session from the indexes
+        """
+
+        session.done = True
+        if self._by_author.get(session.author_id) is session:
+            del self._by_author[session.author_id]
+        if self._by_message.get(session.message.id) is session:
+            del self._by_message[session.message.id]
+        for index, key in ((self._by_channel, session.channel_id), (self._by_guild, session.guild_id)):
+            sessions = index.get(key)
+            if sessions is not None:
+                sessions.discard(session)
+                if not sessions:
+                    del index[key]
+
+
+    def schedule(self, session: QuizSession, when: float) -> None:
+        """
+        sets when a session is next advanced
+        """
+
+        session.next_tick = when
+        heapq.heappush(self._heap, (when, next(self._sequence), session))
+
+
+    def wake(self, session: QuizSession) -> None:
+        """
+        advances a session on the next tick, e.g. when it's been told to exit
+        """
+
+        self.schedule(session, self.clock())
+
+
+    def stop(self) -> None:
+        """
+        stops the driver task and any advances still running
+        """
+
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for task in self._advances:
+            task.cancel()
+
+
+    def _pop_due(self, now: float) -> List[QuizSession]:
+        """
+        pops the sessions that are due, up to the amount that can be advanced right now
+        """
+
+        due = []
+        while self._heap and self._heap[0][0] <= now and len(self._advancing) + len(due) < self.max_in_flight:
+            when, _, session = heapq.heappop(self._heap)
+
+            # sessions being advanced are rescheduled once they're done
+            if session.done or session.next_tick != when or session in self._advancing:
+                continue
+            due.append(session)
+        return due
+
+
+    async def _run(self) -> None:
+        """
+        advances every due session once per tick
+        """
+
+        while True:
+            for session in self._pop_due(self.clock()):
+                self._advancing.add(session)
+                task = asyncio.ensure_future(self._advance(session))
+                self._advances.add(task)
+                task.add_done_callback(self._advanced)
+            await asyncio.sleep(self.tick)
+
+
+    def _advanced(self, task: asyncio.Task) -> None:
+        """
+        drops the reference to a finished advance, reporting it if it failed
+        outside of the session's own advance (e.g. while rescheduling it)
+        """
+
+        self._advances.discard(task)
+        if task.cancelled() or task.exception() is None:
+            return
+        error = task.exception()
+        print('`Error: advancing a quiz session failed`', file=sys.stderr)
+        traceback.print_exception(type(error), error, error.__traceback__)
+
+
+    async def _advance(self, session: QuizSession) -> None:
+        """
+        advances a single session, removing it once it's over
+        """
+
+        try:
+            running = await self.advance(session)
+        except Exception:
+            print(f'`Error: quiz session for user {session.author_id} failed`', file=sys.stderr)
+            traceback.print_exc()
+            running = False
+        finally:
+            self._advancing.discard(session)
+
+        # sessions told to exit while they were being advanced are advanced again straight away
+        if running:
+            self.schedule(session, self.clock() + (0.0 if session.exit else session.interval))
+        else:
+            self.remove(session)
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules - typing
+from __future__ import annotations  # fixes some typehinting issues
+from typing import Any, Dict, List, Mapping, Optional
+
+# standard library modules
+import os
+
+
+def parse_ids(text: str) -> List[int]:
+    """
+    parses shard ids like '0-3,8,10-11' into a sorted list
+    """
+
+    ids = set()
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-', 1)
+            ids.update(range(int(start), int(end) + 1))
+        else:
+            ids.add(int(part))
+    return sorted(ids)
+
+
+class ShardConfig:
+    """
+    class for the part of a sharded deployment this process runs
+
+    each process connects the gateway shards in shard_ids (of shard_count),
+    and fires the reminders whose channels are on those shards, the ones in
+    its cache, a guild's shard is (guild_id >> 22) % shard_count and direct
+    messages are received on shard 0, so every reminder has exactly one owner
+
+    processes sharing storage must each be given their shard ids, so together
+    they run every shard exactly once
+    """
+
+    __slots__ = ('shard_count', 'shard_ids', 'process_index', 'process_count')
+
+    def __init__(
+            self,
+            shard_count: Optional[int] = None,
+            shard_ids: Optional[List[int]] = None,
+            process_index: int = 0,
+            process_count: int = 1,
+    ):
+        """initializer"""
+
+        if not 0 <= process_index < process_count:
+            raise ValueError('process_index must be between 0 and process_count - 1')
+        if shard_ids is not None and shard_count is None:
+            raise ValueError('shard_count is required when shard_ids is set')
+        if process_count > 1 and shard_ids is None:
+            raise ValueError('shard_ids are required when there is more than one process')
+
+        self.shard_count = shard_count
+        self.shard_ids = shard_ids
+        self.process_index = process_index
+        self.process_count = process_count
+
+
+    @classmethod
+    def from_env(cls, environ: Mapping[str, str] = os.environ) -> ShardConfig:
+        """
+        reads PACKLE_SHARD_COUNT, PACKLE_SHARD_IDS, PACKLE_PROCESS_INDEX, and PACKLE_PROCESS_COUNT
+        """
+
+        shard_count = environ.get('PACKLE_SHARD_COUNT')
+        shard_ids = environ.get('PACKLE_SHARD_IDS')
+        return cls(
+            shard_count=int(shard_count) if shard_count else None,
+            shard_ids=parse_ids(shard_ids) if shard_ids else None,
+            process_index=int(environ.get('PACKLE_PROCESS_INDEX', 0)),
+            process_count=int(environ.get('PACKLE_PROCESS_COUNT', 1)),
+        )
+
+
+    @property
+    def shared(self) -> bool:
+        """
+        whether other processes use the same storage
+        """
+
+        return self.process_count > 1
+
+
+    def shard_for_guild(self, guild_id: Optional[int]) -> int:
+        """
+        returns the shard a guild's events are received on, direct messages (no guild) are received on shard 0
+        """
+
+        if guild_id is None or not self.shard_count:
+            return 0
+        return (guild_id >> 22) % self.shard_count
+
+
+    def owns_guild(self, guild_id: Optional[int]) -> bool:
+        """
+        returns whether this process fires the reminders sent in a guild, None for direct messages
+        """
+
+        return self.shard_ids is None or self.shard_for_guild(guild_id) in self.shard_ids
+
+
+    def bot_kwargs(self) -> Dict[str, Any]:
+        """
+        returns the sharding arguments for commands.AutoShardedBot,
+        which works out the shard count itself when none are given
+        """
+
+        kwargs = {}
+        if self.shard_count is not None:
+            kwargs['shard_count'] = self.shard_count
+        if self.shard_ids is not None:
+            kwargs['shard_ids'] = self.shard_ids
+        return kwargs
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules - typing
+from __future__ import annotations  # fixes some typehinting issues
+from importlib.machinery import ModuleSpec
+from types import ModuleType
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+# standard library modules
+import importlib
+import importlib.abc
+import importlib.util
+import json
+import sys
+import time
+import traceback
+
+# third-party packages - discord related
+from discord.ext import commands
+
+
+class CogTiming:
+    """
+    class for storing how long a single cog took to load
+    """
+
+    __slots__ = ('name', 'status', 'import_time', 'setup_time')
+
+    def __init__(self, name: str, status: str = 'loaded', import_time: float = 0.0, setup_time: float = 0.0):
+        """initializer"""
+
+        # status is one of loaded, deferred, missing, or failed
+        self.name = name
+        self.status = status
+        self.import_time = import_time
+        self.setup_time = setup_time
+
+
+    @property
+    def total(self) -> float:
+        return self.import_time + self.setup_time
+
+
+class StartupReport:
+    """
+    class for the timings of every cog loaded at startup
+    """
+
+    def __init__(self, started: float):
+        """initializer"""
+
+        # perf_counter value from when the process started loading
+        self.started = started
+        self.cogs: List[CogTiming] = []
+        self.finished = started
+
+
+    @property
+    def elapsed(self) -> float:
+        """
+        seconds from the start of the process until the cogs were loaded
+        """
+
+        return self.finished - self.started
+
+
+    def over_budget(self, budget: Optional[float]) -> bool:
+        return budget is not None and self.elapsed > budget
+
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'elapsed': self.elapsed,
+            'cogs': [
+                {
+                    'name': cog.name,
+                    'status': cog.status,
+                    'import_time': cog.import_time,
+                    'setup_time': cog.setup_time,
+                }
+                for cog in self.cogs
+            ],
+        }
+
+
+    def write(self, path: str) -> None:
+        """
+        writes the report as json, e.g. for tracking cold starts across restarts
+        """
+
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+    def print(self, indent: int = 4, underline: bool = True) -> None:
+        """
+        prints the report in the same format as the rest of the startup info
+        """
+
+        title = 'loading cogs'
+        print(title)
+        if underline:
+            print(f"{'-' * len(title)}")
+
+        # find the length of the longest cog name for padding purposes (+1 for colon)
+        sz = max((len(cog.name) for cog in self.cogs), default=0) + 1
+        for cog in self.cogs:
+            if cog.status in ('loaded', 'failed'):
+                timing = f'import {cog.import_time * 1000:.1f}ms, setup {cog.setup_time * 1000:.1f}ms'
+            else:
+                timing = ''
+            print(f"{' ' * indent}{cog.name + ':':<{sz}} {cog.status:<8} {timing}".rstrip())
+        print(f"{' ' * indent}{'total:':<{sz}} {self.elapsed * 1000:.1f}ms")
+        print()
+
+
+class _ImportedLoader(importlib.abc.Loader):
+    """
+    loader that hands back a module that was already imported, so loading
+    it as an extension only runs its setup instead of the whole module again
+    """
+
+    def __init__(self, module: ModuleType):
+        """initializer"""
+
+        self.module = module
+
+
+    def create_module(self, spec: ModuleSpec) -> ModuleType:
+        return self.module
+
+
+    def exec_module(self, module: ModuleType) -> None:
+        pass
+
+
+def _load_imported_extension(bot: commands.Bot, name: str) -> None:
+    """
+    loads an extension from its already imported module
+
+    load_extension looks the extension up with importlib.util.find_spec, which
+    returns the __spec__ of modules that were already imported, so the module
+    stands in for itself until it's loaded, and gets its own spec back afterwards
+    (e.g. so reloading the extension imports it from its file again)
+    """
+
+    module = sys.modules[name]
+    spec = module.__spec__
+    module.__spec__ = importlib.util.spec_from_loader(name, _ImportedLoader(module), origin=spec.origin)
+    try:
+        bot.load_extension(name)
+    finally:
+        module.__spec__ = spec
+
+
+def load_cogs(
+        bot: commands.Bot,
+        cogs: Iterable[str],
+        started: float,
+        lazy: Mapping[str, Sequence[str]] = None,
+) -> StartupReport:
+    """
+    loads cogs, skipping the ones that don't exist and deferring the ones in lazy
+    (extension: command names) until one of their commands is first used
+
+    each cog is imported (with its dependencies) and then set up as an extension,
+    the module only runs once, so import_time and setup_time don't overlap
+    """
+
+    lazy = lazy or {}
+    report = StartupReport(started)
+    timings = {}
+
+    # cogs that don't exist in this deployment are skipped instead of failing
+    available = []
+    for cog in cogs:
+        if importlib.util.find_spec(cog) is None:
+            timings[cog] = CogTiming(cog, 'missing')
+        elif cog in lazy:
+            timings[cog] = CogTiming(cog, 'deferred')
+        else:
+            timings[cog] = CogTiming(cog)
+            available.append(cog)
+
+    for cog in available:
+        timing = timings[cog]
+        try:
+            start = time.perf_counter()
+            try:
+                importlib.import_module(cog)
+            finally:
+                timing.import_time = time.perf_counter() - start
+            start = time.perf_counter()
+            try:
+                _load_imported_extension(bot, cog)
+            finally:
+                timing.setup_time = time.perf_counter() - start
+        except Exception:
+
+            # print traceback and continue loading remaining cogs
+            timing.status = 'failed'
+            print(f'`Error: failed to load extension {cog}`', file=sys.stderr)
+            traceback.print_exc()
+
+    for cog, timing in timings.items():
+        if timing.status == 'deferred':
+            bot.defer_extension(cog, lazy[cog])
+
+    report.cogs = list(timings.values())
+    report.finished = time.perf_counter()
+    return report
@@ -0,0 +1,674 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules - typing
+from __future__ import annotations  # fixes some typehinting issues
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# standard library modules
+import collections
+import sqlite3
+import sys
+
+# local modules
+from cardpack import CardPack, FlashCard
+from scheduling import make_scheduler
+from texts import TextTable, shared_texts
+
+
+# (user_id, pack_name)
+PackKey = Tuple[int, str]
+
+# (user_id, pack_name, due, interval, remaining, guild_id)
+ReminderRow = Tuple[int, str, float, float, Optional[int], Optional[int]]
+
+
+def _channel_id(pack: CardPack, channel, stored_id: Optional[int]) -> Optional[int]:
+    """
+    returns the id to store for one of a pack's channels, keeping the stored id when
+    the channel couldn't be resolved or the pack's author stands in for it
+    """
+
+    if stored_id is not None and (channel is None or channel is pack.author):
+        return stored_id
+    return getattr(channel, 'id', None)
+
+
+class PackStore:
+    """
+    repository for each user's CardPacks
+
+    packs are loaded lazily on first access and kept in a bounded LRU cache,
+    changes are only marked as dirty and then written to the storage engine in
+    batches, subclasses implement the storage engine specific methods
+
+    when the storage is shared with other processes, cached packs are checked
+    against storage before being returned and changes are written straight away
+    """
+
+    def __init__(
+            self,
+            resolve_user: Callable = None,
+            resolve_channel: Callable = None,
+            cache_size: int = 4096,
+            batch_size: int = 256,
+            shared: bool = False,
+    ):
+        """initializer"""
+
+        # whether other processes read and write the same storage
+        self.shared = shared
+
+        # callables used to turn stored ids back into discord objects
+        self.resolve_user = resolve_user or (lambda user_id: None)
+        self.resolve_channel = resolve_channel or (lambda channel_id, user: None)
+
+        # bounded cache of loaded packs, least recently used first
+        self.cache_size = cache_size
+        self._cache: collections.OrderedDict[PackKey, CardPack] = collections.OrderedDict()
+
+        # packs waiting to be written by the next flush, held here so packs
+        # evicted from the cache (or never cached) are still written
+        self.batch_size = batch_size
+        self._dirty: Dict[PackKey, CardPack] = {}
+
+
+    def __len__(self):
+        """
+        amount of cached packs
+        """
+
+        return len(self._cache)
+
+
+    def get(self, user_id: int, pack_name: str) -> Optional[CardPack]:
+        """
+        returns a user's CardPack, loading it from storage if required,
+        or None if the pack doesn't exist
+        """
+
+        key = (user_id, pack_name)
+        pack = self._cache.get(key)
+        if pack is not None:
+
+            # reload packs another process has changed since they were cached
+            if self.shared and key not in self._dirty and self._outdated(user_id, pack_name):
+                del self._cache[key]
+            else:
+                self._cache.move_to_end(key)
+                return pack
+
+        pack = self._load(user_id, pack_name)
+        if pack is not None:
+            self._cache_pack(key, pack)
+        return pack
+
+
+    def contains(self, user_id: int, pack_name: str) -> bool:
+        """
+        checks if a user has a pack with the given name
+        """
+
+        return (user_id, pack_name) in self._cache or self._exists(user_id, pack_name)
+
+
+    def names(self, user_id: int) -> List[str]:
+        """
+        returns the names of all of a user's packs
+        """
+
+        names = set(self._names(user_id))
+        names.update(name for uid, name in self._cache if uid == user_id)
+        return sorted(names)
+
+
+    def add(self, user_id: int, pack: CardPack) -> None:
+        """
+        adds a new pack for a user, replacing any pack with the same name
+        """
+
+        key = (user_id, pack.name)
+        self._cache_pack(key, pack)
+        self.save(user_id, pack)
+
+
+    def save(self, user_id: int, pack: CardPack) -> None:
+        """
+        marks a pack as changed so it gets written by the next flush
+        """
+
+        self._dirty[(user_id, pack.name)] = pack
+        if self.shared or len(self._dirty) >= self.batch_size:
+            self.flush()
+
+
+    def delete(self, user_id: int, pack_name: str) -> None:
+        """
+        removes a user's pack from the cache and from storage
+        """
+
+        key = (user_id, pack_name)
+        self._cache.pop(key, None)
+        self._dirty.pop(key, None)
+        self._delete(user_id, pack_name)
+
+
+    def flush(self) -> None:
+        """
+        writes all dirty packs to storage in a single batch
+        """
+
+        if not self._dirty:
+            return
+
+        items = [(user_id, pack) for (user_id, _), pack in self._dirty.items()]
+        self._dirty.clear()
+        self._write(items)
+
+
+    def close(self) -> None:
+        """
+        flushes any pending writes and releases the storage engine
+        """
+
+        self.flush()
+
+
+    def _cache_pack(self, key: PackKey, pack: CardPack) -> None:
+        """
+        inserts a pack into the cache, evicting the least recently used packs
+        """
+
+        self._cache[key] = pack
+        self._cache.move_to_end(key)
+
+        evicted = []
+        while len(self._cache) > self.cache_size:
+            old_key, old_pack = self._cache.popitem(last=False)
+            if self._dirty.get(old_key) is old_pack:
+                del self._dirty[old_key]
+                evicted.append((old_key[0], old_pack))
+
+        # write evicted packs before they are lost
+        if evicted:
+            self._write(evicted)
+
+
+    def load_reminders(self) -> Iterable[ReminderRow]:
+        """
+        returns the (user_id, pack_name, due, interval, remaining, guild_id) rows of every persisted reminder
+        """
+
+        raise NotImplementedError
+
+
+    def save_reminders(self, rows: Iterable) -> None:
+        """
+        persists the schedules of reminders in a single batch
+        """
+
+        raise NotImplementedError
+
+
+    def update_reminders(self, rows: Iterable) -> None:
+        """
+        updates the schedules of persisted reminders in a single batch, reminders
+        that were deleted in the meantime (e.g. cancelled by another process) stay deleted
+        """
+
+        raise NotImplementedError
+
+
+    def delete_reminder(self, user_id: int, pack_name: str) -> None:
+        """
+        removes a persisted reminder
+        """
+
+        raise NotImplementedError
+
+
+    def _load(self, user_id: int, pack_name: str) -> Optional[CardPack]:
+        raise NotImplementedError
+
+
+    def _outdated(self, user_id: int, pack_name: str) -> bool:
+        """
+        returns whether a cached pack was changed or deleted by another process
+        """
+
+        return False
+
+
+    def _exists(self, user_id: int, pack_name: str) -> bool:
+        raise NotImplementedError
+
+
+    def _names(self, user_id: int) -> Iterable[str]:
+        raise NotImplementedError
+
+
+    def _write(self, items: List[Tuple[int, CardPack]]) -> None:
+        raise NotImplementedError
+
+
+    def _delete(self, user_id: int, pack_name: str) -> None:
+        raise NotImplementedError
+
+
+class MemoryPackStore(PackStore):
+    """
+    PackStore that keeps everything in memory, useful for testing
+    """
+
+    def __init__(self, *args, **kwargs):
+        """initializer"""
+
+        super().__init__(*args, **kwargs)
+        self._packs: Dict[PackKey, CardPack] = {}
+        self._reminders: Dict[PackKey, ReminderRow] = {}
+
+
+    def load_reminders(self) -> Iterable[ReminderRow]:
+        return list(self._reminders.values())
+
+
+    def save_reminders(self, rows: Iterable) -> None:
+        for r in rows:
+            self._reminders[(r.user_id, r.pack_name)] = (
+                r.user_id, r.pack_name, r.due, r.interval, r.remaining, r.guild_id,
+            )
+
+
+    def update_reminders(self, rows: Iterable) -> None:
+        self.save_reminders([r for r in rows if (r.user_id, r.pack_name) in self._reminders])
+
+
+    def delete_reminder(self, user_id: int, pack_name: str) -> None:
+        self._reminders.pop((user_id, pack_name), None)
+
+
+    def _load(self, user_id: int, pack_name: str) -> Optional[CardPack]:
+        return self._packs.get((user_id, pack_name))
+
+
+    def _exists(self, user_id: int, pack_name: str) -> bool:
+        return (user_id, pack_name) in self._packs
+
+
+    def _names(self, user_id: int) -> Iterable[str]:
+        return [name for uid, name in self._packs if uid == user_id]
+
+
+    def _write(self, items: List[Tuple[int, CardPack]]) -> None:
+        for user_id, pack in items:
+            self._packs[(user_id, pack.name)] = pack
+
+
+    def _delete(self, user_id: int, pack_name: str) -> None:
+        self._packs.pop((user_id, pack_name), None)
+        self._reminders.pop((user_id, pack_name), None)
+
+
+class SQLitePackStore(PackStore):
+    """
+    PackStore backed by a SQLite database in WAL mode
+
+    every write of a pack increments its revision, and is only applied if the
+    revision is still the one the pack was loaded at, so when several processes
+    share the database a stale copy never overwrites another process's changes
+
+    card text is stored once in the texts table, addressed by its digest, and
+    cards refer to it by id, so a deck held by many users is only stored once
+    (cards written before the texts table existed keep their text inline),
+    packs whose text was shared with copies of them (see CardPack.clone) are
+    loaded into the shared text table again, so the copies still share it
+    """
+
+    # stored text ids remembered before the cache is cleared
+    TEXT_CACHE_SIZE = 1 << 20
+
+    # digests looked up per query, below SQLite's limit on the variables of a statement
+    TEXT_QUERY_SIZE = 500
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS packs (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            category TEXT NOT NULL,
+            difficulty TEXT NOT NULL,
+            round_index INTEGER NOT NULL DEFAULT 0,
+            round_active INTEGER NOT NULL DEFAULT 1,
+            dm_channel_id INTEGER,
+            remind_channel_id INTEGER,
+            scheduler TEXT NOT NULL DEFAULT 'rounds',
+            revision INTEGER NOT NULL DEFAULT 0,
+            shared_text INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS packs_user_id_name ON packs (user_id, name);
+        CREATE INDEX IF NOT EXISTS packs_name ON packs (name);
+        CREATE TABLE IF NOT EXISTS cards (
+            pack_id INTEGER NOT NULL REFERENCES packs (id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            question TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            proficiency INTEGER NOT NULL DEFAULT 1,
+            result INTEGER NOT NULL DEFAULT 1,
+            due REAL,
+            stability REAL,
+            difficulty REAL,
+            reps INTEGER,
+            question_id INTEGER REFERENCES texts (id),
+            answer_id INTEGER REFERENCES texts (id),
+            PRIMARY KEY (pack_id, position)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS texts (
+            id INTEGER PRIMARY KEY,
+            digest BLOB NOT NULL UNIQUE,
+            text TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS reminders (
+            user_id INTEGER NOT NULL,
+            pack_name TEXT NOT NULL,
+            due REAL NOT NULL,
+            interval REAL NOT NULL,
+            remaining INTEGER,
+            guild_id INTEGER,
+            PRIMARY KEY (user_id, pack_name)
+        ) WITHOUT ROWID;
+    """
+
+    # columns added after the tables were first created, by table
+    MIGRATIONS = {
+        'packs': (
+            "scheduler TEXT NOT NULL DEFAULT 'rounds'",
+            'revision INTEGER NOT NULL DEFAULT 0',
+            'shared_text INTEGER NOT NULL DEFAULT 0',
+        ),
+        'cards': (
+            'due REAL',
+            'stability REAL',
+            'difficulty REAL',
+            'reps INTEGER',
+            'question_id INTEGER REFERENCES texts (id)',
+            'answer_id INTEGER REFERENCES texts (id)',
+        ),
+        'reminders': (
+            'guild_id INTEGER',
+        ),
+    }
+
+    def __init__(self, path: str, *args, **kwargs):
+        """initializer"""
+
+        super().__init__(*args, **kwargs)
+
+        # connecting doesn't read any packs, so startup time doesn't depend on the amount stored
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('PRAGMA foreign_keys=ON')
+        self._db.executescript(self.SCHEMA)
+        self._migrate()
+        self._db.commit()
+
+        # revision of each pack as it was last loaded or written by this process
+        self._revisions: Dict[PackKey, int] = {}
+
+        # writes that were dropped because another process changed the pack first
+        self.conflicts = 0
+
+        # database id of each text that has been stored, stored text never changes
+        self._text_ids: Dict[str, int] = {}
+
+
+    def _migrate(self) -> None:
+        """
+        adds any columns missing from databases created before they existed
+        """
+
+        for table, columns in self.MIGRATIONS.items():
+            existing = {row[1] for row in self._db.execute(f'PRAGMA table_info({table})')}
+            for column in columns:
+                if column.split()[0] not in existing:
+                    self._db.execute(f'ALTER TABLE {table} ADD COLUMN {column}')
+
+
+    def close(self) -> None:
+        """
+        flushes any pending writes and closes the database
+        """
+
+        super().close()
+        self._db.close()
+
+
+    def add(self, user_id: int, pack: CardPack) -> None:
+
+        # adding deliberately replaces whatever revision is stored
+        revision = self._stored_revision(user_id, pack.name)
+        self._revisions[(user_id, pack.name)] = 0 if revision is None else revision
+        super().add(user_id, pack)
+
+
+    def load_reminders(self) -> Iterable[ReminderRow]:
+        return self._db.execute('SELECT user_id, pack_name, due, interval, remaining, guild_id FROM reminders')
+
+
+    def save_reminders(self, rows: Iterable) -> None:
+        with self._db:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO reminders (user_id, pack_name, due, interval, remaining, guild_id) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                ((r.user_id, r.pack_name, r.due, r.interval, r.remaining, r.guild_id) for r in rows),
+            )
+
+
+    def update_reminders(self, rows: Iterable) -> None:
+        with self._db:
+            self._db.executemany(
+                'UPDATE reminders SET due = ?, interval = ?, remaining = ?, guild_id = ? '
+                'WHERE user_id = ? AND pack_name = ?',
+                ((r.due, r.interval, r.remaining, r.guild_id, r.user_id, r.pack_name) for r in rows),
+            )
+
+
+    def delete_reminder(self, user_id: int, pack_name: str) -> None:
+        with self._db:
+            self._db.execute(
+                'DELETE FROM reminders WHERE user_id = ? AND pack_name = ?',
+                (user_id, pack_name),
+            )
+
+
+    def _load(self, user_id: int, pack_name: str) -> Optional[CardPack]:
+        row = self._db.execute(
+            'SELECT id, category, difficulty, round_index, round_active, dm_channel_id, remind_channel_id, scheduler, '
+            'revision, shared_text FROM packs WHERE user_id = ? AND name = ?',
+            (user_id, pack_name),
+        ).fetchone()
+        if row is None:
+            return None
+        pack_id, category, difficulty, round_index, round_active, dm_channel_id, remind_channel_id, scheduler = row[:8]
+        self._revisions[(user_id, pack_name)] = row[8]
+        shared_text = bool(row[9])
+
+        cards = self._db.execute(
+            'SELECT COALESCE(q.text, cards.question), COALESCE(a.text, cards.answer), '
+            'proficiency, due, stability, difficulty, reps '
+            'FROM cards '
+            'LEFT JOIN texts q ON q.id = cards.question_id '
+            'LEFT JOIN texts a ON a.id = cards.answer_id '
+            'WHERE pack_id = ? ORDER BY position',
+            (pack_id,),
+        ).fetchall()
+
+        author = self.resolve_user(user_id)
+        pack = CardPack(
+            (card[:3] for card in cards),
+            name=pack_name,
+            author=author,
+            dm_channel=self.resolve_channel(dm_channel_id, author),
+            category=category,
+            difficulty=difficulty,
+            round_index=round_index,
+            scheduler=make_scheduler(scheduler, (card[3:] for card in cards)),
+            texts=shared_texts if shared_text else None,
+        )
+        pack.remind_channel = self.resolve_channel(remind_channel_id, author)
+        pack.dm_channel_id = dm_channel_id
+        pack.remind_channel_id = remind_channel_id
+        pack.round.active = bool(round_active)
+
+        # restore the answers given in the current round
+        results = self._db.execute(
+            'SELECT position, result FROM cards WHERE pack_id = ? AND result != ?',
+            (pack_id, FlashCard.Result.UNANSWERED.value),
+        )
+        for position, result in results:
+            pack[position].result = FlashCard.Result(result)
+
+        return pack
+
+
+    def _stored_revision(self, user_id: int, pack_name: str) -> Optional[int]:
+        row = self._db.execute(
+            'SELECT revision FROM packs WHERE user_id = ? AND name = ?',
+            (user_id, pack_name),
+        ).fetchone()
+        return None if row is None else row[0]
+
+
+    def _outdated(self, user_id: int, pack_name: str) -> bool:
+        revision = self._stored_revision(user_id, pack_name)
+        return revision is None or revision != self._revisions.get((user_id, pack_name))
+
+
+    def _exists(self, user_id: int, pack_name: str) -> bool:
+        row = self._db.execute(
+            'SELECT 1 FROM packs WHERE user_id = ? AND name = ?',
+            (user_id, pack_name),
+        ).fetchone()
+        return row is not None
+
+
+    def _names(self, user_id: int) -> Iterable[str]:
+        rows = self._db.execute('SELECT name FROM packs WHERE user_id = ?', (user_id,))
+        return [name for name, in rows]
+
+
+    def _store_texts(self, texts: Iterable[str]) -> Dict[str, int]:
+        """
+        returns the database id of each text, storing the ones that aren't stored yet
+        """
+
+        ids = {}
+        missing = []
+        for text in texts:
+            text_id = self._text_ids.get(text)
+            if text_id is None:
+                missing.append((TextTable.digest(text), text))
+            else:
+                ids[text] = text_id
+        if not missing:
+            return ids
+
+        if len(self._text_ids) + len(missing) > self.TEXT_CACHE_SIZE:
+            self._text_ids.clear()
+        self._db.executemany('INSERT OR IGNORE INTO texts (digest, text) VALUES (?, ?)', missing)
+
+        # the ids of texts that were already stored aren't returned by the insert, so
+        # every id is looked up afterwards, a chunk of digests at a time
+        texts = dict(missing)
+        for i in range(0, len(missing), self.TEXT_QUERY_SIZE):
+            digests = [digest for digest, _ in missing[i:i + self.TEXT_QUERY_SIZE]]
+            rows = self._db.execute(
+                f"SELECT id, digest FROM texts WHERE digest IN ({', '.join('?' * len(digests))})",
+                digests,
+            )
+            for text_id, digest in rows:
+                text = texts[digest]
+                ids[text] = self._text_ids[text] = text_id
+        return ids
+
+
+    def _write(self, items: List[Tuple[int, CardPack]]) -> None:
+        with self._db:
+            for user_id, pack in items:
+                key = (user_id, pack.name)
+                cursor = self._db.execute(
+                    'INSERT INTO packs '
+                    '(user_id, name, category, difficulty, round_index, round_active, dm_channel_id, remind_channel_id, '
+                    'scheduler, shared_text) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT (user_id, name) DO UPDATE SET '
+                    'category = excluded.category, difficulty = excluded.difficulty, '
+                    'round_index = excluded.round_index, round_active = excluded.round_active, '
+                    'dm_channel_id = excluded.dm_channel_id, remind_channel_id = excluded.remind_channel_id, '
+                    'scheduler = excluded.scheduler, shared_text = excluded.shared_text, '
+                    'revision = packs.revision + 1 '
+                    'WHERE packs.revision = ?',
+                    (
+                        user_id,
+                        pack.name,
+                        pack.category,
+                        pack.difficulty,
+                        pack.round_index,
+                        int(pack.round.active),
+                        _channel_id(pack, pack.dm_channel, pack.dm_channel_id),
+                        _channel_id(pack, pack.remind_channel, pack.remind_channel_id),
+                        pack.scheduler.name,
+                        int(pack._texts is shared_texts),
+                        self._revisions.get(key, 0),
+                    ),
+                )
+
+                # another process wrote the pack since it was loaded, so this copy is stale
+                if cursor.rowcount == 0:
+                    self.conflicts += 1
+                    self._cache.pop(key, None)
+                    self._revisions.pop(key, None)
+                    print(f'`Warning: pack {pack.name!r} of user {user_id} was changed elsewhere`', file=sys.stderr)
+                    continue
+
+                pack_id, self._revisions[key], pack.dm_channel_id, pack.remind_channel_id = self._db.execute(
+                    'SELECT id, revision, dm_channel_id, remind_channel_id FROM packs WHERE user_id = ? AND name = ?',
+                    (user_id, pack.name),
+                ).fetchone()
+
+                # cards are rewritten as a whole, positions shift whenever a card is popped,
+                # the text itself is only written the first time it's seen
+                text_ids = self._store_texts({text for card in pack for text in (card.question, card.answer)})
+                self._db.execute('DELETE FROM cards WHERE pack_id = ?', (pack_id,))
+                self._db.executemany(
+                    'INSERT INTO cards '
+                    '(pack_id, position, question, answer, question_id, answer_id, proficiency, result, '
+                    'due, stability, difficulty, reps) '
+                    "VALUES (?, ?, '', '', ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        (
+                            pack_id,
+                            position,
+                            text_ids[card.question],
+                            text_ids[card.answer],
+                            card.proficiency,
+                            card.result.value,
+                        )
+                        + pack.scheduler.state(position)
+                        for position, card in enumerate(pack)
+                    ),
+                )
+
+
+    def _delete(self, user_id: int, pack_name: str) -> None:
+        self._revisions.pop((user_id, pack_name), None)
+        with self._db:
+            self._db.execute(
+                'DELETE FROM packs WHERE user_id = ? AND name = ?',
+                (user_id, pack_name),
+            )
+            self._db.execute(
+                'DELETE FROM reminders WHERE user_id = ? AND pack_name = ?',
+                (user_id, pack_name),
+            )
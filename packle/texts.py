@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules - typing
+from __future__ import annotations  # fixes some typehinting issues
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+# standard library modules
+from array import array
+import collections
+import hashlib
+import itertools
+import sys
+import threading
+import weakref
+
+
+# the id lookup is split into this many dicts by the texts' hashes, so it never
+# grows one huge dict at once, which holds up the event loop for tens of
+# milliseconds once a table reaches millions of texts
+ID_SHARDS = 64
+
+
+class TextTable:
+    """
+    content-addressed table of every question and answer text
+
+    each distinct text is stored once and referred to by a small integer id,
+    so packs hold arrays of ids instead of their own strings, and every copy
+    of a deck (clones, or copies of a deck loaded by many users) shares the
+    same text, packs whose text isn't shared keep it in a TextBuffer instead,
+    which is much cheaper per text than the table's index and references
+
+    texts are reference counted by the id columns holding them, a text is
+    dropped once nothing refers to it and its id is reused for a new text
+
+    packs can be built in worker threads and are freed by the garbage collector
+    on whichever thread it runs, so changes to the table hold a lock, and the
+    columns of freed packs are only queued, then released by the next change
+    """
+
+    def __init__(self):
+        """initializer"""
+
+        # text by id (None for free ids), id by text (sharded by hash), and references by id
+        self._texts: List[Optional[str]] = []
+        self._ids: List[Dict[str, int]] = [{} for _ in range(ID_SHARDS)]
+        self._refs = array('L')
+        self._free: List[int] = []
+
+        # held while the table changes, and id columns waiting to be released (see TextColumns)
+        self._lock = threading.Lock()
+        self._pending: Deque[Tuple[array, ...]] = collections.deque()
+
+
+    @staticmethod
+    def digest(text: str) -> bytes:
+        """
+        returns the content address of a text, as used by persistent storage
+        """
+
+        return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+    def __len__(self):
+        """
+        amount of distinct texts
+        """
+
+        with self._lock:
+            self._drain()
+            return sum(map(len, self._ids))
+
+
+    def __getitem__(self, i: int) -> str:
+        return self._texts[i]
+
+
+    def _add(self, text: str) -> int:
+        """
+        returns the id of a text, adding it to the table if required
+        """
+
+        ids = self._ids[hash(text) % ID_SHARDS]
+        i = ids.get(text)
+        if i is None:
+            text = str(text)
+            if self._free:
+                i = self._free.pop()
+                self._texts[i] = text
+            else:
+                i = len(self._texts)
+                self._texts.append(text)
+                self._refs.append(0)
+            ids[text] = i
+        self._refs[i] += 1
+        return i
+
+
+    def acquire(self, texts: Iterable[str]) -> array:
+        """
+        returns an array of the ids of texts, holding a reference to each of them
+        """
+
+        with self._lock:
+            self._drain()
+            return array('I', map(self._add, texts))
+
+
+    def share(self, ids: Iterable[int]) -> array:
+        """
+        returns a copy of an array of ids, holding another reference to each of them
+        """
+
+        ids = array('I', ids)
+        with self._lock:
+            self._drain()
+            refs = self._refs
+            for i in ids:
+                refs[i] += 1
+        return ids
+
+
+    def release(self, ids: Iterable[int]) -> None:
+        """
+        drops a reference to each id, freeing the texts nothing refers to anymore
+        """
+
+        with self._lock:
+            self._drain()
+            self._release(ids)
+
+
+    def _release(self, ids: Iterable[int]) -> None:
+        refs = self._refs
+        for i in ids:
+            refs[i] -= 1
+            if not refs[i]:
+                text = self._texts[i]
+                del self._ids[hash(text) % ID_SHARDS][text]
+                self._texts[i] = None
+                self._free.append(i)
+
+
+    def _release_later(self, *columns: array) -> None:
+        """
+        queues id columns to be released by the next change to the table,
+        safe to call from any thread, even while it holds the lock
+        """
+
+        self._pending.append(columns)
+
+
+    def _drain(self) -> None:
+        """
+        releases the queued id columns, the lock must be held
+        """
+
+        pending = self._pending
+        while pending:
+            for column in pending.popleft():
+                self._release(column)
+
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        returns the amount of texts and references and the memory the texts use
+        """
+
+        with self._lock:
+            self._drain()
+            return {
+                'texts': sum(map(len, self._ids)),
+                'references': sum(self._refs),
+                'text_bytes': sum(sum(map(sys.getsizeof, ids)) for ids in self._ids),
+                'free_ids': len(self._free),
+            }
+
+
+class TextBuffer:
+    """
+    a single pack's question and answer texts, utf-8 encoded one after another
+    in a buffer and indexed by their offsets, which costs a few bytes per text
+    instead of a python string object each
+
+    ids are positions in the buffer, they're never reused or changed, so the
+    buffer can be read by snapshots of the pack while the pack appends to it,
+    texts are only dropped by compacting the buffer into a new one
+    """
+
+    __slots__ = ('_data', '_offsets')
+
+    def __init__(self):
+        """initializer"""
+
+        self._data = bytearray()
+        self._offsets = array('I', [0])
+
+
+    def __len__(self):
+        """
+        amount of texts, including ones that were released
+        """
+
+        return len(self._offsets) - 1
+
+
+    def __getitem__(self, i: int) -> str:
+        return str(self._data[self._offsets[i]:self._offsets[i + 1]], 'utf-8', 'surrogatepass')
+
+
+    def acquire(self, texts: Iterable[str]) -> array:
+        """
+        appends texts to the buffer, returning their ids
+        """
+
+        encoded = [str(text).encode('utf-8', 'surrogatepass') for text in texts]
+        start = len(self)
+        ends = itertools.accumulate(map(len, encoded), initial=self._offsets[-1])
+        self._offsets.extend(itertools.islice(ends, 1, None))
+        self._data += b''.join(encoded)
+        return array('I', range(start, len(self)))
+
+
+    def share(self, ids: Iterable[int]) -> array:
+        """
+        returns a copy of an array of ids
+        """
+
+        return array('I', ids)
+
+
+    def release(self, ids: Iterable[int]) -> None:
+        """
+        texts stay in the buffer until it's compacted
+        """
+
+
+    def _release_later(self, *columns: array) -> None:
+        pass
+
+
+    def compact(self, *columns: array) -> Tuple[TextBuffer, List[array]]:
+        """
+        returns a new buffer holding only the texts referred to by columns,
+        and the columns with their ids changed to refer to the new buffer
+        """
+
+        buffer = TextBuffer()
+        local: Dict[int, int] = {}
+        for column in columns:
+            for i in column:
+                local.setdefault(i, len(local))
+        buffer.acquire(map(self.__getitem__, local))
+        return buffer, [array('I', map(local.__getitem__, column)) for column in columns]
+
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        returns the amount of texts and the memory the buffer uses
+        """
+
+        return {
+            'texts': len(self),
+            'text_bytes': sys.getsizeof(self._data) + sys.getsizeof(self._offsets),
+        }
+
+
+class TextColumns:
+    """
+    class for owning a pack's question and answer id columns, the texts they
+    refer to are released once the columns are no longer used by the pack or
+    any of its snapshots
+
+    the columns may change in place, as long as every id added was acquired
+    and every id removed is released
+    """
+
+    __slots__ = ('table', 'questions', 'answers', '__weakref__')
+
+    def __init__(self, table: TextTable, questions: array = None, answers: array = None):
+        """initializer"""
+
+        self.table = table
+        self.questions = array('I') if questions is None else questions
+        self.answers = array('I') if answers is None else answers
+
+        # the finalizer runs on whichever thread collects the columns, so it only queues them,
+        # and nothing needs releasing when the whole process is exiting
+        finalizer = weakref.finalize(self, table._release_later, self.questions, self.answers)
+        finalizer.atexit = False
+
+
+    def copy(self) -> TextColumns:
+        """
+        returns a copy of the columns holding its own references
+        """
+
+        return TextColumns(self.table, self.table.share(self.questions), self.table.share(self.answers))
+
+
+# the table shared by every pack
+shared_texts = TextTable()
@@ -1,60 +1,70 @@
 # -*- coding: utf-8 -*-
 
 
+# standard library modules - typing
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+# standard library modules
+import asyncio
+import weakref
+
 # third-party packages - discord related
 from dpymenus import Page
 
 # local modules
-from cardpack import CardPack, FlashCard
+from cardpack import CardPack, FlashCard, PackSnapshot
 from constants import Colors, Emojis
 
 
 U200B = '\u200b'
 
+# amount of cards rendered between yielding to the event loop when pre-rendering
+PRERENDER_CHUNK_SIZE = 256
 
-async def make_card_page(
-        pack: CardPack,
+# rendered card embed dicts for each pack, as (pack version, header, {(index, quiz_mode, result): embed dict}),
+# the renders are dropped as soon as the pack's version or header changes, and with the pack itself,
+# snapshots of a whole unchanged pack share the pack's renders, so every quiz of it reuses them
+_renders = weakref.WeakKeyDictionary()
+
+
+def _field(name: str, value: str, inline: bool) -> Dict[str, Any]:
+    return {'name': name, 'value': value, 'inline': inline}
+
+
+def _render_card(
+        pack: Union[CardPack, PackSnapshot],
+        card: FlashCard,
         index: int,
-        quiz_mode: bool = False,
-) -> Page:
+        quiz_mode: bool,
+        header: Tuple[str, str],
+) -> Dict[str, Any]:
     """
-    create a dpymenus.Page for a FlashCard
+    builds the embed dict for a FlashCard
     """
 
-    # get card
-    if quiz_mode:
-        card: FlashCard = pack[index]
-    else:
-        card: FlashCard = pack.round[index]
-
-    # initialize page
-    page = Page(
-        title=f'{pack.name} ({pack.category})',
-        description='Click the answer to reveal it and choose the tick or cross based on your self assessment',
-        colour=Colors.embed,
-    )
+    title, footer = header
 
     # add question
-    page.add_field(name='Question', value=card.question, inline=True)
+    fields = [_field('Question', card.question, True)]
 
     # add answer, spoilering if in multiplayer mode, or no results in single player mode
     if quiz_mode or card.result == FlashCard.Result.UNANSWERED:
         answer = f'||{card.answer}||'
     else:
         answer = card.answer
-    page.add_field(name='Answer', value=answer, inline=True)
+    fields.append(_field('Answer', answer, True))
 
     # add result field if requested, for single player only
     if not quiz_mode:
 
         # add whitespace
-        page.add_field(name=U200B, value=U200B, inline=False)
+        fields.append(_field(U200B, U200B, False))
 
         # add proficiency level
-        page.add_field(name='Proficiency', value=f'{card.proficiency}', inline=False)
+        fields.append(_field('Proficiency', f'{card.proficiency}', False))
 
         # add whitespace
-        page.add_field(name=U200B, value=U200B, inline=False)
+        fields.append(_field(U200B, U200B, False))
 
         # add result field and minor whitespace beneath it
         if card.result == FlashCard.Result.CORRECT:
@@ -63,7 +73,7 @@ async def make_card_page(
             result_text = f'{Emojis.cross} Incorrect\n{U200B}'
         else:
             result_text = f'{Emojis.box} Unanswered\n{U200B}'
-        page.add_field(name='Result', value=result_text, inline=False)
+        fields.append(_field('Result', result_text, False))
 
     # add current card position in deck for current round
     if quiz_mode:
@@ -74,9 +84,115 @@ async def make_card_page(
 
         # amount of cards just for this Round
         size = len(pack.round)
-    page.set_author(name=f'card {index + 1} of {size}')
 
-    # add pack author
-    page.set_footer(text=f'pack creator: {pack.author}')
+    return {
+        'type': 'rich',
+        'title': title,
+        'description': 'Click the answer to reveal it and choose the tick or cross based on your self assessment',
+        'color': Colors.embed,
+        'fields': fields,
+        'author': {'name': f'card {index + 1} of {size}'},
+
+        # add pack author
+        'footer': {'text': footer},
+    }
+
+
+def render_card(pack: Union[CardPack, PackSnapshot], index: int, quiz_mode: bool = False) -> Dict[str, Any]:
+    """
+    returns the embed dict for a FlashCard, rendering it only if the pack has changed since it was last rendered
+
+    the dict is shared with the cache so it must not be modified,
+    use discord.Embed.from_dict to send it
+    """
+
+    # get card
+    if quiz_mode:
+        card: FlashCard = pack[index]
+    else:
+        card: FlashCard = pack.round[index]
+
+    cache = _cache(pack)
+    key = (index, quiz_mode, card.result)
+    embed = cache.get(key)
+    if embed is None:
+        embed = cache[key] = _render_card(pack, card, index, quiz_mode, _header(pack))
+    return embed
+
+
+def _header(pack: Union[CardPack, PackSnapshot]) -> Tuple[str, str]:
+    return f'{pack.name} ({pack.category})', f'pack creator: {pack.author}'
+
+
+def _cache(pack: Union[CardPack, PackSnapshot]) -> Dict[tuple, Dict[str, Any]]:
+    """
+    returns the renders of a pack's cards by (index, quiz_mode, result), for its current version
+    """
+
+    # everything on the card is covered by the pack's version apart from the pack's own details
+    header = _header(pack)
+    entry = _renders.get(pack)
+    if entry is not None and entry[0] == pack.version and entry[1] == header:
+        return entry[2]
+
+    # a snapshot of the whole pack taken since its last change renders the same cards as the pack
+    if isinstance(pack, PackSnapshot) and not pack.outdated and pack._indexes == range(len(pack.pack)):
+        entry = _renders.get(pack.pack)
+        if entry is None or entry[0] != pack.version or entry[1] != header:
+            entry = _renders[pack.pack] = (pack.version, header, {})
+    else:
+        entry = (pack.version, header, {})
+    _renders[pack] = entry
+    return entry[2]
+
+
+async def prerender_deck(
+        pack: Union[CardPack, PackSnapshot],
+        quiz_mode: bool = True,
+        limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    renders every card in a pack (or in its current round) up front, or the
+    first limit of them, yielding to the event loop between chunks so large
+    packs don't block it
+    """
+
+    size = len(pack) if quiz_mode else len(pack.round)
+    if limit is not None:
+        size = min(size, limit)
+    deck = []
+    for start in range(0, size, PRERENDER_CHUNK_SIZE):
+        deck.extend(render_card(pack, i, quiz_mode) for i in range(start, min(start + PRERENDER_CHUNK_SIZE, size)))
+        await asyncio.sleep(0)
+    return deck
+
+
+def page_from_dict(embed: Dict[str, Any]) -> Page:
+    """
+    create a dpymenus.Page from a rendered embed dict
+    """
+
+    # initialize page
+    page = Page(
+        title=embed['title'],
+        description=embed['description'],
+        colour=embed['color'],
+    )
+    for field in embed['fields']:
+        page.add_field(**field)
+    page.set_author(**embed['author'])
+    page.set_footer(**embed['footer'])
 
     return page
+
+
+async def make_card_page(
+        pack: Union[CardPack, PackSnapshot],
+        index: int,
+        quiz_mode: bool = False,
+) -> Page:
+    """
+    create a dpymenus.Page for a FlashCard
+    """
+
+    return page_from_dict(render_card(pack, index, quiz_mode))
@@ -7,6 +7,7 @@ from discord.ext import commands
 
 # local modules
 from constants import Colors
+from outbound import Priority
 
 
 async def delete_context_message(ctx: commands.Context):
@@ -48,7 +49,7 @@ async def send_error_msg(ctx: commands.Context, msg: str) -> discord.Message:
         value='Use the command `$help <command>` for more information',
         inline=False,
     )
-    return await ctx.send(embed=embed)
+    return await ctx.bot.outbound.send(ctx, Priority.INTERACTIVE, embed=embed)
 
 
 async def send_success_msg(ctx: commands.Context, msg: str) -> discord.Message:
@@ -59,7 +60,7 @@ async def send_success_msg(ctx: commands.Context, msg: str) -> discord.Message:
         name='Success',
         value=msg,
     )
-    return await ctx.send(embed=embed)
+    return await ctx.bot.outbound.send(ctx, Priority.INTERACTIVE, embed=embed)
 
 
 async def send_info_msg(ctx: commands.Context, msg: str) -> discord.Message:
@@ -67,4 +68,4 @@ async def send_info_msg(ctx: commands.Context, msg: str) -> discord.Message:
         color=Colors.info,
         description=msg,
     )
-    return await ctx.send(embed=embed)
+    return await ctx.bot.outbound.send(ctx, Priority.INTERACTIVE, embed=embed)
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules - typing
+from __future__ import annotations  # fixes some typehinting issues
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+# standard library modules
+from array import array
+import asyncio
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+import functools
+import itertools
+import multiprocessing
+import random
+import time
+
+# local modules
+import metrics
+from cardpack import CardPack, FlashCard
+
+
+T = TypeVar('T')
+
+# card operations on packs (or other work) at least this size are run in the process pool
+OFFLOAD_THRESHOLD = 100000
+
+
+def shuffled(indexes: array) -> array:
+    """
+    returns a shuffled copy of an array of card indexes
+    """
+
+    # shuffling a list then converting it back is faster than shuffling the array in place
+    indexes = indexes.tolist()
+    random.shuffle(indexes)
+    return array('i', indexes)
+
+
+def advanced(proficiency: array, results: array) -> Tuple[array, array, Tuple[Dict[int, array], array]]:
+    """
+    the column work of CardPack.next_round, returns the answered cards,
+    the new proficiency column, and the index of the new proficiency levels
+    """
+
+    unanswered = FlashCard.Result.UNANSWERED.value
+    answered = array('i', itertools.compress(range(len(results)), map(unanswered.__ne__, results)))
+    proficiency = CardPack.transition(proficiency, results)
+    return answered, proficiency, CardPack.index_levels(proficiency)
+
+
+class Workers:
+    """
+    executors for running blocking work off the event loop
+
+    pure-data card operations (functions of columns that return columns, so
+    they're cheap to send between processes) run in a process pool, where they
+    don't hold up the event loop's GIL, and blocking I/O runs in a thread pool
+
+    functions run in the process pool must be importable module level
+    functions, and must not use text ids as the text table is per process
+    """
+
+    def __init__(
+            self,
+            processes: Optional[int] = None,  # one per cpu
+            threads: Optional[int] = None,  # the executor's default
+            threshold: int = OFFLOAD_THRESHOLD,
+    ):
+        """initializer"""
+
+        self.processes = processes
+        self.threads = threads
+        self.threshold = threshold
+
+        # created when first used, so processes that never offload anything don't start a pool
+        self._process_pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._thread_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+        # jobs by where they ran, and jobs currently running off the event loop
+        self._jobs = {'inline': 0, 'process': 0, 'thread': 0}
+        self._running = 0
+
+
+    def _processes(self) -> concurrent.futures.ProcessPoolExecutor:
+        if self._process_pool is None:
+
+            # forking a process that's running threads (e.g. the review log's) isn't safe
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            self._process_pool = concurrent.futures.ProcessPoolExecutor(self.processes, mp_context=context)
+        return self._process_pool
+
+
+    def _threads(self) -> concurrent.futures.ThreadPoolExecutor:
+        if self._thread_pool is None:
+            self._thread_pool = concurrent.futures.ThreadPoolExecutor(self.threads, thread_name_prefix='packle-io')
+        return self._thread_pool
+
+
+    async def _run(self, pool: str, executor: concurrent.futures.Executor, func: Callable[..., T], *args) -> T:
+        self._jobs[pool] += 1
+        self._running += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_event_loop().run_in_executor(executor, functools.partial(func, *args))
+        finally:
+            self._running -= 1
+            metrics.observe('packle_worker_seconds', time.perf_counter() - start, pool=pool)
+
+
+    async def run_io(self, func: Callable[..., T], *args) -> T:
+        """
+        runs blocking I/O in the thread pool
+        """
+
+        return await self._run('thread', self._threads(), func, *args)
+
+
+    async def run_cpu(self, func: Callable[..., T], *args) -> T:
+        """
+        runs a pure-data function in the process pool
+        """
+
+        try:
+            return await self._run('process', self._processes(), func, *args)
+        except BrokenProcessPool:
+
+            # a worker died (e.g. killed for using too much memory), so the next job gets a new pool
+            self._process_pool = None
+            raise
+
+
+    async def run_sized(self, size: int, func: Callable[..., T], *args) -> T:
+        """
+        runs a pure-data function over size items, in the process pool if
+        size reaches the threshold, otherwise straight away on the event loop
+        """
+
+        if size < self.threshold:
+            self._jobs['inline'] += 1
+            return func(*args)
+        return await self.run_cpu(func, *args)
+
+
+    def shutdown(self) -> None:
+        """
+        stops the pools, without waiting for running jobs
+        """
+
+        for pool in (self._process_pool, self._thread_pool):
+            if pool is not None:
+                pool.shutdown(wait=False)
+        self._process_pool = None
+        self._thread_pool = None
+
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        returns the amount of jobs run by each pool and the jobs still running
+        """
+
+        return {
+            'threshold': self.threshold,
+            **{f'{pool} jobs': jobs for pool, jobs in self._jobs.items()},
+            'running': self._running,
+        }
+
+
+async def next_round(pack: CardPack, now: float = None, workers: Workers = None) -> None:
+    """
+    CardPack.next_round, with the whole column work of large packs run in the process pool
+    """
+
+    workers = workers or shared_workers
+    if len(pack) < workers.threshold:
+        pack.next_round(now)
+        return
+
+    now = time.time() if now is None else now
+    version = pack.version
+    answered, proficiency, index = await workers.run_cpu(advanced, pack._proficiency, pack._results)
+
+    # the pack changed (e.g. a card was answered) while the columns were worked out
+    if pack.version != version:
+        pack.next_round(now)
+        return
+    pack._advance(pack._reschedule(now, answered), proficiency, index)
+
+    # the scheduler picks the new round's cards straight away, so the pack is never seen
+    # half way through a round change, and only the order of the cards waits for the pool
+    selected = array('i', pack.scheduler.select(pack, now))
+    pack.round._indexes = selected
+    pack.version += 1
+    version = pack.version
+    indexes = await workers.run_cpu(shuffled, selected)
+    if pack.version == version:
+        pack.round._indexes = indexes
+        pack.version += 1
+
+
+# the pools shared by every cog
+shared_workers = Workers()
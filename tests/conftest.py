@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""
+the tests import the bot's modules the same way the bot does, and share
+the benchmarks' fake discord objects, so no bot token is required
+
+    python -m pytest tests
+"""
+
+
+# standard library modules
+import os
+import sys
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path[:0] = [os.path.join(ROOT, 'packle'), os.path.join(ROOT, 'benchmarks')]
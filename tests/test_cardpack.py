@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+the pack's incremental state (buckets, slots, tallies, round) checked against
+a full recompute, and against the per-card logic CardPack used before its
+cards were stored in columns
+"""
+
+
+# standard library modules
+import random
+
+# local modules
+from fakes import FakeChannel, FakeUser
+from cardpack import CardPack, FlashCard
+
+
+UNANSWERED = FlashCard.Result.UNANSWERED
+CORRECT = FlashCard.Result.CORRECT
+INCORRECT = FlashCard.Result.INCORRECT
+
+
+class ReferencePack:
+    """
+    the cards as a list of [question, answer, proficiency, result] rows,
+    changed the way the per-card CardPack changed them
+    """
+
+    def __init__(self, rows):
+        """initializer"""
+
+        self.cards = [[question, answer, 1, UNANSWERED] for question, answer in rows]
+        self.round_index = 0
+
+
+    def next_round(self):
+        for card in self.cards:
+            if card[3] == CORRECT:
+                card[2] = min(card[2] + 1, CardPack.MAX_PROFICIENCY)
+            elif card[3] == INCORRECT:
+                card[2] = max(card[2] - 1, 1)
+            card[3] = UNANSWERED
+        self.round_index = (self.round_index + 1) % len(CardPack.Round.ROUNDS)
+
+
+    def round(self):
+        levels = CardPack.Round.ROUNDS[self.round_index]
+        return sorted(i for i, card in enumerate(self.cards) if card[2] in levels)
+
+
+def check_index(pack: CardPack):
+    """
+    checks the pack's buckets, slots and tallies against recomputing them from its columns
+    """
+
+    buckets, slots = CardPack.index_levels(pack._proficiency)
+    assert {level: sorted(bucket) for level, bucket in pack._buckets.items()} == \
+        {level: sorted(bucket) for level, bucket in buckets.items()}
+    for level, bucket in pack._buckets.items():
+        for slot, i in enumerate(bucket):
+            assert pack._slots[i] == slot
+    tally = {}
+    for level, result in zip(pack._proficiency, pack._results):
+        tally.setdefault(level, [0, 0, 0, 0])[result] += 1
+    assert pack._tally == tally
+    assert pack.mastered == all(level >= CardPack.MASTERED for level in pack._proficiency)
+
+    # the round's cards are all in the pack, once each
+    assert len(set(pack.round._indexes)) == len(pack.round)
+    assert all(0 <= i < len(pack) for i in pack.round._indexes)
+    unanswered = UNANSWERED.value
+    assert pack.round.unstudied == sum(
+        tally.get(level, [0, 0])[unanswered] for level in CardPack.Round.ROUNDS[pack.round_index]
+    )
+
+
+def check_cards(pack: CardPack, reference: ReferencePack):
+    assert [[card.question, card.answer, card.proficiency, card.result] for card in pack] == reference.cards
+    assert pack.round_index == reference.round_index
+
+
+def test_incremental_state_matches_recompute():
+    rng = random.Random(3)
+    for seed in range(20):
+        rng.seed(seed)
+        rows = [(f'question {i}', f'answer {i}') for i in range(rng.randrange(1, 60))]
+        pack = CardPack(rows, 'pack', FakeUser(), FakeChannel())
+        reference = ReferencePack(rows)
+        added = len(rows)
+
+        for _ in range(200):
+            op = rng.random()
+            if op < 0.4 and len(pack):
+
+                # answer some of the round's cards
+                for card in pack.round:
+                    if rng.random() < 0.7:
+                        card.result = rng.choice((CORRECT, INCORRECT))
+                        reference.cards[card._index][3] = card.result
+            elif op < 0.55:
+                version = pack.version
+                pack.next_round()
+                reference.next_round()
+                assert pack.version != version
+                assert sorted(pack.round._indexes) == reference.round()
+            elif op < 0.65 and len(pack) > 1:
+                i = rng.randrange(len(pack))
+                card = pack.pop(i)
+                assert [card.question, card.answer, card.proficiency, card.result] == reference.cards.pop(i)
+            elif op < 0.8:
+                pack.append(FlashCard(f'question {added}', f'answer {added}'))
+                reference.cards.append([f'question {added}', f'answer {added}', 1, UNANSWERED])
+                added += 1
+            elif len(pack):
+                i = rng.randrange(len(pack))
+                level = rng.randint(1, 6)
+                pack[i].proficiency = level
+                reference.cards[i][2] = level
+
+            check_index(pack)
+            check_cards(pack, reference)
+
+
+def test_reset_matches_recompute():
+    rng = random.Random(5)
+    pack = CardPack([(f'q {i}', f'a {i}') for i in range(100)], 'pack', FakeUser(), FakeChannel())
+    for _ in range(5):
+        for card in pack.round:
+            card.result = rng.choice((CORRECT, INCORRECT))
+        pack.next_round()
+    pack.reset()
+    check_index(pack)
+    assert set(pack._proficiency) == {1}
+    assert pack.round_index == 0
+
+
+def test_popping_compacts_the_text_buffer():
+    rows = [(f'question {i}', f'answer {i}') for i in range(500)]
+    pack = CardPack(rows, 'pack', FakeUser(), FakeChannel())
+    snapshot = pack.snapshot()
+    reference = ReferencePack(rows)
+    while len(pack) > 20:
+        pack.pop(0)
+        reference.cards.pop(0)
+    assert len(pack._texts) <= CardPack.MAX_BUFFER_WASTE * 2 * len(pack) + 64
+    check_index(pack)
+    check_cards(pack, reference)
+    assert [(card.question, card.answer) for card in snapshot] == rows
+
+
+def test_clones_share_their_text():
+    rows = [(f'question {i}', f'answer {i}') for i in range(100)]
+    pack = CardPack(rows, 'pack', FakeUser(), FakeChannel())
+    snapshot = pack.snapshot()
+    buffer = pack._texts
+    pack.pop(0)
+    clone = pack.clone()
+    assert pack._texts is clone._texts is not buffer
+    assert pack._questions == clone._questions
+    assert [(card.question, card.answer) for card in clone] == rows[1:]
+    assert [(card.question, card.answer) for card in snapshot] == rows
+    check_index(pack)
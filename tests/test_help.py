@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules
+import asyncio
+
+# local modules
+from packle_help import PackleHelp
+from packlebot import Packle
+
+
+class DeferringBot:
+    """
+    a bot with deferred extensions that records which ones were loaded
+    """
+
+    load_deferred_extension = Packle.load_deferred_extension
+    defer_extension = Packle.defer_extension
+
+    def __init__(self):
+        """initializer"""
+
+        self.deferred_extensions = {}
+        self.loaded = []
+
+
+    def load_extension(self, name):
+        self.loaded.append(name)
+
+
+class HelpContext:
+    def __init__(self, bot):
+        """initializer"""
+
+        self.bot = bot
+
+
+def _prepare(bot, command):
+    asyncio.run(PackleHelp().prepare_help_command(HelpContext(bot), command))
+
+
+def test_help_loads_every_deferred_extension():
+    bot = DeferringBot()
+    bot.defer_extension('cogs.quiz', ('quiz', 'stop'))
+    bot.defer_extension('cogs.other', ('other',))
+    _prepare(bot, None)
+    assert sorted(bot.loaded) == ['cogs.other', 'cogs.quiz']
+    assert bot.deferred_extensions == {}
+
+
+def test_command_help_loads_its_extension():
+    bot = DeferringBot()
+    bot.defer_extension('cogs.quiz', ('quiz', 'stop'))
+    bot.defer_extension('cogs.other', ('other',))
+    _prepare(bot, 'Quiz')
+    assert bot.loaded == ['cogs.quiz']
+    assert bot.deferred_extensions == {'other': 'cogs.other'}
+
+    # help for loaded or unknown commands loads nothing
+    _prepare(bot, 'stop')
+    _prepare(bot, 'add')
+    assert bot.loaded == ['cogs.quiz']
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules
+import asyncio
+import contextlib
+import os
+import sqlite3
+import zipfile
+
+# local modules
+from fakes import make_pack
+from importer import ANKI_FIELD_SEPARATOR, import_file_async
+from workers import Workers
+
+
+# notes in the anki deck, enough for the import to take many trips to the I/O threads
+ANKI_NOTES = 20000
+
+
+def _anki_deck(tmp_path, notes):
+    """
+    writes an anki deck package with a note per (question, answer) pair
+    """
+
+    collection = os.path.join(tmp_path, 'collection.anki2')
+    with contextlib.closing(sqlite3.connect(collection)) as db:
+        db.execute('CREATE TABLE notes (id INTEGER PRIMARY KEY, flds TEXT NOT NULL)')
+        db.executemany(
+            'INSERT INTO notes (id, flds) VALUES (?, ?)',
+            ((i, f'<b>{question}</b>{ANKI_FIELD_SEPARATOR}{answer}<br>') for i, (question, answer) in enumerate(notes)),
+        )
+        db.commit()
+    path = os.path.join(tmp_path, 'deck.apkg')
+    with zipfile.ZipFile(path, 'w') as package:
+        package.write(collection, 'collection.anki2')
+    return path
+
+
+def test_anki_deck_imports_in_the_background(tmp_path):
+    notes = [(f'question {i}', f'answer {i}') for i in range(ANKI_NOTES)]
+    path = _anki_deck(tmp_path, notes)
+    pack = make_pack(0)
+    workers = Workers()
+    try:
+        stats = asyncio.run(import_file_async(pack, path, workers=workers))
+    finally:
+        workers.shutdown()
+    assert stats.imported == len(pack) == ANKI_NOTES
+    assert not stats.skipped
+    assert [(card.question, card.answer) for card in pack] == notes
+    assert workers.stats()['thread jobs'] > 1
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+drives the outbound Dispatcher against fake discord routes, which record
+when each request was made and can answer with 429s
+"""
+
+
+# standard library modules
+import asyncio
+import time
+
+# third-party packages - discord related
+import discord
+
+# local modules
+from outbound import Dispatcher, Priority, TokenBucket, retry_after
+
+
+class FakeResponse:
+    """
+    stand-in for the aiohttp response a discord.HTTPException is made from
+    """
+
+    def __init__(self, status, headers=None):
+        """initializer"""
+
+        self.status = status
+        self.reason = 'Too Many Requests' if status == 429 else 'OK'
+        self.headers = headers or {}
+
+
+def rate_limited(retry_after=None, is_global=False):
+    headers = {}
+    if retry_after is not None:
+        headers['Retry-After'] = str(retry_after)
+    if is_global:
+        headers['X-RateLimit-Global'] = 'true'
+    return discord.HTTPException(FakeResponse(429, headers), {'message': 'You are being rate limited.', 'code': 0})
+
+
+class FakeRoute:
+    """
+    a channel whose sends are recorded, failing with the queued errors first
+    """
+
+    def __init__(self, channel_id, log, errors=()):
+        """initializer"""
+
+        self.id = channel_id
+        self.log = log
+        self.errors = list(errors)
+        self.attempts = []
+
+
+    async def send(self, content=None, **kwargs):
+        self.attempts.append(time.monotonic())
+        if self.errors:
+            raise self.errors.pop(0)
+        self.log.append((self.id, content))
+        return content
+
+
+def _run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=10.0))
+
+
+def test_priority_and_channel_order():
+    log = []
+
+    async def run():
+        dispatcher = Dispatcher(max_in_flight=1)
+        a, b = FakeRoute(1, log), FakeRoute(2, log)
+        futures = [dispatcher.send(a, Priority.BACKGROUND, content=f'background {i}') for i in range(3)]
+        futures += [dispatcher.send(b, Priority.INTERACTIVE, content=f'interactive {i}') for i in range(3)]
+        dispatcher.start()
+        try:
+            await asyncio.gather(*futures)
+        finally:
+            dispatcher.stop()
+
+    _run(run())
+    assert [content for _, content in log] == [
+        'interactive 0', 'interactive 1', 'interactive 2', 'background 0', 'background 1', 'background 2',
+    ]
+
+
+def test_channel_rate_is_paced():
+    log = []
+    rate = 20.0
+
+    async def run():
+        dispatcher = Dispatcher(channel_rate=rate, channel_burst=1.0)
+        route = FakeRoute(1, log)
+        dispatcher.start()
+        try:
+            await asyncio.gather(*(dispatcher.send(route, content=i) for i in range(6)))
+        finally:
+            dispatcher.stop()
+        return route.attempts
+
+    attempts = _run(run())
+    assert [content for _, content in log] == list(range(6))
+    gaps = [b - a for a, b in zip(attempts, attempts[1:])]
+    assert min(gaps) >= 1.0 / rate * 0.9
+
+
+def test_429_is_retried_after_retry_after():
+    log = []
+
+    async def run():
+
+        # one request at a time, so the retried request is the only one in flight when it fails
+        dispatcher = Dispatcher(max_in_flight=1)
+        route = FakeRoute(1, log, errors=[rate_limited(0.2), rate_limited(0.1)])
+        other = FakeRoute(2, log)
+        dispatcher.start()
+        try:
+            first = dispatcher.send(route, content='first')
+            second = dispatcher.send(route, content='second')
+            elsewhere = dispatcher.send(other, content='elsewhere')
+            results = await asyncio.gather(first, second, elsewhere)
+        finally:
+            dispatcher.stop()
+        return dispatcher, route, results
+
+    dispatcher, route, results = _run(run())
+    assert results == ['first', 'second', 'elsewhere']
+
+    # the other channel isn't held back, and the rate limited channel stays in order
+    assert log[0] == (2, 'elsewhere')
+    assert [content for channel_id, content in log if channel_id == 1] == ['first', 'second']
+    assert route.attempts[1] - route.attempts[0] >= 0.2 * 0.9
+    assert route.attempts[2] - route.attempts[1] >= 0.1 * 0.9
+    assert dispatcher.rate_limited == 2
+    assert dispatcher.retried == 2
+    assert dispatcher.errors == 0
+
+
+def test_429_without_retry_after_backs_off_then_gives_up():
+    log = []
+
+    async def run():
+        dispatcher = Dispatcher(max_retries=2, retry_backoff=0.05)
+        route = FakeRoute(1, log, errors=[rate_limited() for _ in range(3)])
+        dispatcher.start()
+        try:
+            await dispatcher.send(route, content='never')
+        finally:
+            dispatcher.stop()
+        return dispatcher, route
+
+    try:
+        _run(run())
+    except discord.HTTPException as e:
+        assert e.status == 429
+    else:
+        raise AssertionError('the request should fail once it has been retried max_retries times')
+    assert log == []
+
+
+def test_retry_after():
+    assert retry_after(rate_limited(1.5), 0) == 1.5
+    assert [retry_after(rate_limited(), attempt, 0.5) for attempt in range(3)] == [0.5, 1.0, 2.0]
+
+
+def test_paused_bucket_waits():
+    bucket = TokenBucket(rate=2.0, capacity=5.0, now=0.0)
+    bucket.pause(3.0, 0.0)
+    assert abs(bucket.wait_time(0.0) - 3.0) < 1e-9
+    assert bucket.wait_time(3.0) == 0.0
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules
+import asyncio
+
+# third-party packages - discord related
+import discord
+
+# local modules
+from fakes import FakeBot, FakeChannel, FakeUser, make_pack
+from packlebot import Packle
+from reminders import ReminderScheduler
+from storage import MemoryPackStore
+
+
+INTERVAL = 3600.0
+
+
+class FailingStore(MemoryPackStore):
+    """
+    a store that fails to load the packs of some users
+    """
+
+    def __init__(self, failing):
+        """initializer"""
+
+        super().__init__()
+        self.failing = set(failing)
+
+
+    def get(self, user_id, pack_name):
+        if user_id in self.failing:
+            raise RuntimeError(f'failed to load pack of user {user_id}')
+        return super().get(user_id, pack_name)
+
+
+def _scheduler(store, users, clock, **kwargs):
+    sent = []
+
+    async def send(pack):
+        sent.append(pack.name)
+
+    scheduler = ReminderScheduler(store, send=send, clock=clock, **kwargs)
+    for user_id in range(users):
+        pack = make_pack(5, name=f'pack {user_id}')
+        pack.remind_channel = FakeChannel()
+        store.add(user_id, pack)
+        scheduler.schedule(user_id, pack, seconds=INTERVAL, hours=0.0)
+    return scheduler, sent
+
+
+def test_failing_reminder_is_rescheduled():
+    now = 0.0
+    store = FailingStore(failing=(3,))
+    scheduler, sent = _scheduler(store, 10, lambda: now)
+
+    async def tick():
+        await scheduler.run_once(now, lambda packs: scheduler.deliver(packs))
+
+    now = INTERVAL
+    asyncio.run(tick())
+    assert sorted(sent) == sorted(f'pack {user_id}' for user_id in range(10) if user_id != 3)
+    assert scheduler.get(3, 'pack 3').due == 2 * INTERVAL
+
+    # once the store recovers the reminder fires again on schedule
+    store.failing.clear()
+    sent.clear()
+    now = 2 * INTERVAL
+    asyncio.run(tick())
+    assert len(sent) == 10
+
+
+def test_scheduler_task_survives_errors(capsys):
+    now = 0.0
+    store = MemoryPackStore()
+    scheduler, sent = _scheduler(store, 3, lambda: now)
+    failures = []
+
+    def update_reminders(rows):
+        failures.append(len(rows))
+        raise RuntimeError('database is locked')
+
+    # the first tick fails as a whole
+    pop_due = scheduler.pop_due
+
+    def failing_pop_due(now):
+        scheduler.pop_due = pop_due
+        raise RuntimeError('heap corrupted')
+
+    async def run():
+        nonlocal now
+        scheduler.tick = 0.0
+        scheduler.start()
+        scheduler.pop_due = failing_pop_due
+        store.update_reminders = update_reminders
+        try:
+            now = INTERVAL
+            for _ in range(10):
+                await asyncio.sleep(0)
+            now = 2 * INTERVAL
+            for _ in range(10):
+                await asyncio.sleep(0)
+            assert scheduler.running and not any(task.done() for task in scheduler._tasks)
+        finally:
+            scheduler.stop()
+
+    asyncio.run(run())
+    assert len(failures) >= 2
+    assert len(sent) == 6
+    err = capsys.readouterr().err
+    assert 'failed to fire reminders' in err
+    assert 'failed to save reminder schedules' in err
+
+
+def test_unresolved_reminder_is_retried_without_firing(capsys):
+    now = 0.0
+    store = MemoryPackStore()
+    unresolved = {3}
+
+    async def resolve(pack):
+        return pack.name != 'pack 3' or not unresolved
+
+    scheduler, sent = _scheduler(store, 5, lambda: now, resolve=resolve, retry_delay=60.0)
+    scheduler.get(3, 'pack 3').remaining = 2
+
+    async def tick():
+        await scheduler.run_once(now, lambda packs: scheduler.deliver(packs))
+
+    now = INTERVAL
+    asyncio.run(tick())
+    assert sorted(sent) == [f'pack {user_id}' for user_id in range(5) if user_id != 3]
+    assert 'no channel to remind user 3' in capsys.readouterr().err
+
+    # the pack wasn't advanced and the reminder wasn't counted as fired
+    reminder = scheduler.get(3, 'pack 3')
+    assert (reminder.due, reminder.remaining) == (INTERVAL + 60.0, 2)
+    assert store.get(3, 'pack 3').round_index == 0
+    assert store.load_reminders()[3][2] == INTERVAL + 60.0
+
+    # once the channel resolves it's sent, and its next interval starts from then
+    unresolved.clear()
+    sent.clear()
+    now = INTERVAL + 60.0
+    asyncio.run(tick())
+    assert sent == ['pack 3']
+    assert (reminder.due, reminder.remaining) == (2 * INTERVAL + 60.0, 1)
+
+
+class FakeResponse:
+    status = 404
+    reason = 'Not Found'
+
+
+class ResolvingBot(FakeBot):
+    """
+    a bot that only knows some of its channels, resolving them like Packle does
+    """
+
+    _resolve_user = Packle._resolve_user
+    _resolve_channel = Packle._resolve_channel
+    _fetch_remind_channel = Packle._fetch_remind_channel
+
+    def __init__(self):
+        """initializer"""
+
+        super().__init__()
+        self.channels = {}
+
+
+    def get_channel(self, channel_id):
+        return None
+
+
+    async def fetch_channel(self, channel_id):
+        self.calls['fetch_channel'] += 1
+        if channel_id not in self.channels:
+            raise discord.NotFound(FakeResponse(), 'Unknown Channel')
+        return self.channels[channel_id]
+
+
+@discord.abc.Messageable.register
+class MessageableUser(FakeUser):
+    """
+    a user that can be messaged, unlike the discord.Object standing in for an uncached user
+    """
+
+
+def test_uncached_remind_channels_are_fetched():
+    bot = ResolvingBot()
+    user = MessageableUser()
+    bot.known[user.id] = user
+    found, deleted = FakeChannel(), FakeChannel()
+    bot.channels[found.id] = found
+
+    def load(channel):
+        # as the store loads a pack after a restart, when neither the user nor the channel are cached
+        pack = make_pack(5)
+        author = pack.author = bot._resolve_user(user.id)
+        pack.remind_channel = bot._resolve_channel(channel.id, author)
+        pack.remind_channel_id = channel.id
+        return pack
+
+    async def fetch(pack):
+        return await bot._fetch_remind_channel(pack)
+
+    pack = load(found)
+    assert pack.remind_channel is None
+    assert asyncio.run(fetch(pack))
+    assert pack.remind_channel is found
+
+    # a channel that can't be fetched falls back to messaging the author
+    pack = load(deleted)
+    assert asyncio.run(fetch(pack))
+    assert pack.remind_channel is pack.author is user
+    assert bot.calls == {'fetch_channel': 2, 'fetch_user': 1}
+
+    # and the reminder is retried when the author can't be fetched either
+    del bot.known[user.id]
+    bot.user_cache = type(bot.user_cache)(bot)
+
+    async def fetch_user(user_id):
+        raise discord.NotFound(FakeResponse(), 'Unknown User')
+
+    bot.fetch_user = fetch_user
+    assert not asyncio.run(fetch(load(deleted)))
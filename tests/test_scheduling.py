@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+
+
+# local modules
+from fakes import make_pack
+from scheduling import DAY, make_scheduler
+
+
+def _review_twice(name, now):
+    pack = make_pack(10, make_scheduler(name))
+    scheduler = pack.scheduler
+    indexes = range(len(pack))
+    correct = [i % 3 != 0 for i in indexes]
+    scheduler.review_batch(pack, indexes, correct, now)
+    scheduler.review_batch(pack, indexes, correct, now + 3 * int(DAY))
+    return [scheduler.state(i) for i in indexes]
+
+
+def test_review_batch_accepts_int_times():
+    for name in ('sm2', 'fsrs'):
+        assert _review_twice(name, 1_700_000_000) == _review_twice(name, 1_700_000_000.0)
+
+
+def test_review_matches_review_batch():
+    for name in ('sm2', 'fsrs'):
+        single, batch = make_pack(5, make_scheduler(name)), make_pack(5, make_scheduler(name))
+        for day in range(3):
+            now = 1_700_000_000.0 + day * DAY
+            for i in range(len(single)):
+                single.scheduler.review(single, i, i != day, now)
+            batch.scheduler.review_batch(batch, range(len(batch)), [i != day for i in range(len(batch))], now)
+        assert [single.scheduler.state(i) for i in range(5)] == [batch.scheduler.state(i) for i in range(5)]
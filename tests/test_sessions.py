@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules
+import asyncio
+
+# local modules
+from cogs.quiz import Quiz
+from constants import Emojis
+from fakes import (
+    FakeBot, FakeChannel, FakeContext, FakeGuild, FakeMessage, FakePayload, FakeReaction, FakeUser, make_pack,
+)
+from sessions import QuizSession, SessionManager
+
+
+async def _advance(session):
+    return True
+
+
+def _session(author, channel):
+    return QuizSession(FakeContext(author, channel), FakeMessage(channel), make_pack(5).snapshot(), 10.0)
+
+
+def test_reservation_holds_slots_until_added():
+    async def run():
+        manager = SessionManager(_advance, clock=lambda: 0.0)
+        guild = FakeGuild()
+        channel = FakeChannel(guild)
+        author = FakeUser()
+
+        # a second quiz by the same author, or in the same channel, is refused while the first is starting
+        assert manager.reserve(author.id, guild.id, channel.id) is None
+        assert manager.reserve(author.id, guild.id, FakeChannel(guild).id) is not None
+        assert manager.reserve(FakeUser().id, guild.id, channel.id) is not None
+        assert len(manager) == 1
+
+        session = _session(author, channel)
+        manager.add(session)
+        assert manager.by_author(author.id) is session
+        assert manager.reserve(FakeUser().id, guild.id, channel.id) is not None
+        assert len(manager) == 1
+
+        # releasing after the session was added gives nothing back
+        manager.release(author.id)
+        assert manager.reserve(author.id, guild.id, FakeChannel(guild).id) is not None
+
+        manager.remove(session)
+        assert len(manager) == 0
+        assert manager.reserve(author.id, guild.id, channel.id) is None
+        manager.stop()
+
+    asyncio.run(run())
+
+
+def test_released_reservation_frees_slots():
+    manager = SessionManager(_advance)
+    guild = FakeGuild()
+    channel = FakeChannel(guild)
+    author = FakeUser()
+    assert manager.reserve(author.id, guild.id, channel.id) is None
+    manager.release(author.id)
+    assert len(manager) == 0
+    assert manager.reserve(author.id, guild.id, channel.id) is None
+
+
+def test_guild_and_total_limits_count_reservations():
+    manager = SessionManager(_advance, max_sessions=3, max_per_guild=2)
+    guild = FakeGuild()
+    assert manager.reserve(FakeUser().id, guild.id, FakeChannel(guild).id) is None
+    assert manager.reserve(FakeUser().id, guild.id, FakeChannel(guild).id) is None
+    assert manager.reserve(FakeUser().id, guild.id, FakeChannel(guild).id) is not None
+    other = FakeGuild()
+    assert manager.reserve(FakeUser().id, other.id, FakeChannel(other).id) is None
+    assert manager.reserve(FakeUser().id, FakeGuild().id, FakeChannel().id) is not None
+
+
+def test_removing_a_replaced_session_keeps_the_newer_one():
+    async def run():
+        manager = SessionManager(_advance, max_per_channel=2, clock=lambda: 0.0)
+        author = FakeUser()
+        channel = FakeChannel(FakeGuild())
+        old, new = _session(author, channel), _session(author, channel)
+        manager.add(old)
+        manager.add(new)
+        manager.remove(old)
+        assert manager.by_author(author.id) is new
+        assert manager.by_message(new.message.id) is new
+        manager.stop()
+
+    asyncio.run(run())
+
+
+def test_persistent_votes_can_be_withdrawn():
+    session = _session(FakeUser(), FakeChannel(FakeGuild()))
+    player = FakeUser().id
+
+    # removing the reaction added for this card takes the vote back
+    session.react(player, Emojis.check, 1.0)
+    session.unreact(player, Emojis.check, 2.0)
+    assert player not in session.votes and player not in session.voted_at
+
+    # un-clicking a reaction left over from an earlier card is a vote
+    session.react(player, Emojis.cross, 3.0)
+    session.new_card()
+    assert not session.votes
+    session.unreact(player, Emojis.cross, 4.0)
+    assert session.votes[player] == Emojis.cross and session.voted_at[player] == 4.0
+
+    # switching answers keeps the latest one when the other reaction is removed
+    session.react(player, Emojis.cross, 5.0)
+    session.react(player, Emojis.check, 6.0)
+    session.unreact(player, Emojis.cross, 7.0)
+    assert session.votes[player] == Emojis.check
+
+
+def test_gap_reconciles_votes_against_the_ledger():
+    async def run():
+        bot = FakeBot()
+        quiz = Quiz(bot)
+        quiz.sessions = SessionManager(quiz._quiz_advance, clock=lambda: 0.0)
+        channel = FakeChannel(FakeGuild())
+        author = FakeUser('author')
+        session = QuizSession(FakeContext(author, channel, bot), FakeMessage(channel), make_pack(5).snapshot(), 10.0)
+        quiz.sessions.add(session)
+        message = session.message
+        kept, added, removed, left = (FakeUser(f'player {i}') for i in range(4))
+
+        # reactions left on the message from the first card
+        for player, emoji in ((kept, Emojis.check), (removed, Emojis.check), (left, Emojis.cross)):
+            await quiz._quiz_add_reaction_listener(FakePayload(player, message, emoji))
+        session.new_card()
+        await quiz._quiz_remove_reaction_listener(FakePayload(left, message, Emojis.cross))
+        assert session.votes == {left.id: Emojis.cross}
+
+        # while the gateway was away one player added a check and another took theirs off
+        message.reactions = [
+            FakeReaction(Emojis.check, [bot.user, kept, added]),
+            FakeReaction(Emojis.cross, [bot.user]),
+        ]
+        await quiz._quiz_ready_listener()
+        await quiz._quiz_reconcile_votes(session)
+        assert session.votes == {left.id: Emojis.cross, added.id: Emojis.check, removed.id: Emojis.check}
+        assert session.names[added.id] == 'player 1'
+        assert not session.gap
+        quiz.sessions.stop()
+
+    asyncio.run(run())
+
+
+def test_advance_tasks_are_kept_and_failures_reported(capsys):
+    async def finished(session):
+        return False
+
+    def broken_remove(session):
+        raise RuntimeError('remove failed')
+
+    async def run():
+        now = 0.0
+        manager = SessionManager(finished, tick=0.0, clock=lambda: now)
+        manager.remove = broken_remove
+        session = _session(FakeUser(), FakeChannel(FakeGuild()))
+        manager.add(session)
+        now = session.next_tick
+        while not manager._advances:
+            await asyncio.sleep(0)
+        while manager._advances:
+            await asyncio.sleep(0)
+        manager.stop()
+
+    asyncio.run(run())
+    err = capsys.readouterr().err
+    assert 'advancing a quiz session failed' in err
+    assert 'remove failed' in err
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+reminders of a sharded deployment, with every process in a process of its own
+running a range of the shards and sharing a single SQLite database
+"""
+
+
+# standard library modules
+import asyncio
+import multiprocessing
+import os
+
+# third-party packages
+import pytest
+
+# local modules
+from fakes import FakeChannel, FakeGuild, FakeUser, make_pack
+from reminders import ReminderScheduler
+from sharding import ShardConfig
+from storage import SQLitePackStore
+
+
+PROCESSES = 2
+SHARDS = 4
+GUILDS = 8
+USERS = 24
+INTERVAL = 3600.0
+
+# users whose reminders are stopped by the first process, half of them owned by the second
+CANCELLED = (2, 3, 4, 7)
+
+# longest any process waits for the others
+TIMEOUT = 60.0
+
+
+def _guild_id(user_id):
+    """
+    guild of a user's remind channel, every third user is reminded in direct messages,
+    the rest are spread across the guilds (and so the shards) independently of their id
+    """
+
+    if user_id % 3 == 0:
+        return None
+    return (1000 + user_id % GUILDS) << 22
+
+
+def _shard(user_id):
+    """
+    shard the gateway sends the events of a user's remind channel on, direct messages are sent on shard 0
+    """
+
+    guild_id = _guild_id(user_id)
+    return 0 if guild_id is None else (guild_id >> 22) % SHARDS
+
+
+# guild id of each user's remind channel, by channel id
+CHANNELS = {10 ** 6 + user_id: _guild_id(user_id) for user_id in range(USERS)}
+
+
+def _shard_ids(process_index):
+    per_process = SHARDS // PROCESSES
+    return list(range(process_index * per_process, (process_index + 1) * per_process))
+
+
+def _shards(process_index):
+    return ShardConfig(
+        shard_count=SHARDS,
+        shard_ids=_shard_ids(process_index),
+        process_index=process_index,
+        process_count=PROCESSES,
+    )
+
+
+class FakeGateway:
+    """
+    the channels a process receives from the gateway shards it runs, as get_channel sees them
+    """
+
+    def __init__(self, shard_ids):
+        """initializer"""
+
+        self.channels = {}
+        for user_id, (channel_id, guild_id) in enumerate(CHANNELS.items()):
+            if _shard(user_id) not in shard_ids:
+                continue
+            guild = None
+            if guild_id is not None:
+                guild = FakeGuild()
+                guild.id = guild_id
+            channel = FakeChannel(guild)
+            channel.id = channel_id
+            self.channels[channel_id] = channel
+
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+
+def _store(path, gateway):
+    return SQLitePackStore(
+        path,
+        shared=True,
+        resolve_user=lambda user_id: FakeUser(),
+        resolve_channel=lambda channel_id, user: gateway.get_channel(channel_id),
+    )
+
+
+def _process(path, process_index, barrier, results):
+    """
+    runs a process's reminder scheduler through a few ticks, reporting the users it reminded
+    """
+
+    asyncio.run(_run_process(path, process_index, barrier, results))
+
+
+async def _run_process(path, process_index, barrier, results):
+    shards = _shards(process_index)
+    store = _store(path, FakeGateway(shards.shard_ids))
+    reminded = []
+
+    # only reminders whose channel this process can see are sent, the rest are retried later
+    async def send(pack):
+        reminded.append(int(pack.name.split()[-1]))
+
+    scheduler = ReminderScheduler(store, send=send, owns=shards.owns_guild)
+    scheduler.sync()
+
+    async def fire(step, now):
+        reminded.clear()
+        await scheduler.run_once(now, scheduler.deliver)
+        store.flush()
+        results.put((step, process_index, sorted(reminded)))
+        barrier.wait(TIMEOUT)
+
+    await fire('first', INTERVAL)
+
+    # $stop handled by the first process, whether or not it owns the reminder
+    if process_index == 0:
+        for user_id in CANCELLED:
+            scheduler.cancel(user_id, store.get(user_id, f'pack {user_id}'))
+    barrier.wait(TIMEOUT)
+
+    # the owner hasn't synced yet, so it fires them once more
+    await fire('before sync', 2 * INTERVAL)
+    scheduler.sync()
+    await fire('after sync', 3 * INTERVAL)
+    store.close()
+
+
+def test_guilds_are_owned_by_the_process_running_their_shard():
+    first, second = _shards(0), _shards(1)
+    guild_id = (1000 + 3) << 22
+    assert first.shard_for_guild(guild_id) == 3
+    assert (first.owns_guild(guild_id), second.owns_guild(guild_id)) == (False, True)
+
+    # direct messages are received on shard 0
+    assert (first.owns_guild(None), second.owns_guild(None)) == (True, False)
+
+    # a single process owns everything
+    assert ShardConfig().owns_guild(guild_id) and ShardConfig().owns_guild(None)
+    with pytest.raises(ValueError):
+        ShardConfig(process_index=1, process_count=2)
+
+
+def test_reminders_are_sent_by_the_process_running_their_channels_shard(tmp_path):
+    path = os.path.join(tmp_path, 'packs.db')
+    gateway = FakeGateway(range(SHARDS))
+    store = _store(path, gateway)
+    scheduler = ReminderScheduler(store, clock=lambda: 0.0)
+    for user_id, channel_id in enumerate(CHANNELS):
+        pack = make_pack(5, name=f'pack {user_id}')
+        pack.remind_channel = gateway.get_channel(channel_id)
+        store.add(user_id, pack)
+        scheduler.schedule(user_id, pack, seconds=INTERVAL, hours=0.0)
+    store.flush()
+
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(PROCESSES)
+    results = context.Queue()
+    processes = [
+        context.Process(target=_process, args=(path, process_index, barrier, results))
+        for process_index in range(PROCESSES)
+    ]
+    for process in processes:
+        process.start()
+    reminded = {}
+    try:
+        for _ in range(3 * PROCESSES):
+            step, process_index, user_ids = results.get(timeout=TIMEOUT)
+            reminded[step, process_index] = user_ids
+    finally:
+        for process in processes:
+            process.join(TIMEOUT)
+    assert all(process.exitcode == 0 for process in processes)
+
+    def owned(process_index, user_ids):
+        return [user_id for user_id in user_ids if _shard(user_id) in _shard_ids(process_index)]
+
+    # every reminder is sent exactly once, by the process whose shards its channel is on,
+    # which isn't the process a split by user id would have picked for every user
+    everyone = range(USERS)
+    for process_index in range(PROCESSES):
+        assert reminded['first', process_index] == owned(process_index, everyone)
+    assert any(user_id % PROCESSES != 0 for user_id in owned(0, everyone))
+
+    # the other processes only stop firing the cancelled reminders once they sync,
+    # but they don't store them again in the meantime
+    remaining = [user_id for user_id in everyone if user_id not in CANCELLED]
+    assert reminded['before sync', 0] == owned(0, remaining)
+    for process_index in range(1, PROCESSES):
+        assert reminded['before sync', process_index] == owned(process_index, everyone)
+    for process_index in range(PROCESSES):
+        assert reminded['after sync', process_index] == owned(process_index, remaining)
+    stored = sorted((user_id, guild_id) for user_id, *_, guild_id in store.load_reminders())
+    assert stored == [(user_id, _guild_id(user_id)) for user_id in remaining]
+    store.close()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules
+import asyncio
+import os
+import sys
+import textwrap
+
+# third-party packages - discord related
+import discord
+from discord.ext import commands
+
+# local modules
+from packlebot import Packle
+from startup import load_cogs
+
+
+# how long the fake cogs take to import and to set up
+IMPORT_TIME = 0.05
+SETUP_TIME = 0.01
+
+COG = '''
+import time
+from startup_cogs import executions
+
+executions.append(__name__)
+time.sleep({import_time})
+
+
+def setup(bot):
+    time.sleep({setup_time})
+    bot.set_up.append(__name__)
+'''
+
+
+class LoadingBot(commands.Bot):
+    """
+    a bot that loads extensions the way discord.py does, recording which ones were set up
+    """
+
+    defer_extension = Packle.defer_extension
+
+    def __init__(self):
+        """initializer"""
+
+        super().__init__(command_prefix='$', intents=discord.Intents.none(), loop=asyncio.new_event_loop())
+        self.deferred_extensions = {}
+        self.set_up = []
+
+
+def _cogs(path, broken):
+    """
+    writes a package of cogs that record every time their module runs
+    """
+
+    package = os.path.join(path, 'startup_cogs')
+    os.mkdir(package)
+    with open(os.path.join(package, '__init__.py'), 'w') as f:
+        f.write('executions = []\n')
+    for name in ('first', 'second', 'lazy'):
+        with open(os.path.join(package, f'{name}.py'), 'w') as f:
+            f.write(COG.format(import_time=IMPORT_TIME, setup_time=SETUP_TIME))
+    with open(os.path.join(package, f'{broken}.py'), 'w') as f:
+        f.write(textwrap.dedent('''
+            from startup_cogs import executions
+
+            executions.append(__name__)
+            raise RuntimeError('broken cog')
+        '''))
+
+
+def test_cogs_are_imported_once_and_timed_separately(tmp_path, monkeypatch, capsys):
+    _cogs(tmp_path, 'broken')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    names = [
+        'startup_cogs.first', 'startup_cogs.broken', 'startup_cogs.missing', 'startup_cogs.second', 'startup_cogs.lazy',
+    ]
+    bot = LoadingBot()
+    try:
+        report = load_cogs(bot, names, 0.0, lazy={'startup_cogs.lazy': ('lazy',)})
+        from startup_cogs import executions
+
+        # each module ran once, the broken one didn't stop the rest from loading
+        loaded = ['startup_cogs.first', 'startup_cogs.second']
+        assert executions == ['startup_cogs.first', 'startup_cogs.broken', 'startup_cogs.second']
+        assert bot.set_up == loaded
+        assert sorted(bot.extensions) == loaded
+        assert bot.deferred_extensions == {'lazy': 'startup_cogs.lazy'}
+        assert 'failed to load extension startup_cogs.broken' in capsys.readouterr().err
+
+        timings = {cog.name: cog for cog in report.cogs}
+        assert [timings[name].status for name in names] == ['loaded', 'failed', 'missing', 'loaded', 'deferred']
+        # setting a cog up doesn't run its module again
+        for name in loaded:
+            assert timings[name].import_time >= IMPORT_TIME
+            assert SETUP_TIME <= timings[name].setup_time < IMPORT_TIME
+        assert report.elapsed >= 2 * (IMPORT_TIME + SETUP_TIME)
+
+        # the extensions keep their own specs, so reloading one runs its module again
+        bot.reload_extension('startup_cogs.first')
+        assert executions[-1] == 'startup_cogs.first' and len(executions) == 4
+    finally:
+        bot.loop.close()
+        for name in list(sys.modules):
+            if name.startswith('startup_cogs'):
+                del sys.modules[name]
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules
+import os
+
+# local modules
+from fakes import FakeChannel, FakeUser, make_rows
+from cardpack import CardPack
+from storage import SQLitePackStore
+from texts import TextBuffer, shared_texts
+
+
+def _store(path, channels=True, **kwargs):
+    """
+    a store whose channels resolve only when channels is set, as before the bot's cache is filled
+    """
+
+    return SQLitePackStore(
+        path,
+        resolve_user=lambda user_id: FakeUser(),
+        resolve_channel=(lambda channel_id, user: FakeChannel()) if channels else (lambda channel_id, user: None),
+        **kwargs,
+    )
+
+
+def _channel_ids(path):
+    store = _store(path)
+    try:
+        return store._db.execute('SELECT dm_channel_id, remind_channel_id FROM packs').fetchall()
+    finally:
+        store.close()
+
+
+def test_unresolved_channels_keep_their_ids(tmp_path):
+    path = os.path.join(tmp_path, 'packs.db')
+    author = FakeUser()
+    channel = FakeChannel()
+    store = _store(path)
+    store.add(author.id, CardPack(make_rows(10), 'pack', author, channel))
+    store.close()
+    assert _channel_ids(path) == [(channel.id, channel.id)]
+
+    # loaded, advanced and saved again while the channels can't be resolved
+    for _ in range(2):
+        store = _store(path, channels=False)
+        pack = store.get(author.id, 'pack')
+        assert pack.remind_channel is None
+        pack.next_round()
+        store.save(author.id, pack)
+        store.close()
+        assert _channel_ids(path) == [(channel.id, channel.id)]
+
+
+def test_changed_channel_is_stored(tmp_path):
+    path = os.path.join(tmp_path, 'packs.db')
+    author = FakeUser()
+    store = _store(path)
+    store.add(author.id, CardPack(make_rows(10), 'pack', author, FakeChannel()))
+    store.flush()
+
+    pack = store.get(author.id, 'pack')
+    channel = pack.remind_channel = FakeChannel()
+    store.save(author.id, pack)
+    store.close()
+    assert _channel_ids(path)[0][1] == channel.id
+
+
+def test_save_of_evicted_pack_is_written(tmp_path):
+    path = os.path.join(tmp_path, 'packs.db')
+    author = FakeUser()
+    store = _store(path, cache_size=1)
+    store.add(author.id, CardPack(make_rows(10), 'first', author, FakeChannel()))
+    store.add(author.id, CardPack(make_rows(10), 'second', author, FakeChannel()))
+    store.flush()
+
+    # the first pack is evicted by loading the second, then changed by whoever still holds it
+    first = store.get(author.id, 'first')
+    store.get(author.id, 'second')
+    assert (author.id, 'first') not in store._cache
+    first.next_round()
+    store.save(author.id, first)
+    store.close()
+
+    store = _store(path)
+    assert store.get(author.id, 'first').round_index == first.round_index
+    store.close()
+
+
+def test_cloned_packs_are_loaded_into_the_shared_table(tmp_path):
+    path = os.path.join(tmp_path, 'packs.db')
+    author, other = FakeUser(), FakeUser()
+    store = _store(path)
+    deck = CardPack(make_rows(10), 'deck', author, FakeChannel())
+    own = CardPack(make_rows(10), 'own', author, FakeChannel())
+    store.add(author.id, deck)
+    store.add(other.id, deck.clone(author=other))
+    store.add(author.id, own)
+    store.close()
+
+    store = _store(path)
+    try:
+        loaded = [store.get(author.id, 'deck'), store.get(other.id, 'deck')]
+        assert [pack._texts for pack in loaded] == [shared_texts, shared_texts]
+        assert loaded[0]._questions == loaded[1]._questions
+        assert [card.question for card in loaded[1]] == [question for question, _ in make_rows(10)]
+        assert isinstance(store.get(author.id, 'own')._texts, TextBuffer)
+    finally:
+        store.close()
+
+
+def test_text_ids_are_looked_up_in_chunks(tmp_path):
+    path = os.path.join(tmp_path, 'packs.db')
+    author, other = FakeUser(), FakeUser()
+    rows = make_rows(1000)
+    store = _store(path)
+    statements = []
+    store._db.set_trace_callback(statements.append)
+    try:
+        store.add(author.id, CardPack(rows, 'deck', author, FakeChannel()))
+        store.flush()
+        lookups = [statement for statement in statements if statement.startswith('SELECT id, digest FROM texts')]
+        assert len(lookups) == -(-2 * len(rows) // store.TEXT_QUERY_SIZE)
+
+        # texts stored by another writer are looked up without being stored again
+        store._text_ids.clear()
+        store.add(other.id, CardPack(rows, 'deck', other, FakeChannel()))
+        store.flush()
+        assert store._db.execute('SELECT COUNT(*) FROM texts').fetchone() == (2 * len(rows),)
+    finally:
+        store.close()
+
+    store = _store(path)
+    try:
+        for user in (author, other):
+            assert [(card.question, card.answer) for card in store.get(user.id, 'deck')] == rows
+    finally:
+        store.close()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules
+import gc
+import random
+import threading
+
+# local modules
+from texts import TextColumns, TextTable
+
+
+WORDS = [f'word {i}' for i in range(200)]
+
+
+def _columns(table, rng):
+    questions = rng.sample(WORDS, 20)
+    answers = rng.sample(WORDS, 20)
+    return TextColumns(table, table.acquire(questions), table.acquire(answers)), questions, answers
+
+
+def test_collected_columns_are_released_by_the_next_change():
+    table = TextTable()
+    columns, questions, answers = _columns(table, random.Random(0))
+    kept = columns.copy()
+    del columns
+    gc.collect()
+    assert [table[i] for i in kept.questions] == questions
+    assert table.stats()['references'] == len(questions) + len(answers)
+
+    del kept
+    gc.collect()
+    assert len(table) == 0
+    assert table.stats()['references'] == 0
+
+
+def test_columns_collected_on_other_threads():
+    table = TextTable()
+    errors = []
+
+    def work(seed):
+        rng = random.Random(seed)
+        held = []
+        try:
+            for step in range(300):
+                held.append(_columns(table, rng))
+                if len(held) > 5:
+                    held.pop(rng.randrange(len(held)))
+                if step % 50 == 0:
+                    gc.collect()
+
+                # ids are never freed (and handed out again) while they are still in use
+                columns, questions, answers = rng.choice(held)
+                assert [table[i] for i in columns.questions] == questions
+                assert [table[i] for i in columns.answers] == answers
+        except AssertionError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(seed,)) for seed in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    gc.collect()
+    assert not errors
+    assert len(table) == 0
+    assert table.stats()['references'] == 0
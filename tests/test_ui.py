@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules
+import asyncio
+
+# local modules
+import ui
+from cardpack import FlashCard
+from fakes import make_pack
+
+
+def test_quizzes_of_an_unchanged_pack_share_renders():
+    pack = make_pack(50)
+    first = pack.snapshot()
+    deck = asyncio.run(ui.prerender_deck(first, limit=30))
+    assert len(deck) == 30
+
+    # a later quiz of the same pack reuses the renders
+    second = pack.snapshot()
+    assert all(ui.render_card(second, i, quiz_mode=True) is deck[i] for i in range(30))
+
+    # once the pack changes, new quizzes render it again but the running ones keep theirs
+    pack[0].result = FlashCard.Result.CORRECT
+    third = pack.snapshot()
+    assert ui.render_card(third, 1, quiz_mode=True) is not deck[1]
+    assert ui.render_card(first, 1, quiz_mode=True) is deck[1]
+
+
+def test_partial_snapshots_render_their_own_positions():
+    pack = make_pack(10)
+    ui.render_card(pack.snapshot(), 0, quiz_mode=True)
+    part = pack[5:]
+    assert ui.render_card(part, 0, quiz_mode=True)['fields'][0]['value'] == 'question 5'
+    assert ui.render_card(part, 0, quiz_mode=True)['author']['name'] == 'card 1 of 5'
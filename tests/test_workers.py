@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+
+# standard library modules
+import asyncio
+
+# local modules
+from bench_workers import LagProbe
+from cardpack import FlashCard
+from fakes import make_pack
+from importer import import_rows_async
+from reminders import ReminderScheduler
+from storage import MemoryPackStore
+from workers import Workers, next_round
+
+
+# cards in the pack advanced while the event loop's lag is measured
+LAG_CARDS = 500000
+
+# longest the event loop may be held up while a large pack is advanced off it
+MAX_LAG = 0.1
+
+# cards imported while the event loop's lag is measured, and the longest it may be held up meanwhile
+IMPORT_CARDS = 1000000
+MAX_IMPORT_LAG = 0.05
+
+
+def _answer_round(pack):
+    for i in pack.round._indexes:
+        pack._set_result(i, FlashCard.Result.CORRECT.value)
+
+
+async def _max_lag(pack, workers):
+    _answer_round(pack)
+    with LagProbe() as probe:
+        await asyncio.sleep(0)
+        await next_round(pack, workers=workers)
+        await asyncio.sleep(0.01)
+    return max(probe.lags)
+
+
+def test_next_round_keeps_the_loop_responsive():
+    pack = make_pack(LAG_CARDS)
+    inline = Workers(threshold=float('inf'))
+    offloaded = Workers(threshold=0)
+
+    async def run():
+
+        # the pool's processes are started before measuring
+        await offloaded.run_cpu(abs, 0)
+        return await _max_lag(pack, inline), await _max_lag(pack, offloaded)
+
+    try:
+        inline_lag, offloaded_lag = asyncio.run(run())
+    finally:
+        offloaded.shutdown()
+    assert offloaded.stats()['process jobs'] >= 3
+    assert offloaded_lag < MAX_LAG
+    assert offloaded_lag < inline_lag / 4
+
+
+def test_import_keeps_the_loop_responsive():
+    pack = make_pack(0)
+    workers = Workers()
+
+    async def run():
+        with LagProbe() as probe:
+            await asyncio.sleep(0)
+            rows = ([f'question {i}', f'answer {i}'] for i in range(IMPORT_CARDS))
+            stats = await import_rows_async(pack, rows, workers)
+            await asyncio.sleep(0.01)
+        return stats, probe.lags
+
+    try:
+        stats, lags = asyncio.run(run())
+    finally:
+        workers.shutdown()
+    assert stats.imported == len(pack) == IMPORT_CARDS
+    assert pack[IMPORT_CARDS - 1].question == f'question {IMPORT_CARDS - 1}'
+    assert len(lags) > 10
+    assert max(lags) < MAX_IMPORT_LAG
+
+
+def _check_round(pack):
+    """
+    checks that the pack's round is the one its scheduler picks, in any order
+    """
+
+    levels = pack.scheduler.levels(pack)
+    expected = sorted(i for i in range(len(pack)) if pack._proficiency[i] in levels)
+    assert sorted(pack.round._indexes) == expected
+    assert not any(result != FlashCard.Result.UNANSWERED.value for result in pack._results)
+
+
+def test_reminders_advance_large_packs_off_the_loop():
+    store = MemoryPackStore()
+    now = 0.0
+    scheduler = ReminderScheduler(store, clock=lambda: now, workers=Workers(threshold=1000))
+    pack = make_pack(20000, name='large')
+    store.add(1, pack)
+    scheduler.schedule(1, pack, seconds=60.0, hours=0.0)
+    _answer_round(pack)
+    round_index = pack.round_index
+    version = pack.version
+    versions = []
+    done = False
+
+    async def watch():
+
+        # the pack is never seen half way through its round change
+        while not done:
+            versions.append(pack.version)
+            if pack.round_index != round_index:
+                _check_round(pack)
+            await asyncio.sleep(0)
+
+    async def run():
+        nonlocal done
+        watcher = asyncio.ensure_future(watch())
+        sent = []
+
+        async def put(packs):
+            sent.append(packs)
+
+        try:
+            await scheduler.run_once(60.0, put)
+        finally:
+            done = True
+            await watcher
+        return sent
+
+    try:
+        sent = asyncio.run(run())
+    finally:
+        scheduler.workers.shutdown()
+    assert sent == [[pack]]
+    assert scheduler.workers.stats()['process jobs'] == 2
+    assert pack.round_index == round_index + 1
+    _check_round(pack)
+    assert versions == sorted(versions) and pack.version > version